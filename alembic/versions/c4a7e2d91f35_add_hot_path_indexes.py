@@ -0,0 +1,81 @@
+"""Add hot-path indexes on images, uploads and projects
+
+Revision ID: c4a7e2d91f35
+Revises: bfe5809e9760
+Create Date: 2026-10-17 21:05:12.418206
+
+Indexes are built CONCURRENTLY (outside the migration transaction) so a
+live database keeps taking writes, and IF NOT EXISTS so a partially
+applied run can be repeated. An interrupted concurrent build leaves an
+INVALID index behind that IF NOT EXISTS would skip, so those are dropped
+and rebuilt first. B-tree indexes scan backwards, so the
+(…, created_at, id) indexes serve both newest- and oldest-first keysets.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a7e2d91f35'
+down_revision: Union[str, None] = 'bfe5809e9760'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_UNFINISHED = sa.text("processing_status IN ('pending', 'processing')")
+
+# (name, table, columns, partial-index predicate)
+INDEXES = [
+    # search / dashboard "recent" for one user, newest first
+    ('ix_images_user_id_created_at', 'images', ['user_id', 'created_at', 'id'], None),
+    # admin views across all users
+    ('ix_images_created_at', 'images', ['created_at', 'id'], None),
+    # gallery images per upload, get_upload_images, upload deletes
+    ('ix_images_upload_id_created_at', 'images', ['upload_id', 'created_at', 'id'], None),
+    # per-upload status summary (dashboard)
+    ('ix_images_upload_id_status', 'images', ['upload_id', 'processing_status'], None),
+    # per-user status counts (dashboard summary, search filters)
+    ('ix_images_user_id_status', 'images', ['user_id', 'processing_status'], None),
+    # unfinished_count: only the few rows still in flight
+    ('ix_images_unfinished', 'images', ['upload_id'], _UNFINISHED),
+    # gallery pages
+    ('ix_uploads_user_id_created_at', 'uploads', ['user_id', 'created_at', 'id'], None),
+    ('ix_uploads_created_at', 'uploads', ['created_at', 'id'], None),
+    # project image counts and project ZIPs
+    ('ix_uploads_project_id', 'uploads', ['project_id'], None),
+    # project list
+    ('ix_projects_user_id_created_at', 'projects', ['user_id', 'created_at'], None),
+]
+
+
+def _drop_if_invalid(name: str) -> None:
+    invalid = op.get_bind().execute(
+        sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar()
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            _drop_if_invalid(name)
+            op.create_index(
+                name, table, columns,
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_where=where,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
@@ -0,0 +1,57 @@
+"""Add pg_trgm indexes for image and project name search
+
+Revision ID: d81b3f6ac2e4
+Revises: c4a7e2d91f35
+Create Date: 2026-10-17 21:48:40.902113
+
+GIN trigram indexes serve ILIKE '%term%' and 'term%' on the three names
+search matches (see app/services/image_search.py). The uploads index is on
+the exact expression the search query uses. Built CONCURRENTLY and
+IF NOT EXISTS, rebuilding INVALID leftovers, like c4a7e2d91f35.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81b3f6ac2e4'
+down_revision: Union[str, None] = 'c4a7e2d91f35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, indexed expression)
+INDEXES = [
+    ('ix_images_name_trgm', 'images', 'name gin_trgm_ops'),
+    ('ix_projects_name_trgm', 'projects', 'name gin_trgm_ops'),
+    ('ix_uploads_project_name_trgm', 'uploads', "(metadata ->> 'project_name') gin_trgm_ops"),
+]
+
+
+def _drop_if_invalid(name: str) -> None:
+    # Left by an interrupted concurrent build; IF NOT EXISTS would skip it.
+    invalid = op.get_bind().execute(
+        sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar()
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for name, table, expression in INDEXES:
+            _drop_if_invalid(name)
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                f"ON {table} USING gin ({expression})"
+            )
+
+
+def downgrade() -> None:
+    # The extension is left installed; other objects may depend on it.
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
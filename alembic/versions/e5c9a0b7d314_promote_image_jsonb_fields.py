@@ -0,0 +1,113 @@
+"""Promote hot JSONB fields on images to typed, indexed columns
+
+Revision ID: e5c9a0b7d314
+Revises: d81b3f6ac2e4
+Create Date: 2026-10-17 22:31:07.655840
+
+exif_data->>'crop_mode', exif_data->>'target_aspect_ratio' and the
+confidence_scores the dashboard averages get their own columns; the
+application writes both the JSONB and the column from now on. The new
+columns are nullable without defaults, so adding them does not rewrite
+the table. Existing rows are backfilled in id-ordered batches, one
+committed transaction each, so locks stay short and an interrupted run
+can simply be resumed. Indexes are built CONCURRENTLY after the backfill;
+an INVALID index left by an interrupted build is dropped and rebuilt.
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c9a0b7d314'
+down_revision: Union[str, None] = 'd81b3f6ac2e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+BATCH_SIZE = 5000
+
+COLUMNS = [
+    ('crop_mode', 'varchar'),
+    ('target_aspect_ratio', 'varchar'),
+    ('bg_clean_score', 'double precision'),
+    ('shadow_score', 'double precision'),
+    ('crop_score', 'double precision'),
+]
+
+INDEXES = [
+    ('ix_images_user_id_aspect_ratio', '(user_id, target_aspect_ratio)'),
+    ('ix_images_user_id_crop_mode', '(user_id, crop_mode)'),
+    ('ix_images_applied_steps', 'USING gin (applied_steps jsonb_path_ops)'),
+]
+
+
+def _score(key: str) -> str:
+    # Only JSON numbers are copied; anything else would fail the cast.
+    return (
+        f"CASE WHEN jsonb_typeof(i.confidence_scores -> '{key}') = 'number' "
+        f"THEN (i.confidence_scores ->> '{key}')::double precision END"
+    )
+
+
+# Rows are visited in id order after :last_id; re-running skips nothing
+# and rewrites the same values, so the backfill is idempotent.
+BACKFILL = sa.text(f"""
+    WITH batch AS (
+        SELECT id FROM images
+        WHERE id > :last_id
+        ORDER BY id
+        LIMIT :batch_size
+    )
+    UPDATE images i SET
+        crop_mode = i.exif_data ->> 'crop_mode',
+        target_aspect_ratio = i.exif_data ->> 'target_aspect_ratio',
+        bg_clean_score = {_score('bg_clean')},
+        shadow_score = {_score('shadow')},
+        crop_score = {_score('crop')}
+    FROM batch
+    WHERE i.id = batch.id
+    RETURNING i.id
+""")
+
+
+def _drop_if_invalid(name: str) -> None:
+    # Left by an interrupted concurrent build; IF NOT EXISTS would skip it.
+    invalid = op.get_bind().execute(
+        sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar()
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    for name, type_ in COLUMNS:
+        op.execute(f"ALTER TABLE images ADD COLUMN IF NOT EXISTS {name} {type_}")
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        last_id = '00000000-0000-0000-0000-000000000000'
+        updated = 0
+        while True:
+            ids = bind.execute(BACKFILL, {"last_id": last_id, "batch_size": BATCH_SIZE}).scalars().all()
+            if not ids:
+                break
+            updated += len(ids)
+            last_id = str(max(ids))
+            logger.info(f"backfilled {updated} images")
+
+        for name, definition in INDEXES:
+            _drop_if_invalid(name)
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON images {definition}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    for name, _ in reversed(COLUMNS):
+        op.execute(f"ALTER TABLE images DROP COLUMN IF EXISTS {name}")
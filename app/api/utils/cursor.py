@@ -0,0 +1,50 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Callable
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+
+def _to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(*values) -> str:
+    """Opaque keyset cursor for a row's sort key values (last one the id)."""
+    raw = json.dumps(list(values), separators=(",", ":"), default=_to_json)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_values(cursor: str, *parsers: Callable) -> tuple:
+    """Decode a cursor into values, one ``parser`` per position; a cursor of
+    the wrong shape is a 400."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(parsers):
+            raise ValueError("cursor shape")
+        return tuple(parse(v) for parse, v in zip(parsers, values))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    return decode_values(cursor, datetime.fromisoformat, uuid.UUID)
+
+
+def keyset_after(columns: tuple, values: tuple, descending: bool = True):
+    """WHERE clause for the rows after ``values`` in ``columns`` order; a
+    row-value comparison, so an index on the columns serves it."""
+    key = tuple_(*columns)
+    bound = tuple_(*values)
+    return key < bound if descending else key > bound
+
+
+def after_cursor(created_col, id_col, cursor: str, descending: bool = True):
+    """keyset_after for a ``(created_at, id)`` cursor."""
+    return keyset_after((created_col, id_col), decode_cursor(cursor), descending)
@@ -1,5 +1,7 @@
 import logging
-from app.services.cloudinary_service import extract_cloudinary_public_id, delete_from_cloudinary
+from typing import Iterable
+
+from app.services.storage import get_storage
 
 logger = logging.getLogger(__name__)
 
@@ -15,15 +17,20 @@ def collect_image_urls(image) -> list[str]:
     return urls
 
 
-async def delete_urls_from_cloudinary(urls: list[str]) -> list[str]:
-    errors = []
-    for url in urls:
-        try:
-            public_id = extract_cloudinary_public_id(url)
-            if public_id:
-                await delete_from_cloudinary(public_id)
-                logger.info(f"Deleted from Cloudinary: {public_id}")
-        except Exception as e:
-            logger.error(f"Cloudinary deletion failed: {url} - {e}")
-            errors.append(str(e))
-    return errors
\ No newline at end of file
+async def delete_stored_urls(urls: Iterable[str]) -> list[str]:
+    """Delete the stored objects behind ``urls`` with bulk storage calls.
+    Returns error messages; never raises."""
+    storage = get_storage()
+    # Processed URLs carry a ``?v=`` version; the key is the bare path.
+    bare_urls = (url.split("?", 1)[0] for url in urls if url)
+    keys = [key for key in map(storage.key_from_url, bare_urls) if key]
+    if not keys:
+        return []
+    try:
+        errors = await storage.delete_many(keys)
+    except Exception as e:
+        errors = [str(e)]
+    for error in errors:
+        logger.error(f"Storage deletion failed: {error}")
+    logger.info(f"Deleted {len(keys) - len(errors)} stored objects")
+    return errors
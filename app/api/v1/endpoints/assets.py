@@ -3,37 +3,52 @@ import logging
 import os
 import asyncio
 import uuid
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Body, Form
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Body, Form, Header, Query, Request, Response
 from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from datetime import datetime
 from app.api import deps
+from app.core.config import settings
 from app.db.session import get_db
 from app.models.auth import User
 from app.models.assets import Upload, Image
 from app.models.project import Project
-from app.services.media import upload_image_to_cloudinary
+from app.services.storage import get_storage
+from app.services.chunked_upload import (
+    ChunkedUploadError,
+    ChunkedUploadStore,
+    UploadCompletionInProgress,
+    UploadSessionNotFound,
+)
 from app.services.quality_analyzer import analyze_image_quality
 from app.services.statistics import update_processing_stats
 from app.services.repositories import ImageRepository
 from app.services.image_fetcher import ImageFetcher
-from app.services.process_use_case import ProcessImageUseCase
-from app.schemas.asset import BatchUploadResponse
+from app.services.zip_stream import stream_zip
+from app.services.process_use_case import ProcessImageUseCase, ProcessUploadUseCase
+from app.services.job_queue import JobQueue, JOB_TYPE_PROCESS_IMAGE
+from app.schemas.asset import BatchUploadResponse, ChunkedUploadInit
 from app.schemas.analysis import AnalyzeRequest
 from app.api.utils.target_user_id import get_target_user_id
-import tempfile
-import zipfile
-import shutil
 from typing import List
+from urllib.parse import quote
 import httpx
-from fastapi.responses import FileResponse
-from starlette.background import BackgroundTask
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.api.utils.auth_checker import check_authorized
-from app.api.utils.image_helper import collect_image_urls, delete_urls_from_cloudinary
+from app.api.utils.cursor import after_cursor, encode_cursor
+from app.api.utils.image_helper import collect_image_urls, delete_stored_urls
 logger = logging.getLogger("assets")
 logger.setLevel(logging.INFO)
 router = APIRouter()
+ALLOWED_UPLOAD_TYPES = [
+    "image/jpeg",
+    "image/png",
+    "image/webp",
+    "application/pdf",
+    "image/avif",
+]
+CHUNKED_UPLOADS = ChunkedUploadStore()
 PROCESSING_SEMAPHORE = asyncio.Semaphore(
     int(os.getenv("MAX_CONCURRENT_PROCESSING", "2"))
 )
@@ -49,24 +64,38 @@ async def analyze_endpoint(request: AnalyzeRequest):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.post("/upload", response_model=BatchUploadResponse)
-async def upload_asset(
-    files: list[UploadFile] = File(...),
-    project_name: str = Form(None),
-    original_dimensions: str = Form(None),
-    crop_settings: str = Form(None),
-    user_id: str = Form(None),
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(deps.get_current_user),
-):
-    target_user_id = get_target_user_id(current_user, user_id)
-    dimensions_map = {}
-    if original_dimensions:
-        try:
-            dimensions_map = json.loads(original_dimensions)
-            logger.info(f"Original dimensions received: {dimensions_map}")
-        except json.JSONDecodeError:
-            logger.warning("Failed to parse original_dimensions JSON")
+def _image_row(user_id, filename: str, content_type: str, stored: dict,
+               crop_info: dict | None, original_dims) -> dict:
+    """Column values for a freshly uploaded Image."""
+    image_metadata = {}
+    applied_steps_init = []
+    if crop_info:
+        image_metadata["crop_mode"] = crop_info.get("cropMode")
+        image_metadata["target_aspect_ratio"] = crop_info.get(
+            "targetAspectRatio")
+        applied_steps_init.append("smart_crop")
+    if original_dims:
+        image_metadata["original_dimensions"] = original_dims
+    return {
+        "user_id": user_id,
+        "url": stored.get("secure_url"),
+        "thumbnail_url": stored.get("secure_url"),
+        "width": stored.get("width", 0),
+        "height": stored.get("height", 0),
+        "processing_status": "pending",
+        "name": filename,
+        "file_type": content_type,
+        "exif_data": image_metadata,
+        "crop_mode": image_metadata.get("crop_mode"),
+        "target_aspect_ratio": image_metadata.get("target_aspect_ratio"),
+        "applied_steps": applied_steps_init,
+    }
+
+
+async def _create_upload(db: AsyncSession, current_user: User, target_user_id,
+                         project_name: str | None, rows: list[dict]):
+    """Create the project (if new), the upload and its images in one
+    transaction, then record upload stats. Returns (upload, image results)."""
     project_id = None
     if project_name:
         existing = await db.execute(
@@ -79,11 +108,8 @@ async def upload_asset(
         if not proj:
             proj = Project(user_id=target_user_id, name=project_name)
             db.add(proj)
-            await db.commit()
-            await db.refresh(proj)
+            await db.flush()
         project_id = proj.id
-    crop_list = json.loads(crop_settings) if crop_settings else []
-    crop_map = {item["filename"]: item for item in crop_list}
     upload_record = Upload(
         user_id=target_user_id,
         status="uploaded",
@@ -91,108 +117,281 @@ async def upload_asset(
         metadata_obj={"project_name": project_name} if project_name else {},
     )
     db.add(upload_record)
+    await db.flush()
+    for row in rows:
+        row["upload_id"] = upload_record.id
+    inserted = await ImageRepository(db).add_images(rows)
     await db.commit()
-    await db.refresh(upload_record)
-    successful_uploads = 0
+
+    results = [
+        {
+            "id": str(image_id),
+            "name": name,
+            "url": url,
+            "width": width,
+            "height": height,
+            "original_dimensions": row["exif_data"].get("original_dimensions"),
+        }
+        for (image_id, name, url, width, height), row in zip(inserted, rows)
+    ]
+    try:
+        from app.db.session import AsyncSessionLocal
+        async with AsyncSessionLocal() as stats_db:
+            await update_processing_stats(
+                stats_db, current_user.id, "upload", 0, count=len(results))
+            await stats_db.commit()
+            logger.debug(f"Recorded {len(results)} upload stats")
+    except Exception as e:
+        logger.warning(f"Upload stats failed (non-critical): {e}")
+    return upload_record, results
+
+
+@router.post("/upload", response_model=BatchUploadResponse)
+async def upload_asset(
+    files: list[UploadFile] = File(...),
+    project_name: str = Form(None),
+    original_dimensions: str = Form(None),
+    crop_settings: str = Form(None),
+    user_id: str = Form(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    target_user_id = get_target_user_id(current_user, user_id)
+    dimensions_map = {}
+    if original_dimensions:
+        try:
+            dimensions_map = json.loads(original_dimensions)
+            logger.info(f"Original dimensions received: {dimensions_map}")
+        except json.JSONDecodeError:
+            logger.warning("Failed to parse original_dimensions JSON")
+    crop_list = json.loads(crop_settings) if crop_settings else []
+    crop_map = {item["filename"]: item for item in crop_list}
     failed_uploads = []
-    results = []
+    accepted = []
     for file in files:
-        if file.content_type not in [
-            "image/jpeg",
-            "image/png",
-            "image/webp",
-            "application/pdf",
-            "image/avif",
-        ]:
+        if file.content_type not in ALLOWED_UPLOAD_TYPES:
             failed_uploads.append({
                 'filename': file.filename,
                 'error': f"Invalid file type:{file.content_type}"
             })
             continue
-
-        try:
-            image_metadata = {}
-            crop_info = crop_map.get(file.filename)
-            applied_steps_init = []
-            if crop_info:
-                image_metadata["crop_mode"] = crop_info.get("cropMode")
-                image_metadata["target_aspect_ratio"] = crop_info.get(
-                    "targetAspectRatio")
-                applied_steps_init.append("smart_crop")
-            file_ext = file.filename.rsplit(
-                ".", 1)[-1] if "." in file.filename else "jpg"
-            unique_filename = f"{target_user_id}/{uuid.uuid4()}.{file_ext}"
+        accepted.append(file)
+
+    # Storage writes run concurrently in the thread pool; each part is read
+    # from its spool only when its slot opens, so at most
+    # UPLOAD_CONCURRENCY file bodies are in memory at once.
+    storage_slots = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+
+    async def store(file: UploadFile):
+        file_ext = file.filename.rsplit(
+            ".", 1)[-1] if "." in file.filename else "jpg"
+        unique_filename = f"{target_user_id}/{uuid.uuid4()}.{file_ext}"
+        async with storage_slots:
             file_content = await file.read()
-            result = upload_image_to_cloudinary(file_content, unique_filename)
-            original_dims = dimensions_map.get(file.filename)
-            if original_dims:
-                image_metadata["original_dimensions"] = original_dims
-                logger.info(
-                    f"Storing original dims for {file.filename}: {original_dims}")
-            new_image = Image(
-                upload_id=upload_record.id,
-                user_id=target_user_id,
-                url=result.get("secure_url"),
-                thumbnail_url=result.get("secure_url"),
-                width=result.get("width", 0),
-                height=result.get("height", 0),
-                processing_status="pending",
-                name=file.filename,
-                file_type=file.content_type,
-                exif_data=image_metadata,
-                applied_steps=applied_steps_init
-            )
-            db.add(new_image)
-            await db.commit()
-            await db.refresh(new_image)
-            results.append(
-                {
-                    "id": str(new_image.id),
-                    "name": new_image.name,
-                    "url": new_image.url,
-                    "width": new_image.width,
-                    "height": new_image.height,
-                    "original_dimensions": original_dims,
-                }
-            )
-            successful_uploads += 1
-        except Exception as e:
-            logger.error(f"Failed to upload {file.filename}: {e}")
+            return await get_storage().put_bytes(
+                file_content, unique_filename, content_type=file.content_type)
+
+    stored = await asyncio.gather(
+        *(store(file) for file in accepted), return_exceptions=True
+    )
+
+    rows = []
+    for file, result in zip(accepted, stored):
+        if isinstance(result, BaseException):
+            logger.error(f"Failed to upload {file.filename}: {result}")
             failed_uploads.append({
                 'filename': file.filename,
-                'error': str(e)
+                'error': str(result)
             })
             continue
-    if not results:
-        await db.rollback()
+        rows.append(_image_row(
+            target_user_id, file.filename, file.content_type, result,
+            crop_map.get(file.filename), dimensions_map.get(file.filename),
+        ))
+    if not rows:
         raise HTTPException(status_code=500, detail="All uploads failed")
+
+    upload_record, results = await _create_upload(
+        db, current_user, target_user_id, project_name, rows)
+    return {
+        "upload_id": str(upload_record.id),
+        "images": results,
+        "failed_files": failed_uploads,
+        "status": "uploaded",
+    }
+
+
+@router.post("/chunked-uploads")
+async def initiate_chunked_upload(
+    payload: ChunkedUploadInit,
+    current_user: User = Depends(deps.get_current_user),
+):
+    """Start a resumable upload. The client then PUTs each part (raw bytes,
+    optional X-Part-SHA256 header) and calls /complete; GET shows which
+    parts the server already has, so an interrupted upload can resume."""
+    if payload.content_type not in ALLOWED_UPLOAD_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid file type:{payload.content_type}")
+    target_user_id = get_target_user_id(current_user, payload.user_id)
     try:
-        from app.db.session import AsyncSessionLocal
-        async with AsyncSessionLocal() as stats_db:
-            for _ in range(successful_uploads):
-                await update_processing_stats(stats_db, current_user.id, "upload", 0)
-            await stats_db.commit()
-            logger.debug(f"Recorded {successful_uploads} upload stats")
+        meta = await run_in_threadpool(
+            CHUNKED_UPLOADS.create,
+            current_user.id, payload.filename, payload.content_type,
+            payload.size, payload.sha256,
+            {
+                "target_user_id": str(target_user_id),
+                "project_name": payload.project_name,
+                "original_dimensions": payload.original_dimensions,
+                "crop_settings": payload.crop_settings,
+            },
+        )
+    except ChunkedUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "session_id": meta["session_id"],
+        "part_size": meta["part_size"],
+        "total_parts": meta["total_parts"],
+    }
+
+
+def _load_chunked_session(session_id: str, current_user: User) -> dict:
+    try:
+        return CHUNKED_UPLOADS.load(session_id, current_user.id)
+    except UploadSessionNotFound:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+
+
+@router.get("/chunked-uploads/{session_id}")
+async def get_chunked_upload(
+    session_id: str,
+    current_user: User = Depends(deps.get_current_user),
+):
+    meta = _load_chunked_session(session_id, current_user)
+    return {
+        "session_id": session_id,
+        "part_size": meta["part_size"],
+        "total_parts": meta["total_parts"],
+        "received_parts": CHUNKED_UPLOADS.received_parts(meta),
+    }
+
+
+@router.put("/chunked-uploads/{session_id}/parts/{part_number}")
+async def upload_chunk(
+    session_id: str,
+    part_number: int,
+    request: Request,
+    x_part_sha256: str | None = Header(default=None),
+    current_user: User = Depends(deps.get_current_user),
+):
+    meta = _load_chunked_session(session_id, current_user)
+    try:
+        return await CHUNKED_UPLOADS.write_part(
+            meta, part_number, request.stream(), x_part_sha256)
+    except ChunkedUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/chunked-uploads/{session_id}/complete", response_model=BatchUploadResponse)
+async def complete_chunked_upload(
+    session_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    """Assemble, store and register the file. Idempotent: one request does
+    the work while others get a 409, and calls after it succeeded return
+    the same response without storing the file again."""
+    meta = _load_chunked_session(session_id, current_user)
+    try:
+        completed = await run_in_threadpool(CHUNKED_UPLOADS.claim, meta)
+    except UploadCompletionInProgress:
+        raise HTTPException(status_code=409, detail="Upload is being completed; retry shortly")
+    if completed is not None:
+        return completed
+    try:
+        response = await _complete_chunked_upload(db, current_user, meta)
+    except BaseException:
+        await run_in_threadpool(CHUNKED_UPLOADS.release, meta)
+        raise
+    await run_in_threadpool(CHUNKED_UPLOADS.finish, meta, response)
+    return response
+
+
+async def _complete_chunked_upload(db: AsyncSession, current_user: User, meta: dict) -> dict:
+    session_id = meta["session_id"]
+    extra = meta["extra"]
+    try:
+        path = await run_in_threadpool(CHUNKED_UPLOADS.assemble, meta)
+    except ChunkedUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = meta["filename"]
+    file_ext = filename.rsplit(".", 1)[-1] if "." in filename else "jpg"
+    target_user_id = extra["target_user_id"]
+    try:
+        # Keyed by session, so a retry after a failed insert overwrites
+        # the same object instead of leaving an orphan.
+        stored = await get_storage().put_file(
+            path, f"{target_user_id}/{session_id}.{file_ext}",
+            content_type=meta["content_type"])
     except Exception as e:
-        logger.warning(f"Upload stats failed (non-critical): {e}")
+        logger.error(f"Failed to store chunked upload {session_id}: {e}")
+        raise HTTPException(status_code=502, detail="Storage upload failed; retry /complete")
+
+    row = _image_row(
+        uuid.UUID(target_user_id), filename, meta["content_type"], stored,
+        extra.get("crop_settings"), extra.get("original_dimensions"),
+    )
+    upload_record, results = await _create_upload(
+        db, current_user, uuid.UUID(target_user_id), extra.get("project_name"), [row])
     return {
         "upload_id": str(upload_record.id),
         "images": results,
-        "failed_files": failed_uploads,
+        "failed_files": [],
         "status": "uploaded",
     }
 
 
+@router.delete("/chunked-uploads/{session_id}")
+async def abort_chunked_upload(
+    session_id: str,
+    current_user: User = Depends(deps.get_current_user),
+):
+    _load_chunked_session(session_id, current_user)
+    await run_in_threadpool(CHUNKED_UPLOADS.discard, session_id)
+    return {"session_id": session_id, "status": "aborted"}
+
+
 @router.post("/{image_id}/process")
 async def process_image_asset(
     image_id: str,
     operations: list = Body(default=[], embed=True),
     options: dict = Body(default={}, embed=True),
     autoDetect: bool = Body(default=False, embed=True),
+    background: bool = Body(default=False, embed=True),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(deps.get_current_user),
 ):
     target_user_id = get_target_user_id(current_user, None)
+    if background:
+        img_record = await ImageRepository(db).get_image(image_id)
+        if not img_record:
+            raise HTTPException(status_code=404, detail="Image not found")
+        if not check_authorized(img_record.user_id, current_user):
+            raise HTTPException(status_code=403, detail="Not authorized")
+        job = await JobQueue(db).enqueue(
+            target_user_id,
+            JOB_TYPE_PROCESS_IMAGE,
+            {
+                "image_id": image_id,
+                "target_user_id": str(target_user_id),
+                "operations": operations,
+                "options": options,
+                "autoDetect": autoDetect,
+            },
+        )
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": str(job.id), "image_id": image_id, "status": job.status},
+        )
     async with PROCESSING_SEMAPHORE:
         repo = ImageRepository(db)
         img_record = await repo.get_image(image_id)
@@ -217,6 +416,37 @@ async def process_image_asset(
             raise HTTPException(status_code=500, detail="Processing failed")
 
 
+@router.post("/upload/{upload_id}/process")
+async def process_upload_session(
+    upload_id: str,
+    operations: list = Body(default=[], embed=True),
+    options: dict = Body(default={}, embed=True),
+    autoDetect: bool = Body(default=False, embed=True),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    upload = await ImageRepository(db).get_upload(upload_id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if not check_authorized(upload.user_id, current_user):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    target_user_id = get_target_user_id(current_user, None)
+    use_case = ProcessUploadUseCase(ImageFetcher(), PROCESSING_SEMAPHORE)
+    events = use_case.stream(
+        upload_id=upload_id,
+        target_user_id=target_user_id,
+        operations=operations,
+        options=options,
+        autoDetect=autoDetect,
+    )
+
+    async def ndjson():
+        async for event in events:
+            yield json.dumps(event, default=str) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
 @router.get("/projects/{project_id}/download-zip")
 async def download_project_zip(
     project_id: str,
@@ -232,14 +462,16 @@ async def download_project_zip(
         raise HTTPException(status_code=404, detail="Upload not found")
     if str(upload.user_id) != str(current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized")
+    # Plain columns, not ORM objects: the request's DB session is closed
+    # before the response body is streamed.
     images_result = await db.execute(
-        select(Image).where(Image.upload_id == upload.id)
+        select(Image.id, Image.name, Image.url, Image.processed_url)
+        .where(Image.upload_id == upload.id)
     )
-    images: List[Image] = images_result.scalars().all()
+    images = images_result.all()
     if not images:
         raise HTTPException(
             status_code=404, detail="No images for this project")
-    # temp_dir = tempfile.mkdtemp(prefix=f"project-{project_id}-")
 
     project_name: str | None = None
 
@@ -262,63 +494,21 @@ async def download_project_zip(
         for c in display_name
     )
 
-    temp_dir = tempfile.mkdtemp(prefix=f"session-{upload.id}-")
-    zip_path = os.path.join(temp_dir, f"{safe_name}_output.zip")
-    # async with httpx.AsyncClient(timeout=60.0) as client:
-    #     seen_names: dict[str, int] = {}
-    #     with zipfile.ZipFile(zip_path, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-    #         for img in images:
-    #             source_url = img.processed_url or img.url
-    #             if not source_url:
-    #                 continue
-    #             try:
-    #                 resp = await client.get(source_url)
-    #                 resp.raise_for_status()
-    #             except httpx.HTTPError:
-    #                 continue
-
-    #             if img.name:
-    #                 filename = img.name
-    #             else:
-    #                 filename = source_url.rstrip(
-    #                     "/").split("/")[-1] or f"{img.id}.jpg"
-
-    #             dot_idx = filename.rfind(".")
-    #             if dot_idx > 0:
-    #                 base, ext = filename[:dot_idx], filename[dot_idx:]
-    #             else:
-    #                 base, ext = filename, ""
-
-    #             arcname = f"{base}_output{ext}"
-    #             if arcname in seen_names:
-    #                 seen_names[arcname] += 1
-    #                 arcname = f"{base}_output_{seen_names[arcname]}{ext}"
-    #             else:
-    #                 seen_names[arcname] = 0
-
-    #             zf.writestr(arcname, resp.content)
-    async def fetch_one(img):
-        source_url = img.processed_url or img.url
-        if not source_url:
-            return img, None
-        try:
-            resp = await client.get(source_url)
-            resp.raise_for_status()
-            return img, resp.content
-        except httpx.HTTPError:
-            return img, None
-
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        fetched = await asyncio.gather(*(fetch_one(img) for img in images))
-
-    seen_names: dict[str, int] = {}
-    with zipfile.ZipFile(zip_path, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for img, content in fetched:
+    entries = [
+        (img.processed_url or img.url, img.name, str(img.id))
+        for img in images
+        if img.processed_url or img.url
+    ]
+    fetcher = ImageFetcher()
+
+    async def fetched_entries():
+        seen_names: dict[str, int] = {}
+        urls = [url for url, _, _ in entries]
+        async for index, content in fetcher.fetch_many(urls, settings.ZIP_FETCH_CONCURRENCY):
             if content is None:
                 continue
-
-            source_url = img.processed_url or img.url
-            filename = img.name or (source_url.rstrip("/").split("/")[-1] or f"{img.id}.jpg")
+            source_url, name, image_id = entries[index]
+            filename = name or (source_url.rstrip("/").split("/")[-1] or f"{image_id}.jpg")
 
             dot_idx = filename.rfind(".")
             if dot_idx > 0:
@@ -332,161 +522,128 @@ async def download_project_zip(
                 arcname = f"{base}_output_{seen_names[arcname]}{ext}"
             else:
                 seen_names[arcname] = 0
+            yield arcname, content
 
-            zf.writestr(arcname, content)
-    if not os.path.exists(zip_path):
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        raise HTTPException(
-            status_code=500, detail="Failed to create zip file")
-    return FileResponse(
-        path=zip_path,
-        filename=f"{safe_name}_output.zip",
-
+    filename = f"{safe_name}_output.zip"
+    quoted = quote(filename)
+    disposition = (
+        f"attachment; filename*=utf-8''{quoted}" if quoted != filename
+        else f'attachment; filename="{filename}"'
+    )
+    return StreamingResponse(
+        stream_zip(fetched_entries()),
         media_type="application/zip",
-        background=BackgroundTask(
-            lambda: shutil.rmtree(temp_dir, ignore_errors=True)),
+        headers={"Content-Disposition": disposition},
     )
 
 
+def _gallery_image(i) -> dict:
+    return {
+        "id": str(i.id),
+        "url": i.url,
+        "name": i.name,
+        "processed_url": i.processed_url,
+        "processing_status": i.processing_status,
+        "thumbnail_url": i.thumbnail_url or i.url,
+        "width": i.width,
+        "height": i.height,
+        "created_at": i.created_at,
+    }
+
+
+def _page(rows: list, limit: int) -> tuple[list, str | None]:
+    """Trim a keyset page fetched with limit + 1; the cursor points past
+    the last row kept, or is None when nothing follows."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
 @router.get("/gallery")
 async def get_gallery(
+    response: Response,
     user_id: str = None,
     all: bool = False,
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1, le=100),
+    images_per_upload: int = Query(settings.GALLERY_IMAGES_PER_UPLOAD, ge=1, le=200),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(deps.get_current_user),
 ):
+    """Uploads newest first, each with its first ``images_per_upload``
+    images. The next page's cursor is in the X-Next-Cursor header; an upload
+    with more images carries ``images_next_cursor`` for
+    /gallery/uploads/{upload_id}/images."""
     try:
         is_admin = current_user.role == "admin"
+        filters = []
         if all and is_admin:
-            query = select(Upload).order_by(Upload.created_at.desc()).limit(50)
+            limit = limit or 50
         else:
-            target_user_id = get_target_user_id(current_user, user_id)
-            query = (
-                select(Upload)
-                .where(Upload.user_id == target_user_id)
-                .order_by(Upload.created_at.desc())
-                .limit(20)
-            )
-        result = await db.execute(query)
-        uploads = result.scalars().all()
-        gallery = []
-        for up in uploads:
-            imgs = await db.execute(select(Image).where(Image.upload_id == up.id))
-            images_list = imgs.scalars().all()
-            gallery.append(
-                {
-                    "id": str(up.id),
-                    "status": up.status,
-                    "created_at": up.created_at,
-                    "metadata": up.metadata_obj or {},
-                    "images": [
-                        {
-                            "id": str(i.id),
-                            "url": i.url,
-                            "name": i.name,
-                            "processed_url": i.processed_url,
-                            "processing_status": i.processing_status,
-                            "thumbnail_url": i.thumbnail_url or i.url,
-                            "width": i.width,
-                            "height": i.height,
-                            "created_at": i.created_at,
-                        }
-                        for i in images_list
-                    ],
+            limit = limit or 20
+            filters.append(Upload.user_id == get_target_user_id(current_user, user_id))
+        if cursor:
+            filters.append(after_cursor(Upload.created_at, Upload.id, cursor))
+
+        rows = await ImageRepository(db).gallery_page(filters, limit + 1, images_per_upload + 1)
+        gallery = {}
+        for row in rows:
+            up = gallery.get(row.page_upload_id)
+            if up is None:
+                up = gallery[row.page_upload_id] = {
+                    "id": str(row.page_upload_id),
+                    "status": row.upload_status,
+                    "created_at": row.upload_created_at,
+                    "metadata": row.upload_metadata or {},
+                    "images": [],
+                    "images_next_cursor": None,
+                    "_last": None,
                 }
-            )
-        return gallery
+            if row.id is None:
+                continue
+            if len(up["images"]) < images_per_upload:
+                up["images"].append(_gallery_image(row))
+                up["_last"] = row
+            else:
+                up["images_next_cursor"] = encode_cursor(up["_last"].created_at, up["_last"].id)
+
+        uploads = list(gallery.values())
+        if len(uploads) > limit:
+            uploads = uploads[:limit]
+            last = uploads[-1]
+            response.headers["X-Next-Cursor"] = encode_cursor(last["created_at"], last["id"])
+        for up in uploads:
+            del up["_last"]
+        return uploads
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error fetching gallery")
         raise HTTPException(
             status_code=500,
             detail=f"Failed to fetch gallery: {str(e)}",
         )
-@router.delete("/{image_id}")
-async def delete_image(
-    image_id: str,
+
+
+@router.get("/gallery/uploads/{upload_id}/images")
+async def get_gallery_upload_images(
+    upload_id: str,
+    cursor: str | None = None,
+    limit: int = Query(settings.GALLERY_IMAGES_PER_UPLOAD, ge=1, le=200),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(deps.get_current_user),
 ):
-    
-    try:
-        
-        result = await db.execute(
-            select(Image).where(Image.id == image_id)
-        )
-        image = result.scalars().first()
-        
-        if not image:
-            raise HTTPException(
-                status_code=404, 
-                detail=f"Image with ID {image_id} not found"
-            )
-        
-        
-        # is_owner = str(image.user_id) == str(current_user.id)
-        # is_admin = getattr(current_user, "role", None) == "admin"
-        
-        # if not is_owner and not is_admin:
-        #     raise HTTPException(
-        #         status_code=403, 
-        #         detail="Not authorized to delete this image"
-        #     )
-        
-        
-        # urls_to_delete = []
-        # if image.url:
-        #     urls_to_delete.append(image.url)
-        # if image.processed_url and image.processed_url != image.url:
-        #     urls_to_delete.append(image.processed_url)
-        # if image.thumbnail_url and image.thumbnail_url not in urls_to_delete:
-        #     urls_to_delete.append(image.thumbnail_url)
-        
-        
-        # cloudinary_errors = []
-        # for url in urls_to_delete:
-        #     try:
-                
-        #         public_id = extract_cloudinary_public_id(url)
-        #         if public_id:
-        #             await delete_from_cloudinary(public_id)
-        #             logger.info(f"Deleted from Cloudinary: {public_id}")
-        #     except Exception as e:
-        #         logger.error(f"Failed to delete from Cloudinary: {url} - {str(e)}")
-        #         cloudinary_errors.append(str(e))
-        if not check_authorized(image.user_id, current_user):
-            raise HTTPException(status_code=403, detail="Not authorized to delete this image")
-
-        urls_to_delete = collect_image_urls(image)
-        cloudinary_errors = await delete_urls_from_cloudinary(urls_to_delete)
-        
-        
-        image_name = image.name
-        await db.delete(image)
-        await db.commit()
-        
-        
-        logger.info(
-            f"Image {image_id} ({image_name}) deleted by user {current_user.id}"
-        )
-        
-        response_data = {
-            "message": f"Image '{image_name}' deleted successfully",
-            "image_id": image_id,
-            "deleted_from_cloudinary": len(urls_to_delete) - len(cloudinary_errors),
-            "cloudinary_errors": cloudinary_errors if cloudinary_errors else None
-        }
-        
-        return response_data
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.exception(f"Error deleting image {image_id}")
-        await db.rollback()
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to delete image: {str(e)}"
-        )
+    """The "load more" page of one gallery upload's images."""
+    repo = ImageRepository(db)
+    upload = await repo.get_upload(upload_id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if not check_authorized(upload.user_id, current_user):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    filters = [after_cursor(Image.created_at, Image.id, cursor, descending=False)] if cursor else []
+    rows, next_cursor = _page(await repo.gallery_upload_images(upload.id, filters, limit + 1), limit)
+    return {"images": [_gallery_image(row) for row in rows], "next_cursor": next_cursor}
 
 
 @router.delete("/batch")
@@ -499,10 +656,10 @@ async def batch_delete_images(
     if not image_ids:
         raise HTTPException(status_code=400, detail="No image IDs provided")
     
-    if len(image_ids) > 50:  
+    if len(image_ids) > settings.BATCH_DELETE_MAX:
         raise HTTPException(
             status_code=400, 
-            detail="Maximum 50 images can be deleted at once"
+            detail=f"Maximum {settings.BATCH_DELETE_MAX} images can be deleted at once"
         )
     
     try:
@@ -511,77 +668,36 @@ async def batch_delete_images(
             "failed": [],
             "total_requested": len(image_ids)
         }
-        
+
+        valid_ids = {}
         for image_id in image_ids:
             try:
-                
-                result = await db.execute(
-                    select(Image).where(Image.id == image_id)
-                )
-                image = result.scalars().first()
-                
-                if not image:
-                    results["failed"].append({
-                        "image_id": image_id,
-                        "error": "Image not found"
-                    })
-                    continue
-                
-                
-                # is_owner = str(image.user_id) == str(current_user.id)
-                # is_admin = getattr(current_user, "role", None) == "admin"
-                
-                # if not is_owner and not is_admin:
-                #     results["failed"].append({
-                #         "image_id": image_id,
-                #         "error": "Not authorized"
-                #     })
-                #     continue
-                
-                
-                # urls_to_delete = []
-                # if image.url:
-                #     urls_to_delete.append(image.url)
-                # if image.processed_url and image.processed_url != image.url:
-                #     urls_to_delete.append(image.processed_url)
-                # if image.thumbnail_url and image.thumbnail_url not in urls_to_delete:
-                #     urls_to_delete.append(image.thumbnail_url)
-                
-                # for url in urls_to_delete:
-                #     try:
-                #         public_id = extract_cloudinary_public_id(url)
-                #         if public_id:
-                #             await delete_from_cloudinary(public_id)
-                #     except Exception as e:
-                #         logger.error(f"Cloudinary deletion failed for {url}: {e}")
-                if not check_authorized(image.user_id, current_user):
-                    results["failed"].append({
-                        "image_id": image_id,
-                        "error": "Not authorized"
-                    })
-                    continue
-
-                urls_to_delete = collect_image_urls(image)
-                await delete_urls_from_cloudinary(urls_to_delete)
-                
-                image_name = image.name
-                await db.delete(image)
-                
-                results["successful"].append({
-                    "image_id": image_id,
-                    "name": image_name
-                })
-                
-            except Exception as e:
-                logger.error(f"Failed to delete image {image_id}: {e}")
-                results["failed"].append({
-                    "image_id": image_id,
-                    "error": str(e)
-                })
-        
-        
+                valid_ids[uuid.UUID(image_id)] = image_id
+            except ValueError:
+                results["failed"].append({"image_id": image_id, "error": "Image not found"})
+
+        repo = ImageRepository(db)
+        found = {row.id: row for row in await repo.get_image_files(list(valid_ids))}
+        to_delete = []
+        for key, image_id in valid_ids.items():
+            image = found.get(key)
+            if not image:
+                results["failed"].append({"image_id": image_id, "error": "Image not found"})
+            elif not check_authorized(image.user_id, current_user):
+                results["failed"].append({"image_id": image_id, "error": "Not authorized"})
+            else:
+                to_delete.append(image)
+                results["successful"].append({"image_id": image_id, "name": image.name})
+
+        await repo.delete_images([image.id for image in to_delete])
         await db.commit()
-        
+
+        # Rows go first: a failed storage delete leaves an orphaned file,
+        # never a row pointing at a missing one.
+        storage_errors = await delete_stored_urls(
+            url for image in to_delete for url in collect_image_urls(image))
+        results["storage_errors"] = storage_errors or None
+
         logger.info(
             f"Batch deletion: {len(results['successful'])} succeeded, "
             f"{len(results['failed'])} failed out of {len(image_ids)} requested"
@@ -598,6 +714,57 @@ async def batch_delete_images(
         )
 
 
+@router.delete("/{image_id}")
+async def delete_image(
+    image_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    
+    try:
+        repo = ImageRepository(db)
+        found = await repo.get_image_files([image_id])
+        image = found[0] if found else None
+        
+        if not image:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"Image with ID {image_id} not found"
+            )
+        
+        if not check_authorized(image.user_id, current_user):
+            raise HTTPException(status_code=403, detail="Not authorized to delete this image")
+
+        await repo.delete_images([image.id])
+        await db.commit()
+
+        urls_to_delete = collect_image_urls(image)
+        storage_errors = await delete_stored_urls(urls_to_delete)
+        
+        logger.info(
+            f"Image {image_id} ({image.name}) deleted by user {current_user.id}"
+        )
+        
+        response_data = {
+            "message": f"Image '{image.name}' deleted successfully",
+            "image_id": image_id,
+            "deleted_from_cloudinary": len(urls_to_delete) - len(storage_errors),
+            "cloudinary_errors": storage_errors if storage_errors else None
+        }
+        
+        return response_data
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"Error deleting image {image_id}")
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to delete image: {str(e)}"
+        )
+
+
 @router.delete("/upload/{upload_id}")
 async def delete_upload_and_images(
     upload_id: str,
@@ -606,11 +773,8 @@ async def delete_upload_and_images(
 ):
     
     try:
-        
-        result = await db.execute(
-            select(Upload).where(Upload.id == upload_id)
-        )
-        upload = result.scalars().first()
+        repo = ImageRepository(db)
+        upload = await repo.get_upload(upload_id)
         
         if not upload:
             raise HTTPException(
@@ -618,74 +782,28 @@ async def delete_upload_and_images(
                 detail=f"Upload session {upload_id} not found"
             )
         
-        
-        # is_owner = str(upload.user_id) == str(current_user.id)
-        # is_admin = getattr(current_user, "role", None) == "admin"
-        
-        # if not is_owner and not is_admin:
-        #     raise HTTPException(
-        #         status_code=403,
-        #         detail="Not authorized to delete this upload session"
-        #     )
         if not check_authorized(upload.user_id, current_user):
             raise HTTPException(status_code=403, detail="Not authorized to delete this upload session")
         
-        
-        images_result = await db.execute(
-            select(Image).where(Image.upload_id == upload.id)
-        )
-        images = images_result.scalars().all()
-        
-        
-        deleted_count = 0
-        failed_count = 0
-        
-        for image in images:
-            try:
-                
-                # urls_to_delete = []
-                # if image.url:
-                #     urls_to_delete.append(image.url)
-                # if image.processed_url and image.processed_url != image.url:
-                #     urls_to_delete.append(image.processed_url)
-                # if image.thumbnail_url and image.thumbnail_url not in urls_to_delete:
-                #     urls_to_delete.append(image.thumbnail_url)
-                
-                # for url in urls_to_delete:
-                #     try:
-                #         public_id = extract_cloudinary_public_id(url)
-                #         if public_id:
-                #             await delete_from_cloudinary(public_id)
-                #     except Exception as e:
-                #         logger.error(f"Cloudinary deletion failed: {e}")
-                
-                
-                # await db.delete(image)
-                # deleted_count += 1
-                urls_to_delete = collect_image_urls(image)
-                await delete_urls_from_cloudinary(urls_to_delete)
-
-                await db.delete(image)
-                deleted_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to delete image {image.id}: {e}")
-                failed_count += 1
-        
-        
+        images = await repo.get_upload_image_files(upload.id)
+        await repo.delete_images([image.id for image in images])
         await db.delete(upload)
         await db.commit()
+
+        storage_errors = await delete_stored_urls(
+            url for image in images for url in collect_image_urls(image))
         
         logger.info(
             f"Upload session {upload_id} deleted: "
-            f"{deleted_count} images deleted, {failed_count} failed"
+            f"{len(images)} images deleted, {len(storage_errors)} storage errors"
         )
         
         return {
             "message": f"Upload session deleted successfully",
             "upload_id": upload_id,
-            "images_deleted": deleted_count,
-            "images_failed": failed_count
+            "images_deleted": len(images),
+            "images_failed": 0,
+            "storage_errors": storage_errors or None,
         }
         
     except HTTPException:
@@ -699,35 +817,6 @@ async def delete_upload_and_images(
         )
 
 
-
-
-def extract_cloudinary_public_id(url: str) -> str:
-    
-    try:
-        if not url or "cloudinary" not in url:
-            return None
-        
-        
-        parts = url.split("upload/")
-        if len(parts) < 2:
-            return None
-        
-        
-        after_upload = parts[1]
-        version_parts = after_upload.split("/", 1)
-        
-        if len(version_parts) < 2:
-            return None
-        
-        
-        public_id_with_ext = version_parts[1]
-        public_id = public_id_with_ext.rsplit(".", 1)[0]
-        
-        return public_id
-        
-    except Exception as e:
-        logger.error(f"Failed to extract public_id from URL {url}: {e}")
-        return None
 from app.services.depth_generator import ThreeDGenerator
 
 @router.post("/{image_id}/generate-3d")
@@ -781,10 +870,11 @@ async def generate_3d_from_image(
         target_user_id = str(image.user_id)
         unique_filename = f"{target_user_id}/3d/{uuid.uuid4()}.glb"
         
-        mesh_result = upload_image_to_cloudinary(
+        mesh_result = await get_storage().put_bytes(
             mesh_bytes,
             unique_filename,
-            resource_type="raw"  
+            resource_type="raw",
+            content_type="model/gltf-binary",
         )
         
         model_url = mesh_result.get("secure_url")
@@ -827,25 +917,3 @@ async def generate_3d_from_image(
             status_code=500,
             detail=f"3D generation failed: {str(e)}"
         )
-
-async def delete_from_cloudinary(public_id: str) -> bool:
-   
-    import cloudinary
-    import cloudinary.uploader
-    
-    try:
-        result = cloudinary.uploader.destroy(public_id)
-        
-        if result.get("result") == "ok":
-            logger.info(f"Successfully deleted from Cloudinary: {public_id}")
-            return True
-        else:
-            logger.warning(
-                f"Cloudinary deletion returned: {result.get('result')} "
-                f"for {public_id}"
-            )
-            return False
-            
-    except Exception as e:
-        logger.error(f"Cloudinary deletion error for {public_id}: {e}")
-        raise
\ No newline at end of file
@@ -1,13 +1,21 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, text
+from sqlalchemy import select
 from app.api import deps
 from app.db.session import get_db
-from app.models.assets import Image, Upload
+from app.models.assets import Upload
 from app.models.auth import User
 from fastapi import HTTPException
 import logging
 from app.api.utils.target_user_id import get_target_user_id
+from app.services.repositories import (
+    overview_step_counts_query,
+    overview_summary_query,
+    recent_images_query,
+    upload_confidence_query,
+    upload_step_counts_query,
+    upload_summary_query,
+)
 logger = logging.getLogger('dashboard')
 router = APIRouter()
 
@@ -25,33 +33,11 @@ async def get_batch_analytics(
             raise HTTPException(status_code=404, detail="Upload not found")
         if str(upload.user_id) != str(current_user.id) and getattr(current_user, "role", None) != "admin":
             raise HTTPException(status_code=403, detail="Not authorized")
-        summary_query = select(
-            func.count(Image.id).label("total"),
-            func.count(Image.id).filter(Image.processing_status ==
-                                        "completed").label("processed"),
-            func.count(Image.id).filter(
-                Image.processing_status == "failed").label("failed"),
-            func.avg(Image.processing_time_ms).label("avg_time")
-        ).where(Image.upload_id == upload_id)
-        summary_res = await db.execute(summary_query)
+        summary_res = await db.execute(upload_summary_query(upload_id))
         summary = summary_res.first()
-        step_query = text("""
-            SELECT step, COUNT(*) as count
-            FROM images, jsonb_array_elements_text(applied_steps) as step
-            WHERE upload_id = :uid
-            GROUP BY step
-        """)
-        step_res = await db.execute(step_query, {"uid": upload_id})
+        step_res = await db.execute(upload_step_counts_query(upload_id))
         steps_dist = {row[0]: row[1] for row in step_res}
-        conf_query = text("""
-            SELECT 
-                AVG((confidence_scores->>'bg_clean')::float) as bg_clean,
-                AVG((confidence_scores->>'shadow')::float) as shadow,
-                AVG((confidence_scores->>'crop')::float) as crop
-            FROM images
-            WHERE upload_id = :uid AND processing_status = 'completed'
-        """)
-        conf_res = await db.execute(conf_query, {"uid": upload_id})
+        conf_res = await db.execute(upload_confidence_query(upload_id))
         conf_avg = conf_res.mappings().first()
         
         return {
@@ -86,21 +72,7 @@ async def get_user_overview(
             logger.info(f"Admin {current_user.email} viewing ALL users data")
         else:
             target_user_id = get_target_user_id(current_user, user_id)
-        summary_query = select(
-            func.count(Image.id).label("total"),
-            func.count(Image.id).filter(Image.processing_status ==
-                                        "completed").label("processed"),
-            func.count(Image.id).filter(
-                Image.processing_status == "failed").label("failed"),
-            func.count(Image.id).filter(Image.processing_status ==
-                                        "processing").label("pending"),
-            func.avg(Image.processing_time_ms).filter(
-                Image.processing_status == "completed").label("avg_time")
-        )
-        if target_user_id is not None:
-            summary_query = summary_query.where(
-                Image.user_id == target_user_id)
-        summary_res = await db.execute(summary_query)
+        summary_res = await db.execute(overview_summary_query(target_user_id))
         summary = summary_res.first()
         # if target_user_id is not None:
         #     step_query = text("""
@@ -133,23 +105,7 @@ async def get_user_overview(
         #         ORDER BY total DESC
         #     """)
         #     step_res = await db.execute(step_query)
-        where_clause = "WHERE i.user_id = :uid AND jsonb_array_length(i.applied_steps) > 0" \
-            if target_user_id is not None else "WHERE jsonb_array_length(i.applied_steps) > 0"
-        step_query = text(f"""
-            SELECT
-                step,
-                COUNT(*) as total,
-                COUNT(*) FILTER (WHERE i.processing_status = 'completed') as completed,
-                COUNT(*) FILTER (WHERE i.processing_status = 'failed') as failed,
-                COUNT(*) FILTER (WHERE i.processing_status = 'processing') as pending,
-                COALESCE(AVG(i.processing_time_ms) FILTER (WHERE i.processing_status = 'completed'), 0) as avg_time_ms
-            FROM images i, jsonb_array_elements_text(i.applied_steps) as step
-            {where_clause}
-            GROUP BY step
-            ORDER BY total DESC
-        """)
-        params = {"uid": target_user_id} if target_user_id is not None else {}
-        step_res = await db.execute(step_query, params)
+        step_res = await db.execute(overview_step_counts_query(target_user_id))
         steps_dist = {
             row[0]: {
                 "count": row[1],
@@ -160,11 +116,7 @@ async def get_user_overview(
             }
             for row in step_res
         }
-        recent_query = select(Image).order_by(
-            Image.created_at.desc()).limit(10)
-        if target_user_id is not None:
-            recent_query = recent_query.where(Image.user_id == target_user_id)
-        recent_res = await db.execute(recent_query)
+        recent_res = await db.execute(recent_images_query(target_user_id))
         recent_images = recent_res.scalars().all()
         return {
             "summary": {
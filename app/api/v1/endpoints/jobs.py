@@ -0,0 +1,37 @@
+import logging
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api import deps
+from app.api.utils.auth_checker import check_authorized
+from app.db.session import get_db
+from app.models.auth import User
+from app.services.job_queue import JobQueue
+
+logger = logging.getLogger("jobs")
+router = APIRouter()
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user),
+):
+    job = await JobQueue(db).get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not check_authorized(job.user_id, current_user):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    output = job.output_data or {}
+    return {
+        "job_id": str(job.id),
+        "type": job.type,
+        "status": job.status,
+        "image_id": (job.input_data or {}).get("image_id"),
+        "attempts": output.get("attempts", 0),
+        "result": output.get("result"),
+        "error": job.error_message,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "completed_at": job.completed_at,
+    }
@@ -8,8 +8,14 @@ from app.api import deps
 from app.db.session import get_db
 from app.models.auth import User
 from app.models.project import Project
-from app.models.assets import Upload, Image
+from app.models.assets import Upload
 from app.schemas.project import ProjectCreate, ProjectListResponse, ProjectResponse
+from app.services.repositories import (
+    project_image_count_query,
+    project_image_counts_query,
+    projects_page_query,
+    projects_query,
+)
 
 logger = logging.getLogger("projects")
 router = APIRouter()
@@ -21,11 +27,7 @@ def _check_project_owner(project: Project, current_user: User) -> None:
 
 
 async def _get_image_count(db: AsyncSession, project_id) -> int:
-    result = await db.execute(
-        select(func.count(Image.id))
-        .join(Upload, Image.upload_id == Upload.id)
-        .where(Upload.project_id == project_id)
-    )
+    result = await db.execute(project_image_count_query(project_id))
     return result.scalar() or 0
 
 
@@ -71,9 +73,7 @@ async def list_projects(
     current_user: User = Depends(deps.get_current_user)
 ) -> dict:
     try:
-        base_query = select(Project).where(Project.user_id == current_user.id)
-        if status:
-            base_query = base_query.where(Project.status == status)
+        base_query = projects_query(current_user.id, status)
 
         count_query = select(func.count()).select_from(base_query.subquery())
         total_result = await db.execute(count_query)
@@ -81,17 +81,12 @@ async def list_projects(
 
         offset = (page - 1) * limit
         result = await db.execute(
-            base_query.order_by(Project.created_at.desc()).offset(offset).limit(limit)
+            projects_page_query(current_user.id, status, offset, limit)
         )
         projects = result.scalars().all()
 
         project_ids = [p.id for p in projects]
-        counts_result = await db.execute(
-            select(Upload.project_id, func.count(Image.id))
-            .join(Upload, Image.upload_id == Upload.id)
-            .where(Upload.project_id.in_(project_ids))
-            .group_by(Upload.project_id)
-        )
+        counts_result = await db.execute(project_image_counts_query(project_ids))
         counts_map = {row[0]: row[1] for row in counts_result}
 
         project_list = [
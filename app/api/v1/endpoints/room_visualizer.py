@@ -1,3 +1,5 @@
+import asyncio
+from app.services.image_processing.inference_batcher import rembg_mask
 from app.services.image_processing.model_registry import get_rembg_session
 from pillow_heif import register_heif_opener
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
@@ -13,7 +15,6 @@ from app.services.image_processing.mask_generator import MaskGeneratorService
 from app.services.image_processing.wall_service import WallRecoloringService
 from pathlib import Path
 from PIL import Image as PILImage
-from rembg import remove
 logger=logging.getLogger(__name__)
 from app.services.image_processing.steps.room_visualizer import RoomVisualizerStep, ROOM_REGISTRY
 register_heif_opener()
@@ -49,8 +50,9 @@ async def remove_product_bg(product_image: UploadFile = File(...)):
         except Exception as decode_error:
             logger.error(f"Manual decode failed: {decode_error}")
             pil_input = PILImage.open(io.BytesIO(contents)).convert("RGB")
-        session = get_rembg_session()
-        cutout = remove(pil_input, session=session).convert("RGBA")
+        mask = await asyncio.to_thread(rembg_mask, np.array(pil_input))
+        cutout = pil_input.convert("RGBA")
+        cutout.putalpha(PILImage.fromarray(mask, "L"))
         buf = io.BytesIO()
         cutout.save(buf, format="PNG")
         img_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
@@ -148,6 +150,7 @@ async def recolor_room(room_id: str = Form(...), hex_color: str = Form(...)):
             wall_mask = cv2.imread(str(mask_path), cv2.IMREAD_GRAYSCALE)
         else:
             logger.info("Generating Multi-Model Perfect Mask...")
+            from rembg import remove
             wall_only_mask = MaskGeneratorService.generate_wall_mask(room_img)
             session = get_rembg_session()
             img_rgb = cv2.cvtColor(room_img, cv2.COLOR_BGR2RGB)
@@ -1,20 +1,42 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_, func, text, desc
+from sqlalchemy import select, and_, func, text, desc
 from sqlalchemy.orm import joinedload
 from typing import Optional, List
 from app.api import deps
 from app.db.session import get_db
-from app.models.assets import Image, Upload
-from app.models.project import Project
+from app.models.assets import Image
 from app.models.auth import User
 from app.api.utils.target_user_id import get_target_user_id
+from app.services.image_search import (
+    search_count_query,
+    search_page_query,
+    search_query,
+    sort_spec,
+)
+from app.api.utils.cursor import decode_values, encode_cursor, keyset_after
+from app.core.config import settings
+from app.db.explain import estimated_rows
 import logging
+import uuid
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+async def _count(db: AsyncSession, query, mode: str) -> tuple[Optional[int], bool]:
+    """Total rows of ``query`` as (total, is_estimate). ``estimate`` trusts
+    the planner only above SEARCH_EXACT_COUNT_THRESHOLD rows, where an
+    exact count would have to visit them all."""
+    if mode == "none":
+        return None, False
+    if mode == "estimate":
+        estimate = await estimated_rows(db, query.with_only_columns(Image.id).order_by(None))
+        if estimate > settings.SEARCH_EXACT_COUNT_THRESHOLD:
+            return estimate, True
+    return (await db.execute(search_count_query(query))).scalar(), False
+
+
 @router.get("/images")
 async def search_images(
     q: Optional[str] = Query(None, description="Search query for image name or project"),
@@ -27,9 +49,11 @@ async def search_images(
     has_output: Optional[bool] = Query(None, description="Filter images with processed output"),
     date_from: Optional[str] = Query(None, description="Filter from date (YYYY-MM-DD)"),
     date_to: Optional[str] = Query(None, description="Filter to date (YYYY-MM-DD)"),
-    sort_by: str = Query("newest", description="Sort by: newest, oldest, name, processing_time"),
+    sort_by: Optional[str] = Query(None, description="Sort by: relevance (default with q), newest (default otherwise), oldest, name, processing_time"),
     limit: int = Query(50, ge=1, le=100, description="Number of results"),
-    offset: int = Query(0, ge=0, description="Pagination offset"),
+    offset: int = Query(0, ge=0, description="Pagination offset (ignored with cursor)"),
+    cursor: Optional[str] = Query(None, description="pagination.next_cursor of the previous page"),
+    count: str = Query("exact", pattern="^(exact|estimate|none)$", description="Total: exact (default), planner estimate for large results, or none"),
     user_id: Optional[str] = Query(None, description="Admin: search specific user"),
     all_users: bool = Query(False, description="Admin: search all users"),
     db: AsyncSession = Depends(get_db),
@@ -52,125 +76,56 @@ async def search_images(
         else:
             target_user_id = current_user.id
 
-        # Base query with joins for project data
-        query = select(
-            Image.id,
-            Image.name,
-            Image.url,
-            Image.thumbnail_url,
-            Image.processed_url,
-            Image.width,
-            Image.height,
-            Image.processing_status,
-            Image.file_type,
-            Image.created_at,
-            Image.processing_time_ms,
-            Image.applied_steps,
-            Image.exif_data,
-            Upload.metadata_obj.label('upload_metadata'),
-            Project.name.label('project_name')
-        ).select_from(
-            Image
-        ).join(
-            Upload, Image.upload_id == Upload.id
-        ).outerjoin(
-            Project, Upload.project_id == Project.id
-        )
-
-        # User filter
-        if target_user_id is not None:
-            query = query.where(Image.user_id == target_user_id)
-
-        # Search query filter (name + project)
-        if q:
-            search_term = f"%{q.lower()}%"
-            search_conditions = [
-                func.lower(Image.name).like(search_term),
-                func.lower(Project.name).like(search_term),
-                func.lower(Upload.metadata_obj.op('->>')('project_name')).like(search_term)
-            ]
-            query = query.where(or_(*search_conditions))
-
-        # Project name filter
-        if project_name:
-            query = query.where(
-                or_(
-                    Project.name.ilike(f"%{project_name}%"),
-                    Upload.metadata_obj.op('->>')('project_name').ilike(f"%{project_name}%")
-                )
-            )
-
-        # Processing status filter
-        if status:
-            query = query.where(Image.processing_status == status)
-
-        # File type filter
-        if file_type:
-            query = query.where(Image.file_type.ilike(f"%{file_type}%"))
-
-        # Aspect ratio filter
-        if aspect_ratio:
-            query = query.where(
-                Image.exif_data.op('->>')('target_aspect_ratio') == aspect_ratio
-            )
-
-        # Crop mode filter
-        if crop_mode:
-            query = query.where(
-                Image.exif_data.op('->>')('crop_mode') == crop_mode
-            )
-
-        # Operations filter
-        if operations:
-            op_list = [op.strip() for op in operations.split(',')]
-            for operation in op_list:
-                query = query.where(
-                    Image.applied_steps.op('@>')([operation])
-                )
-
-        # Has processed output filter
-        if has_output is not None:
-            if has_output:
-                query = query.where(Image.processed_url.isnot(None))
-            else:
-                query = query.where(Image.processed_url.is_(None))
-
         # Date range filters
-        if date_from:
-            try:
-                from_date = datetime.strptime(date_from, "%Y-%m-%d")
-                query = query.where(Image.created_at >= from_date)
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid date_from format (use YYYY-MM-DD)")
+        try:
+            from_date = datetime.strptime(date_from, "%Y-%m-%d") if date_from else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date_from format (use YYYY-MM-DD)")
+        try:
+            to_date = datetime.strptime(date_to, "%Y-%m-%d") if date_to else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date_to format (use YYYY-MM-DD)")
 
-        if date_to:
-            try:
-                to_date = datetime.strptime(date_to, "%Y-%m-%d")
-                query = query.where(Image.created_at <= to_date)
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid date_to format (use YYYY-MM-DD)")
+        # Filters (name + project search is served by trigram indexes)
+        q = q.strip() if q else None
+        op_list = [op.strip() for op in operations.split(',') if op.strip()] if operations else None
+        filtered = search_query(
+            target_user_id, q, project_name, status, file_type, aspect_ratio,
+            crop_mode, op_list, has_output, from_date, to_date,
+        )
 
-        # Sorting
-        if sort_by == "oldest":
-            query = query.order_by(Image.created_at.asc())
-        elif sort_by == "name":
-            query = query.order_by(Image.name.asc())
-        elif sort_by == "processing_time":
-            query = query.order_by(Image.processing_time_ms.desc().nulls_last())
-        else:  # newest (default)
-            query = query.order_by(Image.created_at.desc())
+        # Sorting (relevance by default when searching). Every order ends
+        # in id so the keyset below is total; sort keys are never NULL.
+        if sort_by is None:
+            sort_by = "relevance" if q else "newest"
+        if sort_by == "relevance" and not q:
+            sort_by = "newest"
+        sort_keys, descending, parse_keys = sort_spec(sort_by, q)
 
-        # Count total results (before pagination)
-        count_query = select(func.count()).select_from(query.subquery())
-        count_result = await db.execute(count_query)
-        total = count_result.scalar()
+        # Total, exact or from the planner estimate (before pagination)
+        total, total_is_estimate = await _count(db, filtered, count)
 
-        # Apply pagination
-        query = query.offset(offset).limit(limit)
+        # Apply pagination: keyset after the cursor, else OFFSET
+        after = []
+        if cursor:
+            cursor_sort, *keys, last_id = decode_values(cursor, str, *parse_keys, uuid.UUID)
+            if cursor_sort != sort_by:
+                raise HTTPException(status_code=400, detail="Cursor does not match sort_by")
+            after.append(keyset_after((*sort_keys, Image.id), (*keys, last_id), descending))
+            offset = 0
+        query = search_page_query(filtered, sort_keys, descending, *after)
+        query = query.offset(offset).limit(limit + 1)
 
         # Execute main query
         result = await db.execute(query)
         images = result.mappings().all()
+        has_next = len(images) > limit
+        images = images[:limit]
+        next_cursor = None
+        if has_next:
+            last = images[-1]
+            keys = (last[f"sort_key_{n}"] for n in range(len(sort_keys)))
+            next_cursor = encode_cursor(sort_by, *keys, last.id)
 
         # Format response
         formatted_results = []
@@ -183,8 +138,7 @@ async def search_images(
             )
             
             # Extract original dimensions
-            exif_data = img.exif_data or {}
-            original_dims = exif_data.get('original_dimensions', {})
+            original_dims = img.original_dimensions or {}
             dimensions = None
             if img.width and img.height:
                 dimensions = f"{img.width}×{img.height}"
@@ -204,8 +158,8 @@ async def search_images(
                 "processing_time_ms": img.processing_time_ms,
                 "operations": img.applied_steps or [],
                 "project_name": project_name,
-                "crop_mode": exif_data.get('crop_mode'),
-                "aspect_ratio": exif_data.get('target_aspect_ratio'),
+                "crop_mode": img.crop_mode,
+                "aspect_ratio": img.target_aspect_ratio,
                 "has_processed_output": bool(img.processed_url)
             })
 
@@ -213,11 +167,13 @@ async def search_images(
             "results": formatted_results,
             "pagination": {
                 "total": total,
+                "total_is_estimate": total_is_estimate,
                 "limit": limit,
                 "offset": offset,
-                "has_next": offset + limit < total,
-                "pages": (total + limit - 1) // limit,
-                "current_page": (offset // limit) + 1
+                "has_next": has_next,
+                "next_cursor": next_cursor,
+                "pages": (total + limit - 1) // limit if total is not None else None,
+                "current_page": (offset // limit) + 1 if not cursor else None
             }
         }
 
@@ -292,16 +248,12 @@ async def get_search_filters(
         ]
 
         # Get unique aspect ratios
-        aspect_query = text("""
-            SELECT 
-                exif_data->>'target_aspect_ratio' as aspect_ratio,
-                COUNT(*) as count
-            FROM images 
-            WHERE exif_data->>'target_aspect_ratio' IS NOT NULL
-            """ + (f"AND user_id = '{target_user_id}'" if target_user_id else "") + """
-            GROUP BY exif_data->>'target_aspect_ratio'
-            ORDER BY count DESC
-        """)
+        aspect_query = select(
+            Image.target_aspect_ratio.label('aspect_ratio'),
+            func.count(Image.id).label('count')
+        ).where(
+            Image.target_aspect_ratio.isnot(None), *user_filter
+        ).group_by(Image.target_aspect_ratio).order_by(desc('count'))
         
         aspect_result = await db.execute(aspect_query)
         aspect_ratios = [
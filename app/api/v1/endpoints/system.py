@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+from app.api import deps
+from app.core import startup
+from app.models.auth import User
+from app.services.image_processing.inference_batcher import batcher_stats
+from app.services.image_processing.model_registry import models
+from app.services.image_processing.stage_cache import get_stage_cache
+from app.services.result_cache import get_result_cache
+
+router = APIRouter()
+require_admin = deps.PermissionChecker(["admin"])
+
+
+@router.get("/cache")
+async def cache_stats(current_user: User = Depends(require_admin)):
+    result_cache = get_result_cache()
+    stage_cache = get_stage_cache()
+    return {
+        "result_cache": (
+            {"enabled": True, **result_cache.snapshot()} if result_cache else {"enabled": False}
+        ),
+        # Per process: with PROCESSING_BACKEND=process each pool worker keeps
+        # its own memory tier, and only the shared disk tier shows up here.
+        "stage_cache": (
+            {"enabled": True, **stage_cache.snapshot()} if stage_cache else {"enabled": False}
+        ),
+    }
+
+
+@router.get("/inference")
+async def inference_stats(current_user: User = Depends(require_admin)):
+    return {"batchers": batcher_stats()}
+
+
+@router.get("/models")
+async def model_stats(current_user: User = Depends(require_admin)):
+    return models.snapshot()
+
+
+@router.get("/startup")
+async def startup_stats(current_user: User = Depends(require_admin)):
+    return startup.report()
@@ -6,6 +6,8 @@ from app.api.v1.endpoints import reports
 from app.api.v1.endpoints import user
 from app.api.v1.endpoints import room_visualizer
 from app.api.v1.endpoints import search
+from app.api.v1.endpoints import jobs
+from app.api.v1.endpoints import system
 
 
 
@@ -15,6 +17,7 @@ from app.api.v1.endpoints import search
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(assets.router, prefix="/assets", tags=["assets"]) 
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
 api_router.include_router(reports.router, prefix="/reports", tags=["reports"])  
 api_router.include_router(search.router, prefix="/search", tags=["search"])
 api_router.include_router(user.router, prefix="/users", tags=["users"])
@@ -24,4 +27,5 @@ api_router.include_router(
     tags=["room-visualizer"]
 )
 api_router.include_router(dashboard.router, prefix="/dashboard", tags=["analytics"])
+api_router.include_router(system.router, prefix="/system", tags=["system"])
 
@@ -18,11 +18,100 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
 
     REDIS_HOST: str = "localhost"
+    REDIS_PORT: int = 6379
+
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_DIR: str = "cache/results"
+    RESULT_CACHE_TTL_SEC: int = 7 * 24 * 3600
+    RESULT_CACHE_DISK_MB: int = 256
+    RESULT_CACHE_REDIS: bool = False
+
+    STAGE_CACHE_ENABLED: bool = True
+    STAGE_CACHE_MEMORY_MB: int = 512
+    STAGE_CACHE_DIR: str = "cache/stages"
+    STAGE_CACHE_DISK_MB: int = 4096
+
+    # Intermediate masks and step outputs, written in the background to
+    # DEBUG_ARTIFACTS_DIR/<run>/ for runs with options["debug"] or sampled
+    # at DEBUG_ARTIFACTS_SAMPLE_RATE. Nothing is written unless enabled.
+    DEBUG_ARTIFACTS_ENABLED: bool = False
+    DEBUG_ARTIFACTS_DIR: str = "cache/debug"
+    DEBUG_ARTIFACTS_SAMPLE_RATE: float = 0.0
+
+    # Files written to storage in parallel by one bulk upload request.
+    UPLOAD_CONCURRENCY: int = 8
+    # Resumable uploads: parts are staged on local disk until /complete.
+    UPLOAD_STAGING_DIR: str = "cache/uploads"
+    UPLOAD_PART_SIZE_MB: int = 8
+    # Also the limit ImageFetcher downloads for processing, so nothing can be
+    # uploaded that the pipeline then refuses to fetch.
+    UPLOAD_MAX_FILE_MB: int = 50
+    UPLOAD_STAGING_TTL_SEC: int = 86400
+    # Images downloaded in parallel while streaming a project ZIP.
+    ZIP_FETCH_CONCURRENCY: int = 8
+    # Images returned per upload in a gallery page; the rest via load-more cursors.
+    GALLERY_IMAGES_PER_UPLOAD: int = 24
+    # /search/images?count=estimate: above this planner estimate, report it instead of counting.
+    SEARCH_EXACT_COUNT_THRESHOLD: int = 10000
+
+    JOB_POLL_INTERVAL_SEC: float = 1.0
+    JOB_HEARTBEAT_SEC: int = 30
+    JOB_STALE_AFTER_SEC: int = 300
+    JOB_MAX_ATTEMPTS: int = 3
+    WORKER_CONCURRENCY: int = 1
+    # "thread" runs the pipeline in the event loop's thread pool; "process"
+    # uses a pool of spawned worker processes so CPU-bound steps use all cores.
+    PROCESSING_BACKEND: str = "thread"
+    PROCESS_POOL_SIZE: int = 0  # 0 = os.cpu_count()
+    PROCESS_POOL_MAX_TASKS_PER_CHILD: int = 50
+    PROCESS_POOL_MAX_WORKER_MEMORY_MB: int = 0  # 0 = no RSS ceiling
+    PROCESS_POOL_PRELOAD_MODELS: List[str] = ["wm_detector", "lama", "remover", "rembg_session"]
+    PROCESS_POOL_TORCH_THREADS: int = 1
+    # Concurrent calls to the same model are merged into one batched forward
+    # pass (per process) of up to INFERENCE_MAX_BATCH items.
+    INFERENCE_BATCHING_ENABLED: bool = True
+    INFERENCE_MAX_BATCH: int = 8
+    INFERENCE_MAX_WAIT_MS: int = 30
+    # Longest a caller waits for its batched result before giving up.
+    INFERENCE_TIMEOUT_S: float = 300.0
+
+    # Models load on first use; when their combined size exceeds the budget
+    # the least recently used are dropped. PRELOAD_MODELS are loaded at API
+    # startup (names as in model_registry, plus "segmenters" for all seven).
+    MODEL_MEMORY_BUDGET_MB: int = 0  # 0 = unlimited
+    PRELOAD_MODELS: List[str] = []
+    # Models used by earlier runs are recorded here and preloaded (in the
+    # background, gated by /health/ready) on the next start. "" disables it.
+    WARM_START_FILE: str = "cache/warm_start.json"
+    # Log per-package import times and startup phases once ready.
+    STARTUP_PROFILE: bool = False
+
+    # "torch" or "onnx"; ONNX models come from the segmenter_onnx export tool.
+    SEGMENTER_BACKEND: str = "torch"
+    SEGMENTER_ONNX_DIR: str = "models/onnx"
+    SEGMENTER_ONNX_QUANTIZED: bool = False
+    ONNX_INTRA_OP_THREADS: int = 0  # 0 = onnxruntime default (all cores)
+    ONNX_INTER_OP_THREADS: int = 1
 
     CLOUDINARY_CLOUD_NAME: Optional[str] = None
     CLOUDINARY_API_KEY: Optional[str] = None
     CLOUDINARY_API_SECRET: Optional[str] = None
     CLOUDINARY_UPLOAD_PRESET: Optional[str] = None
+
+    # Storage backends (STORAGE_PROVIDER = local | s3 | cloudinary).
+    LOCAL_STORAGE_BASE_URL: str = "http://localhost:8000"
+    S3_BUCKET: Optional[str] = None
+    S3_REGION: str = "us-east-1"
+    S3_ENDPOINT_URL: Optional[str] = None  # MinIO / R2 / moto server
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_PUBLIC_BASE_URL: Optional[str] = None  # CDN in front of the bucket
+    STORAGE_MULTIPART_THRESHOLD_MB: int = 16
+    STORAGE_MULTIPART_CHUNK_MB: int = 8
+    STORAGE_MULTIPART_CONCURRENCY: int = 4
+    STORAGE_PRESIGN_EXPIRES_SEC: int = 3600
+    STORAGE_DELETE_CONCURRENCY: int = 4  # bulk-delete calls in flight
+    BATCH_DELETE_MAX: int = 1000  # image ids per DELETE /assets/batch
     @field_validator("DATABASE_URL", mode="before")
     @classmethod
     def assemble_db_connection(cls, v: Optional[str]) -> str:
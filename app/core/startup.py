@@ -0,0 +1,126 @@
+"""Startup profiling, readiness and the warm-start model snapshot."""
+import importlib.abc
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_t0 = time.perf_counter()
+_import_ms: Dict[str, float] = {}
+_marks: Dict[str, float] = {}
+_ready = threading.Event()
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, loader, name: str):
+        self._loader = loader
+        self._name = name
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            _import_ms[self._name] = (time.perf_counter() - start) * 1000
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """Times the first import of every top-level package (inclusive of the
+    packages it pulls in). Only installed when STARTUP_PROFILE is on."""
+
+    def find_spec(self, name, path, target=None):
+        if "." in name:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, name)
+        return spec
+
+
+def install_import_timer() -> None:
+    if not any(isinstance(f, _ImportTimer) for f in sys.meta_path):
+        sys.meta_path.insert(0, _ImportTimer())
+
+
+def mark(event: str) -> None:
+    """Record the time since process start-up for a named startup phase."""
+    _marks[event] = round((time.perf_counter() - _t0) * 1000, 1)
+
+
+def mark_ready() -> None:
+    mark("ready")
+    _ready.set()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def report(top: int = 25) -> dict:
+    slowest = sorted(_import_ms.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    result = {
+        "ready": is_ready(),
+        "phases_ms": dict(_marks),
+        "imports_ms": {name: round(ms, 1) for name, ms in slowest},
+    }
+    registry = sys.modules.get("app.services.image_processing.model_registry")
+    if registry is not None:
+        snap = registry.models.snapshot()
+        result["model_loads_ms"] = {m["name"]: m["load_ms"] for m in snap["loaded"]}
+    return result
+
+
+# ── Warm-start snapshot ──────────────────────────────────────────────────────
+# Names of the models this deployment actually used, written as they load so
+# the next pod can preload exactly those before reporting ready.
+
+_snapshot_lock = threading.Lock()
+
+
+def load_warm_start(path: Optional[str]) -> List[str]:
+    if not path:
+        return []
+    try:
+        with open(path) as f:
+            return list(json.load(f).get("models", []))
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable warm-start snapshot {path}: {e}")
+        return []
+
+
+def record_warm_start(path: Optional[str], name: str) -> None:
+    if not path:
+        return
+    with _snapshot_lock:
+        names = load_warm_start(path)
+        if name in names:
+            return
+        names.append(name)
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"models": names, "updated_at": time.time()}, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not update warm-start snapshot {path}: {e}")
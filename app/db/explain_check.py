@@ -0,0 +1,166 @@
+"""Query-plan regression check for the images/uploads hot paths.
+
+    python -m app.db.explain_check [--users 50] [--uploads-per-user 20] [--images-per-upload 50]
+
+Seeds a synthetic dataset inside a transaction, ANALYZEs it, runs EXPLAIN
+on the queries the gallery, search, dashboard, projects and repository code
+issue, and exits 1 if any of them plans a sequential scan on ``images`` or
+``uploads``. The transaction is rolled back, so nothing (including the
+statistics) is left behind. Point DATABASE_URL at a migrated database.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import uuid
+from typing import Iterator, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.db.explain import Explain
+from app.models.assets import Upload
+from app.models.project import Project
+from app.services.image_search import search_count_query, search_page_query, search_query, sort_spec
+from app.services.repositories import (
+    gallery_page_query,
+    overview_step_counts_query,
+    overview_summary_query,
+    project_image_count_query,
+    project_image_counts_query,
+    projects_page_query,
+    recent_images_query,
+    unfinished_count_query,
+    upload_confidence_query,
+    upload_images_query,
+    upload_step_counts_query,
+    upload_summary_query,
+)
+
+logger = logging.getLogger(__name__)
+
+_CHECKED_RELATIONS = {"images", "uploads"}
+
+
+def _seq_scans(plan: dict) -> Iterator[str]:
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in _CHECKED_RELATIONS:
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from _seq_scans(child)
+
+
+_SEED = [
+    """
+    INSERT INTO users (id, email, hashed_password, full_name, role, is_active)
+    SELECT gen_random_uuid(), 'explain-' || :tag || '-' || g || '@example.invalid',
+           'x', 'explain-' || :tag || '-' || g, 'user', true
+    FROM generate_series(1, :users) g
+    """,
+    """
+    INSERT INTO projects (id, user_id, name)
+    SELECT gen_random_uuid(), u.id, 'explain project'
+    FROM users u WHERE u.email LIKE 'explain-' || :tag || '-%'
+    """,
+    """
+    INSERT INTO uploads (id, user_id, project_id, status, created_at)
+    SELECT gen_random_uuid(), p.user_id, p.id, 'completed',
+           now() - random() * interval '365 days'
+    FROM projects p
+    JOIN users u ON u.id = p.user_id AND u.email LIKE 'explain-' || :tag || '-%'
+    CROSS JOIN generate_series(1, :uploads)
+    """,
+    """
+    INSERT INTO images (id, upload_id, user_id, url, name, processing_status, created_at)
+    SELECT gen_random_uuid(), up.id, up.user_id, 'https://example.invalid/' || g, 'img-' || g,
+           CASE WHEN random() < 0.02 THEN 'pending' ELSE 'completed' END,
+           up.created_at
+    FROM uploads up
+    JOIN users u ON u.id = up.user_id AND u.email LIKE 'explain-' || :tag || '-%'
+    CROSS JOIN generate_series(1, :images) g
+    """,
+    "ANALYZE users, projects, uploads, images",
+]
+
+
+def _search_page(sort_by: str, q=None, **filters):
+    sort_keys, descending, _ = sort_spec(sort_by, q)
+    return search_page_query(search_query(q=q, **filters), sort_keys, descending).limit(51)
+
+
+def _queries(user_id, upload_id, project_id) -> list:
+    # Everything here is built by the same functions the endpoints call.
+    # Whole-table aggregates (the all-users dashboard summary and step
+    # counts) read every row by design and are left out.
+    return [
+        ("gallery page (user)", gallery_page_query([Upload.user_id == user_id], 21, 25)),
+        ("gallery page (all users)", gallery_page_query([], 51, 25)),
+        ("upload images", upload_images_query(upload_id)),
+        ("unfinished count", unfinished_count_query(upload_id)),
+        ("search newest (user)", _search_page("newest", user_id=user_id)),
+        ("search oldest (user)", _search_page("oldest", user_id=user_id)),
+        ("search relevance (user)", _search_page("relevance", "kettle", user_id=user_id)),
+        ("search relevance (all users)", _search_page("relevance", "kettle")),
+        ("search count (user)", search_count_query(search_query(user_id, q="kettle"))),
+        ("search aspect ratio (user)", _search_page("newest", user_id=user_id, aspect_ratio="16:9")),
+        ("search operations (all users)", _search_page("newest", operations=["bg_remove"])),
+        ("dashboard upload summary", upload_summary_query(upload_id)),
+        ("dashboard upload steps", upload_step_counts_query(upload_id)),
+        ("dashboard upload confidence", upload_confidence_query(upload_id)),
+        ("dashboard overview summary (user)", overview_summary_query(user_id)),
+        ("dashboard overview steps (user)", overview_step_counts_query(user_id)),
+        ("dashboard recent (user)", recent_images_query(user_id)),
+        ("dashboard recent (all users)", recent_images_query()),
+        ("project image count", project_image_count_query(project_id)),
+        ("project image counts", project_image_counts_query([project_id])),
+        ("project list", projects_page_query(user_id, None, 0, 20)),
+    ]
+
+
+async def run(users: int, uploads: int, images: int) -> int:
+    engine = create_async_engine(settings.DATABASE_URL)
+    failed = 0
+    try:
+        async with engine.connect() as conn:
+            trans = await conn.begin()
+            try:
+                tag = uuid.uuid4().hex[:8]
+                params = {"tag": tag, "users": users, "uploads": uploads, "images": images}
+                for statement in _SEED:
+                    await conn.execute(text(statement), params)
+                row = (await conn.execute(
+                    select(Upload.user_id, Upload.id, Upload.project_id)
+                    .join(Project, Project.id == Upload.project_id)
+                    .where(Project.name == "explain project")
+                    .order_by(Upload.created_at.desc()).limit(1)
+                )).one()
+                logger.info(f"seeded {users * uploads * images} images ({users} users × {uploads} uploads)")
+
+                for name, statement in _queries(*row):
+                    plan = (await conn.execute(Explain(statement))).scalar()
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    scans = sorted(set(_seq_scans(plan[0]["Plan"])))
+                    failed += bool(scans)
+                    logger.info(f"{'FAIL' if scans else 'ok  '} {name}"
+                                + (f": Seq Scan on {', '.join(scans)}" if scans else ""))
+            finally:
+                await trans.rollback()
+    finally:
+        await engine.dispose()
+    return 1 if failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--uploads-per-user", type=int, default=20)
+    parser.add_argument("--images-per-upload", type=int, default=50)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    return asyncio.run(run(args.users, args.uploads_per_user, args.images_per_upload))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,21 @@
 import os
 import logging
-import uvicorn
 import asyncio
 from contextlib import asynccontextmanager
 import sys
+from app.core import startup
+from app.core.config import settings
+if settings.STARTUP_PROFILE:
+    startup.install_import_timer()
+import uvicorn
 import huggingface_hub
 if not hasattr(huggingface_hub, "cached_download"):
     huggingface_hub.cached_download = huggingface_hub.hf_hub_download
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from app.api.v1.router import api_router
-from app.core.config import settings
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
@@ -20,19 +24,40 @@ logging.basicConfig(
 )
 logging.getLogger("app").setLevel(logging.INFO)
 logger = logging.getLogger(__name__)
+async def _warm_up():
+    """Load models in the background; /health/ready flips once this is done."""
+    from app.services.image_processing.executor import get_process_engine, uses_process_pool
+    from app.services.image_processing.model_registry import preload_model
+    try:
+        if uses_process_pool():
+            # Models live in the pool workers; loading them here too would only
+            # duplicate memory in the API process.
+            logger.info("Starting processing pool...")
+            await get_process_engine().warm()
+        else:
+            names = list(dict.fromkeys(
+                settings.PRELOAD_MODELS + startup.load_warm_start(settings.WARM_START_FILE)
+            ))
+            if names:
+                logger.info(f"Preloading models: {names}")
+                await asyncio.gather(*(asyncio.to_thread(preload_model, name) for name in names))
+    except Exception:
+        logger.exception("Model warm-up failed; serving with lazy loading")
+    startup.mark_ready()
+    if settings.STARTUP_PROFILE:
+        logger.info(f"Startup profile: {startup.report()}")
+    logger.info("Models ready.")
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    from app.services.image_processing.model_registry import (
-        get_wm_detector, get_lama, get_all_segmenters,
-    )
-    logger.info("Preloading heavy models...")
-    await asyncio.gather(
-        asyncio.to_thread(get_wm_detector),
-        asyncio.to_thread(get_lama),
-        asyncio.to_thread(get_all_segmenters),
-    )
-    logger.info("Models ready.")
+    from app.services.image_processing.executor import shutdown_engine
+    from app.services.image_processing.model_registry import models
+    startup.mark("lifespan_start")
+    models.add_listener(lambda name: startup.record_warm_start(settings.WARM_START_FILE, name))
+    warm_up = asyncio.create_task(_warm_up())
     yield
+    if not warm_up.done():
+        warm_up.cancel()
+    await asyncio.to_thread(shutdown_engine)
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
@@ -50,7 +75,7 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
-        expose_headers=["Content-Disposition"],
+        expose_headers=["Content-Disposition", "X-Next-Cursor"],
     )
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 @app.get("/")
@@ -66,6 +91,12 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+@app.get("/health/ready")
+def readiness_check():
+    if not startup.is_ready():
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
+startup.mark("app_imported")
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run("app.main:app", host="0.0.0.0", port=port, reload=False, log_level="info")
\ No newline at end of file
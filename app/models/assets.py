@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, Integer,Boolean, Text, Numeric
+from sqlalchemy import Column, String, ForeignKey, Integer,Boolean, Text, Numeric, Index, Float
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy import text
 from sqlalchemy.orm import relationship
@@ -10,6 +10,13 @@ class Upload(Base):
     status=Column(String,server_default='uploaded')
     project = relationship("Project", back_populates="uploads") 
     metadata_obj=Column('metadata',JSONB,server_default=text("'{}'::jsonb"))
+    __table_args__ = (
+        Index('ix_uploads_user_id_created_at', 'user_id', 'created_at', 'id'),
+        Index('ix_uploads_created_at', 'created_at', 'id'),
+        Index('ix_uploads_project_id', 'project_id'),
+        Index('ix_uploads_project_name_trgm', text("(metadata ->> 'project_name') gin_trgm_ops"),
+              postgresql_using='gin'),
+    )
 
 class Image(Base):
     __tablename__='images'
@@ -29,6 +36,28 @@ class Image(Base):
     embeddings_id=Column(String)
     processed_url=Column(String)
     processing_status=Column(String,server_default='pending')
+    # Typed copies of hot JSONB fields (written alongside the JSONB, see
+    # migration e5c9a0b7d314): exif_data crop settings, confidence_scores.
+    crop_mode = Column(String)
+    target_aspect_ratio = Column(String)
+    bg_clean_score = Column(Float)
+    shadow_score = Column(Float)
+    crop_score = Column(Float)
+    __table_args__ = (
+        Index('ix_images_user_id_created_at', 'user_id', 'created_at', 'id'),
+        Index('ix_images_created_at', 'created_at', 'id'),
+        Index('ix_images_upload_id_created_at', 'upload_id', 'created_at', 'id'),
+        Index('ix_images_upload_id_status', 'upload_id', 'processing_status'),
+        Index('ix_images_user_id_status', 'user_id', 'processing_status'),
+        Index('ix_images_unfinished', 'upload_id',
+              postgresql_where=text("processing_status IN ('pending', 'processing')")),
+        Index('ix_images_name_trgm', 'name', postgresql_using='gin',
+              postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('ix_images_user_id_aspect_ratio', 'user_id', 'target_aspect_ratio'),
+        Index('ix_images_user_id_crop_mode', 'user_id', 'crop_mode'),
+        Index('ix_images_applied_steps', 'applied_steps', postgresql_using='gin',
+              postgresql_ops={'applied_steps': 'jsonb_path_ops'}),
+    )
 
 class Model3D(Base):
     __tablename__='models_3d'
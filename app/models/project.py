@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, Text,Integer
+from sqlalchemy import Column, String, ForeignKey, Text,Integer, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy import text
@@ -16,4 +16,10 @@ class Project(Base):
     image_count = Column(Integer, default=0)
     
     # Relationships
-    uploads = relationship("Upload", back_populates="project")
\ No newline at end of file
+    uploads = relationship("Upload", back_populates="project")
+
+    __table_args__ = (
+        Index('ix_projects_user_id_created_at', 'user_id', 'created_at'),
+        Index('ix_projects_name_trgm', 'name', postgresql_using='gin',
+              postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
\ No newline at end of file
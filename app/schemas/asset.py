@@ -23,6 +23,16 @@ class FailedFile(BaseModel):
     filename: str
     error: str
 
+class ChunkedUploadInit(BaseModel):
+    filename: str
+    content_type: str
+    size: int
+    sha256: Optional[str] = None
+    project_name: Optional[str] = None
+    original_dimensions: Optional[dict] = None
+    crop_settings: Optional[dict] = None
+    user_id: Optional[str] = None
+
 class BatchUploadResponse(BaseModel):
     upload_id: str
     images: list[BatchImageItem]
@@ -0,0 +1,257 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from typing import AsyncIterator, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_META = "meta.json"
+_ASSEMBLED = "assembled"
+_CLAIM = "completing"
+_RESULT = "result.json"
+# A claim older than this was left by a crashed /complete and may be taken over.
+_CLAIM_STALE_SEC = 900
+
+
+class ChunkedUploadError(Exception):
+    pass
+
+
+class UploadSessionNotFound(ChunkedUploadError):
+    pass
+
+
+class UploadCompletionInProgress(ChunkedUploadError):
+    pass
+
+
+def _part_name(number: int) -> str:
+    return f"part_{number:05d}"
+
+
+class ChunkedUploadStore:
+    """Staging area for resumable uploads: one directory per session.
+
+    A part is streamed to a temp file, checked, then renamed into place, so
+    a part file on disk is always complete; the list of received parts is
+    read from the directory, which lets clients upload parts in parallel
+    and resume after a dropped connection by asking which parts are there.
+
+    Completion is claimed with an exclusively created marker file, so one
+    request assembles and stores the file; its response is kept with the
+    session until it is pruned and returned to repeated /complete calls.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self._root = root or settings.UPLOAD_STAGING_DIR
+
+    def _dir(self, session_id: str) -> str:
+        # Session ids are uuid hex; anything else can't name a session.
+        if not session_id.isalnum():
+            raise UploadSessionNotFound(session_id)
+        return os.path.join(self._root, session_id)
+
+    def create(
+        self,
+        user_id: str,
+        filename: str,
+        content_type: str,
+        size: int,
+        sha256: Optional[str] = None,
+        extra: Optional[dict] = None,
+    ) -> dict:
+        if size <= 0:
+            raise ChunkedUploadError("size must be positive")
+        if size > settings.UPLOAD_MAX_FILE_MB * 2**20:
+            raise ChunkedUploadError(f"File exceeds {settings.UPLOAD_MAX_FILE_MB} MB")
+        self.prune_stale()
+        part_size = settings.UPLOAD_PART_SIZE_MB * 2**20
+        meta = {
+            "session_id": uuid.uuid4().hex,
+            "user_id": str(user_id),
+            "filename": filename,
+            "content_type": content_type,
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+            "part_size": part_size,
+            "total_parts": -(-size // part_size),
+            "created_at": time.time(),
+            "extra": extra or {},
+        }
+        path = self._dir(meta["session_id"])
+        os.makedirs(path)
+        with open(os.path.join(path, _META), "w") as f:
+            json.dump(meta, f)
+        return meta
+
+    def load(self, session_id: str, user_id: str) -> dict:
+        try:
+            with open(os.path.join(self._dir(session_id), _META)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise UploadSessionNotFound(session_id)
+        if meta["user_id"] != str(user_id):
+            raise UploadSessionNotFound(session_id)
+        return meta
+
+    def received_parts(self, meta: dict) -> list[int]:
+        path = self._dir(meta["session_id"])
+        return sorted(
+            int(name[5:]) for name in os.listdir(path)
+            if name.startswith("part_") and name[5:].isdigit()
+        )
+
+    def expected_part_size(self, meta: dict, number: int) -> int:
+        if not 1 <= number <= meta["total_parts"]:
+            raise ChunkedUploadError(f"Part number must be 1..{meta['total_parts']}")
+        if number < meta["total_parts"]:
+            return meta["part_size"]
+        return meta["size"] - meta["part_size"] * (meta["total_parts"] - 1)
+
+    async def write_part(
+        self,
+        meta: dict,
+        number: int,
+        chunks: AsyncIterator[bytes],
+        sha256: Optional[str] = None,
+    ) -> dict:
+        """Stream one part to disk, verifying its size and (optional) SHA-256.
+        Re-sending a part replaces it."""
+        expected = self.expected_part_size(meta, number)
+        path = self._dir(meta["session_id"])
+        if os.path.exists(os.path.join(path, _RESULT)):
+            raise ChunkedUploadError("Upload is already complete")
+        final = os.path.join(path, _part_name(number))
+        tmp = f"{final}.{uuid.uuid4().hex[:8]}.tmp"
+        digest = hashlib.sha256()
+        written = 0
+        f = await run_in_threadpool(open, tmp, "wb")
+        try:
+            async for chunk in chunks:
+                written += len(chunk)
+                if written > expected:
+                    raise ChunkedUploadError(f"Part {number} exceeds {expected} bytes")
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+            await run_in_threadpool(f.close)
+            if written != expected:
+                raise ChunkedUploadError(f"Part {number} is {written} bytes, expected {expected}")
+            if sha256 and digest.hexdigest() != sha256.lower():
+                raise ChunkedUploadError(f"Part {number} checksum mismatch")
+            os.replace(tmp, final)
+        except BaseException:
+            f.close()
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return {"part": number, "size": written, "sha256": digest.hexdigest()}
+
+    def assemble(self, meta: dict) -> str:
+        """Concatenate all parts into one file (blocking; run in a thread) and
+        verify the whole-file size and checksum. Returns the file path."""
+        missing = sorted(set(range(1, meta["total_parts"] + 1)) - set(self.received_parts(meta)))
+        if missing:
+            raise ChunkedUploadError(f"Missing parts: {missing[:20]}")
+        path = self._dir(meta["session_id"])
+        out_path = os.path.join(path, _ASSEMBLED)
+        digest = hashlib.sha256()
+        with open(out_path, "wb") as out:
+            for number in range(1, meta["total_parts"] + 1):
+                with open(os.path.join(path, _part_name(number)), "rb") as part:
+                    while True:
+                        block = part.read(1024 * 1024)
+                        if not block:
+                            break
+                        digest.update(block)
+                        out.write(block)
+        if os.path.getsize(out_path) != meta["size"]:
+            os.remove(out_path)
+            raise ChunkedUploadError("Assembled size does not match the declared size")
+        if meta["sha256"] and digest.hexdigest() != meta["sha256"]:
+            os.remove(out_path)
+            raise ChunkedUploadError("File checksum mismatch")
+        return out_path
+
+    def claim(self, meta: dict) -> Optional[dict]:
+        """Take the session's completion claim. Returns the stored response
+        instead (claiming nothing) if the session was completed already;
+        raises UploadCompletionInProgress while another request holds it."""
+        result = self.result(meta)
+        if result is not None:
+            return result
+        claim_path = os.path.join(self._dir(meta["session_id"]), _CLAIM)
+        try:
+            os.close(os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            try:
+                stale = time.time() - os.path.getmtime(claim_path) > _CLAIM_STALE_SEC
+            except FileNotFoundError:
+                stale = False
+            if not stale:
+                raise UploadCompletionInProgress(meta["session_id"])
+            # Rename is atomic: only one request takes over a stale claim.
+            taken = f"{claim_path}.{uuid.uuid4().hex[:8]}"
+            try:
+                os.rename(claim_path, taken)
+            except FileNotFoundError:
+                raise UploadCompletionInProgress(meta["session_id"])
+            os.remove(taken)
+            logger.warning(f"Took over stale completion claim of {meta['session_id']}")
+            return self.claim(meta)
+        # A request that finished between the check and the claim left its result.
+        result = self.result(meta)
+        if result is not None:
+            self.release(meta)
+        return result
+
+    def result(self, meta: dict) -> Optional[dict]:
+        try:
+            with open(os.path.join(self._dir(meta["session_id"]), _RESULT)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def release(self, meta: dict) -> None:
+        """Give up a claim after a failed completion, so the client can retry."""
+        try:
+            os.remove(os.path.join(self._dir(meta["session_id"]), _CLAIM))
+        except FileNotFoundError:
+            pass
+
+    def finish(self, meta: dict, result: dict) -> None:
+        """Record the completion response and drop the staged data; the
+        session itself stays until pruned so retries get ``result``."""
+        path = self._dir(meta["session_id"])
+        tmp = os.path.join(path, f"{_RESULT}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(result, f, default=str)
+        os.replace(tmp, os.path.join(path, _RESULT))
+        for name in os.listdir(path):
+            if name.startswith("part_") or name == _ASSEMBLED:
+                os.remove(os.path.join(path, name))
+        self.release(meta)
+
+    def discard(self, session_id: str) -> None:
+        shutil.rmtree(self._dir(session_id), ignore_errors=True)
+
+    def prune_stale(self) -> None:
+        """Drop sessions idle for longer than UPLOAD_STAGING_TTL_SEC."""
+        if not os.path.isdir(self._root):
+            return
+        cutoff = time.time() - settings.UPLOAD_STAGING_TTL_SEC
+        for name in os.listdir(self._root):
+            path = os.path.join(self._root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+                    logger.info(f"Pruned stale upload session {name}")
+            except OSError:
+                continue
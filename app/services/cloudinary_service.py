@@ -1,6 +1,4 @@
 import logging
-import cloudinary
-import cloudinary.uploader
 
 logger = logging.getLogger(__name__)
 
@@ -23,16 +21,3 @@ def extract_cloudinary_public_id(url: str) -> str:
         logger.error(f"Failed to extract public_id from URL {url}: {e}")
         return None
 
-
-async def delete_from_cloudinary(public_id: str) -> bool:
-    try:
-        result = cloudinary.uploader.destroy(public_id)
-        if result.get("result") == "ok":
-            logger.info(f"Successfully deleted from Cloudinary: {public_id}")
-            return True
-        else:
-            logger.warning(f"Cloudinary deletion returned: {result.get('result')} for {public_id}")
-            return False
-    except Exception as e:
-        logger.error(f"Cloudinary deletion error for {public_id}: {e}")
-        raise
\ No newline at end of file
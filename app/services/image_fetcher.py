@@ -1,9 +1,12 @@
 import os
+import asyncio
 import logging
-from typing import Optional
+from typing import AsyncIterator, Optional, Sequence, Tuple
 from urllib.parse import urlparse
 import httpx
 from fastapi.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services.storage import get_storage
 logger = logging.getLogger(__name__)
 _http_client: Optional[httpx.AsyncClient] = None
 def _get_shared_client() -> httpx.AsyncClient:
@@ -28,11 +31,11 @@ class ImageFetcher:
     def __init__(
         self,
         local_base_path: str = "static/uploads",
-        max_size_bytes: int = 50 * 1024 * 1024,  
+        max_size_bytes: Optional[int] = None,
         http_client: Optional[httpx.AsyncClient] = None,
     ):
         self._local_base = os.path.abspath(local_base_path)
-        self._max_size = max_size_bytes
+        self._max_size = max_size_bytes or settings.UPLOAD_MAX_FILE_MB * 1024 * 1024
         self._client = http_client
     async def fetch(self, url: str) -> bytes:
         if "localhost" in url and "static/uploads" in url:
@@ -40,7 +43,40 @@ class ImageFetcher:
                 return await self._fetch_local(url)
             except ImageFetchError:
                 logger.info(f"Local fallback failed for {url}, trying remote")
-        return await self._fetch_remote(url)
+        return await self._fetch_remote(await get_storage().fetch_url(url))
+    async def fetch_many(
+        self, urls: Sequence[str], concurrency: int
+    ) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+        """Yield ``(index, content)`` as downloads finish, keeping at most
+        ``concurrency`` in flight. Failed fetches yield ``None`` content."""
+        async def fetch_one(index: int, url: str) -> Tuple[int, Optional[bytes]]:
+            try:
+                return index, await self.fetch(url)
+            except ImageFetchError as e:
+                logger.warning(f"Skipping {url}: {e}")
+                return index, None
+
+        queued = iter(enumerate(urls))
+        pending: set = set()
+
+        def top_up():
+            while len(pending) < max(1, concurrency):
+                item = next(queued, None)
+                if item is None:
+                    break
+                pending.add(asyncio.create_task(fetch_one(*item)))
+
+        top_up()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                pending.difference_update(done)
+                top_up()
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
     async def _fetch_local(self, url: str) -> bytes:
         filename = url.split("/")[-1]
         target = os.path.abspath(os.path.join(self._local_base, filename))
@@ -1,4 +1,4 @@
-from .orchestrator import ImageProcessor
+from .orchestrator import ImageProcessor, PIPELINE_VERSION
 from .registry import StepRegistry
 
-__all__ = ["ImageProcessor", "StepRegistry"]
+__all__ = ["ImageProcessor", "PIPELINE_VERSION", "StepRegistry"]
@@ -1,14 +1,37 @@
-import numpy as np
+from typing import Optional
+
 import cv2
+import numpy as np
+from .context import ProcessingContext
 from .utils import foreground_mask
 
+# Corner window, in full-resolution pixels.
+_CORNER_PX = 80
+
+
+def _gray_crop(image: np.ndarray, rows: slice, cols: slice) -> np.ndarray:
+    """Full-resolution crop converted to gray on its own; costs next to nothing."""
+    return cv2.cvtColor(np.ascontiguousarray(image[rows, cols, :3]), cv2.COLOR_BGR2GRAY)
+
 
 class ImageAnalyzer:
-    def analyze(self, image: np.ndarray, original: np.ndarray, resize_dims, operations) -> dict:
-        h, w = image.shape[:2]
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        fg = foreground_mask(image)
+    def analyze(
+        self,
+        image: np.ndarray,
+        original: np.ndarray,
+        resize_dims,
+        operations,
+        context: Optional[ProcessingContext] = None,
+    ) -> dict:
+        context = context or ProcessingContext()
+        # Area ratios survive downscaling, so they are read off the proxy.
+        # Corner noise does not (INTER_AREA averages it away), so the corner
+        # statistics use full-resolution crops.
+        small = context.proxy(image)
+        h, w = small.shape[:2]
+        gray = context.gray(small)
+        hsv = context.hsv(small)
+        fg = foreground_mask(small, gray)
         fg_ratio = np.sum(fg > 0) / (h * w)
         conf = {"bg_clean": 0.0, "shadow": 0.0,
                 "crop": 0.0, "watermark": 0.0, "resize": 0.0}
@@ -18,7 +41,11 @@ class ImageAnalyzer:
         if fg_ratio < 0.35:
             conf["crop"] = min(1.0, (0.5 - fg_ratio) * 3)
 
-        corner_std = np.mean([np.std(gray[:80, :80]), np.std(gray[:80, -80:])])
+        top = slice(None, _CORNER_PX)
+        corner_std = np.mean([
+            np.std(_gray_crop(image, top, slice(None, _CORNER_PX))),
+            np.std(_gray_crop(image, top, slice(-_CORNER_PX, None))),
+        ])
         conf["bg_clean"] = np.clip((corner_std - 10) / 20, 0, 1)
 
         v = hsv[:, :, 2]
@@ -27,20 +54,20 @@ class ImageAnalyzer:
         shadow_ratio = np.sum(shadow_mask) / (h * w)
         conf["shadow"] = np.clip(shadow_ratio * 40, 0, 1)
 
-        conf["watermark"] = self._watermark_confidence(gray, hsv, h, w)
+        conf["watermark"] = self._watermark_confidence(image, hsv, h, w)
 
         return conf
 
-    def _watermark_confidence(self, gray: np.ndarray, hsv: np.ndarray, h: int, w: int) -> float:
-        corner_h = min(80, h // 4)
-        corner_w = min(80, w // 4)
-
-        corners = [
-            gray[:corner_h, :corner_w],
-            gray[:corner_h, -corner_w:],
-            gray[-corner_h:, :corner_w],
-            gray[-corner_h:, -corner_w:],
-        ]
+    def _watermark_confidence(
+        self, image: np.ndarray, hsv: np.ndarray, h: int, w: int
+    ) -> float:
+        corner_h = min(_CORNER_PX, image.shape[0] // 4)
+        corner_w = min(_CORNER_PX, image.shape[1] // 4)
+        if corner_h == 0 or corner_w == 0:
+            return 0.0
+        rows = (slice(None, corner_h), slice(-corner_h, None))
+        cols = (slice(None, corner_w), slice(-corner_w, None))
+        corners = [_gray_crop(image, r, c) for r in rows for c in cols]
 
         corner_scores = []
         for corner in corners:
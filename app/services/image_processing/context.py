@@ -0,0 +1,114 @@
+import logging
+from typing import Dict, Hashable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .debug_sink import NULL_DEBUG_SINK, NullDebugSink
+from .inference_batcher import remover_alpha
+from .utils import PROXY_MAX_DIM, downscale_max_dim
+
+logger = logging.getLogger(__name__)
+
+
+def compute_product_alpha(image: np.ndarray) -> np.ndarray:
+    """Soft foreground alpha (uint8, 0-255) from the transparent-background model."""
+    h, w = image.shape[:2]
+    bgr = image[:, :, :3] if image.ndim == 3 and image.shape[2] == 4 else image
+    alpha = remover_alpha(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+    if alpha.shape != (h, w):
+        alpha = cv2.resize(alpha, (w, h), interpolation=cv2.INTER_LINEAR)
+    return alpha.astype(np.uint8)
+
+
+def estimate_foreground(image: np.ndarray, alpha: np.ndarray) -> np.ndarray:
+    """Product colours with the old background unmixed from soft edges.
+
+    The same pymatting estimate transparent-background applies for
+    ``type="rgba"``; compositing the raw pixels instead leaves a halo of the
+    old background around hair, fur and other semi-transparent edges.
+    """
+    from pymatting import estimate_foreground_ml
+
+    bgr = image[:, :, :3]
+    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB).astype(np.float64) / 255.0
+    fg = estimate_foreground_ml(rgb, alpha.astype(np.float64) / 255.0)
+    fg = np.clip(fg * 255.0 + 0.5, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(fg, cv2.COLOR_RGB2BGR)
+
+
+class ProcessingContext:
+    """Per-run artifacts shared by the steps of one pipeline run.
+
+    Color conversions and analysis proxies are memoized for the few most
+    recent image arrays (by identity, so steps must not modify an array in
+    place after handing it to the context). The product alpha is segmented once and reused for as
+    long as the frame size is unchanged: the steps that consume it (shadow
+    correction, background compositing, infographic cut-out) only recolour
+    the background and never move the product.
+
+    ``debug`` receives intermediate artifacts (masks, step outputs); the
+    default sink drops them.
+    """
+
+    # Typically the current frame, its proxy and the original upload.
+    _MAX_SOURCES = 4
+
+    def __init__(self, debug: Optional[NullDebugSink] = None):
+        self.debug = debug or NULL_DEBUG_SINK
+        # Keeping the source arrays referenced keeps their ids from being reused.
+        self._sources: Dict[int, np.ndarray] = {}
+        self._derived: Dict[Tuple[int, Hashable], np.ndarray] = {}
+        self._alpha: Optional[np.ndarray] = None
+
+    def _memo(self, image: np.ndarray, key: Hashable, compute) -> np.ndarray:
+        source_id = id(image)
+        if self._sources.get(source_id) is not image:
+            if len(self._sources) >= self._MAX_SOURCES:
+                oldest = next(iter(self._sources))
+                del self._sources[oldest]
+                self._derived = {k: v for k, v in self._derived.items() if k[0] != oldest}
+            self._derived = {k: v for k, v in self._derived.items() if k[0] != source_id}
+            self._sources[source_id] = image
+        out = self._derived.get((source_id, key))
+        if out is None:
+            out = compute()
+            self._derived[(source_id, key)] = out
+        return out
+
+    def _convert(self, image: np.ndarray, code: int) -> np.ndarray:
+        return self._memo(image, code, lambda: cv2.cvtColor(image, code))
+
+    def proxy(self, image: np.ndarray, max_dim: int = PROXY_MAX_DIM) -> np.ndarray:
+        """``image`` downscaled to at most ``max_dim`` px, computed once per array."""
+        return self._memo(image, ("proxy", max_dim), lambda: downscale_max_dim(image, max_dim))
+
+    def gray(self, image: np.ndarray) -> np.ndarray:
+        return self._convert(image, cv2.COLOR_BGR2GRAY)
+
+    def hsv(self, image: np.ndarray) -> np.ndarray:
+        return self._convert(image, cv2.COLOR_BGR2HSV)
+
+    def lab(self, image: np.ndarray) -> np.ndarray:
+        return self._convert(image, cv2.COLOR_BGR2LAB)
+
+    def product_alpha(self, image: np.ndarray) -> np.ndarray:
+        if self._alpha is None or self._alpha.shape != image.shape[:2]:
+            logger.info("Segmenting product (shared across steps)...")
+            self._alpha = compute_product_alpha(image)
+            self.debug.emit("product_alpha", self._alpha)
+        return self._alpha
+
+    def product_foreground(self, image: np.ndarray) -> np.ndarray:
+        """``image`` with its foreground colours estimated against the shared alpha."""
+        alpha = self.product_alpha(image)
+        return self._memo(image, "foreground", lambda: estimate_foreground(image, alpha))
+
+    def product_mask(self, image: np.ndarray, threshold: int = 128) -> np.ndarray:
+        return (self.product_alpha(image) > threshold).astype(np.uint8) * 255
+
+    def cached_alpha(self, shape: Tuple[int, ...]) -> Optional[np.ndarray]:
+        """The alpha already computed this run, if it matches ``shape``; never segments."""
+        if self._alpha is not None and self._alpha.shape == tuple(shape[:2]):
+            return self._alpha
+        return None
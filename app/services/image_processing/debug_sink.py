@@ -0,0 +1,92 @@
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_writer: Optional[ThreadPoolExecutor] = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> ThreadPoolExecutor:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debug-sink")
+    return _writer
+
+
+def _write(path: str, image: np.ndarray, mask: Optional[np.ndarray]) -> None:
+    try:
+        if mask is not None:
+            image = image[:, :, :3].copy()
+            image[mask > 0] = (0, 0, 255)
+        cv2.imwrite(path, image)
+    except Exception as e:
+        logger.debug(f"Debug artifact {path} not written: {e}")
+
+
+class NullDebugSink:
+    """Default sink: every artifact is dropped without touching the arrays."""
+
+    enabled = False
+    run_dir: Optional[str] = None
+
+    def emit(self, name: str, image: np.ndarray, mask: Optional[np.ndarray] = None) -> None:
+        pass
+
+
+NULL_DEBUG_SINK = NullDebugSink()
+
+
+class DebugSink(NullDebugSink):
+    """Writes one run's intermediate images under its own directory.
+
+    Arrays are copied and encoded on a background writer thread, so a step
+    only pays for the copy. Files are numbered in emit order:
+    ``<run_dir>/03_watermark_mask.png``. With ``mask``, the image is saved
+    with the mask painted red (an overlay).
+    """
+
+    enabled = True
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        self._seq = itertools.count(1)
+        self._created = False
+
+    def emit(self, name: str, image: np.ndarray, mask: Optional[np.ndarray] = None) -> None:
+        if image is None:
+            return
+        if not self._created:
+            os.makedirs(self.run_dir, exist_ok=True)
+            self._created = True
+        path = os.path.join(self.run_dir, f"{next(self._seq):02d}_{name}.png")
+        _get_writer().submit(
+            _write, path, np.array(image, copy=True),
+            None if mask is None else np.array(mask, copy=True),
+        )
+
+
+def create_debug_sink(requested: bool = False) -> NullDebugSink:
+    """A sink for one pipeline run: real if debug artifacts are enabled and
+    the request asked for them or the run is sampled, otherwise the null sink."""
+    if not settings.DEBUG_ARTIFACTS_ENABLED:
+        return NULL_DEBUG_SINK
+    rate = settings.DEBUG_ARTIFACTS_SAMPLE_RATE
+    if not (requested or (rate > 0 and random.random() < rate)):
+        return NULL_DEBUG_SINK
+    run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    return DebugSink(os.path.join(settings.DEBUG_ARTIFACTS_DIR, run_id))
@@ -0,0 +1,112 @@
+"""Regression check for the watermark detector masks on fixture images.
+
+    python -m app.services.image_processing.detector_regression record [FIXTURE_DIR]
+    python -m app.services.image_processing.detector_regression check [FIXTURE_DIR] [--min-iou 0.995]
+
+``record`` runs classification and detection the way WatermarkRemovalStep
+does (on the analysis proxy) and stores each mask under FIXTURE_DIR/masks/,
+with the content type and the passes that contributed in masks/index.json.
+``check`` recomputes them and fails if any mask IoU drops below --min-iou
+or the content type or contributing passes change. FIXTURE_DIR defaults to
+fixtures/watermark, where each pass (frequency, edge, opacity) leads at
+least one bounded mask.
+
+The detector is deterministic, so a clean check scores 1.0; the tolerance
+only absorbs OpenCV/NumPy build differences. Re-record deliberately when a
+change is meant to move the masks.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .steps.watermark_removal import ContentTypeClassifier, UniversalWatermarkDetector
+from .utils import downscale_max_dim
+
+logger = logging.getLogger(__name__)
+
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp")
+_DEFAULT_FIXTURES = "fixtures/watermark"
+
+
+def detect_mask(image: np.ndarray) -> Tuple[dict, np.ndarray]:
+    small = downscale_max_dim(image)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    content_type, _ = ContentTypeClassifier().predict(small, gray)
+    detection = UniversalWatermarkDetector().detect(small, content_type, gray)
+    return {"content_type": content_type.name, "method": detection.method}, detection.mask
+
+
+def mask_iou(a: np.ndarray, b: np.ndarray) -> float:
+    a, b = a > 0, b > 0
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def _fixtures(fixture_dir: str) -> List[str]:
+    return sorted(
+        name for name in os.listdir(fixture_dir)
+        if name.lower().endswith(_IMAGE_EXTS)
+    )
+
+
+def run(command: str, fixture_dir: str, min_iou: float) -> int:
+    mask_dir = os.path.join(fixture_dir, "masks")
+    index_path = os.path.join(mask_dir, "index.json")
+    if command == "record":
+        os.makedirs(mask_dir, exist_ok=True)
+        index = {}
+    else:
+        with open(index_path) as f:
+            index = json.load(f)
+
+    failed = 0
+    for name in _fixtures(fixture_dir):
+        image = cv2.imread(os.path.join(fixture_dir, name), cv2.IMREAD_COLOR)
+        if image is None:
+            logger.warning(f"skip {name}: unreadable")
+            continue
+        meta, mask = detect_mask(image)
+        mask_path = os.path.join(mask_dir, f"{os.path.splitext(name)[0]}.png")
+
+        if command == "record":
+            cv2.imwrite(mask_path, mask)
+            index[name] = meta
+            logger.info(f"{name}: {meta['content_type']} via {meta['method']}, "
+                        f"coverage {np.count_nonzero(mask) / mask.size:.2%}")
+            continue
+
+        if name not in index:
+            logger.warning(f"skip {name}: not recorded")
+            continue
+        reference = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+        iou = mask_iou(reference, mask) if reference is not None and reference.shape == mask.shape else 0.0
+        ok = iou >= min_iou and meta == index[name]
+        failed += not ok
+        logger.info(f"{'ok  ' if ok else 'FAIL'} {name}: iou={iou:.4f} "
+                    f"type={meta['content_type']} via {meta['method']} "
+                    f"(was {index[name]['content_type']} via {index[name]['method']})")
+
+    if command == "record":
+        with open(index_path, "w") as f:
+            json.dump(index, f, indent=2)
+    return 1 if failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["record", "check"])
+    parser.add_argument("fixture_dir", nargs="?", default=_DEFAULT_FIXTURES)
+    parser.add_argument("--min-iou", type=float, default=0.995)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    return run(args.command, args.fixture_dir, args.min_iou)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
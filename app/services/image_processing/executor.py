@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import resource
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from app.core import startup
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def run_pipeline(file_bytes: bytes, processor_kwargs: dict) -> dict:
+    """Run ImageProcessor end to end and return only picklable, encoded output."""
+    from .orchestrator import ImageProcessor
+
+    processor = ImageProcessor(file_bytes, **processor_kwargs)
+    result = processor.process()
+    for res in result.get("resize_results") or []:
+        if isinstance(res.get("image_bytes"), np.ndarray):
+            success, encoded = cv2.imencode(".jpg", res["image_bytes"])
+            if not success:
+                raise RuntimeError(f"Failed to encode resize output {res.get('id')}")
+            res["image_bytes"] = encoded.tobytes()
+    return result
+
+
+def _current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is the peak, in KiB on Linux; good enough as a fallback.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _init_worker(preload: list[str], torch_threads: int):
+    if torch_threads > 0:
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+    from .model_registry import models, preload_model
+
+    models.add_listener(lambda name: startup.record_warm_start(settings.WARM_START_FILE, name))
+    for name in preload:
+        try:
+            preload_model(name)
+        except Exception as e:
+            logger.error(f"Worker {os.getpid()} failed to preload {name}: {e}")
+    logger.info(f"Processing worker {os.getpid()} ready (preloaded: {preload})")
+
+
+def _run_in_worker(file_bytes: bytes, processor_kwargs: dict) -> tuple[dict, float]:
+    result = run_pipeline(file_bytes, processor_kwargs)
+    return result, _current_rss_mb()
+
+
+def _noop() -> int:
+    return os.getpid()
+
+
+class ProcessPoolEngine:
+    """Runs the processing pipeline in a pool of spawned worker processes.
+
+    Workers are recycled by rotating the whole pool: after
+    ``max_tasks_per_child * size`` submissions, or as soon as a worker reports
+    a resident size above ``max_worker_memory_mb``, new work goes to a fresh
+    pool while the old one drains its queue and exits. This behaves the same
+    on Python 3.10, where ProcessPoolExecutor has no ``max_tasks_per_child``.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_tasks_per_child: int = 0,
+        max_worker_memory_mb: int = 0,
+        preload: Optional[list[str]] = None,
+        torch_threads: int = 1,
+    ):
+        self._size = size
+        self._max_tasks_per_child = max_tasks_per_child
+        self._max_worker_memory_mb = max_worker_memory_mb
+        self._preload = list(preload or [])
+        self._torch_threads = torch_threads
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._generation = 0
+        self._submitted = 0
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        self._generation += 1
+        self._submitted = 0
+        logger.info(f"Starting processing pool #{self._generation} with {self._size} workers")
+        return ProcessPoolExecutor(
+            max_workers=self._size,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self._preload, self._torch_threads),
+        )
+
+    def _retire(self, generation: int, reason: str):
+        with self._lock:
+            if self._pool is None or generation != self._generation:
+                return
+            logger.info(f"Recycling processing pool #{generation}: {reason}")
+            pool, self._pool = self._pool, None
+        pool.shutdown(wait=False)
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._new_pool()
+            pool, generation = self._pool, self._generation
+            future = pool.submit(fn, *args)
+            self._submitted += 1
+            limit = self._max_tasks_per_child * self._size
+            if limit and self._submitted >= limit:
+                # Already-queued work still runs; new work lands on a fresh pool.
+                self._pool = None
+                pool.shutdown(wait=False)
+        return future, generation
+
+    async def run(self, file_bytes: bytes, processor_kwargs: dict) -> dict:
+        future, generation = self._submit(_run_in_worker, file_bytes, processor_kwargs)
+        try:
+            result, rss_mb = await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            self._retire(generation, "a worker died")
+            raise
+        if self._max_worker_memory_mb and rss_mb > self._max_worker_memory_mb:
+            self._retire(
+                generation,
+                f"worker RSS {rss_mb:.0f} MB over {self._max_worker_memory_mb} MB",
+            )
+        return result
+
+    async def warm(self):
+        """Spawn every worker up front so model preloading happens before traffic."""
+        futures = [asyncio.wrap_future(self._submit(_noop)[0]) for _ in range(self._size)]
+        await asyncio.gather(*futures)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+_engine: Optional[ProcessPoolEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_process_engine() -> ProcessPoolEngine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = ProcessPoolEngine(
+                    size=settings.PROCESS_POOL_SIZE or os.cpu_count() or 1,
+                    max_tasks_per_child=settings.PROCESS_POOL_MAX_TASKS_PER_CHILD,
+                    max_worker_memory_mb=settings.PROCESS_POOL_MAX_WORKER_MEMORY_MB,
+                    preload=list(dict.fromkeys(
+                        settings.PROCESS_POOL_PRELOAD_MODELS
+                        + startup.load_warm_start(settings.WARM_START_FILE)
+                    )),
+                    torch_threads=settings.PROCESS_POOL_TORCH_THREADS,
+                )
+    return _engine
+
+
+def uses_process_pool() -> bool:
+    return settings.PROCESSING_BACKEND == "process"
+
+
+async def run_image_pipeline(file_bytes: bytes, **processor_kwargs) -> dict:
+    if uses_process_pool():
+        return await get_process_engine().run(file_bytes, processor_kwargs)
+    return await asyncio.to_thread(run_pipeline, file_bytes, processor_kwargs)
+
+
+def shutdown_engine():
+    if _engine is not None:
+        _engine.shutdown()
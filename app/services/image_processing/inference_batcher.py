@@ -0,0 +1,255 @@
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from .model_registry import get_lama, get_rembg_session, get_remover
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on padded pixels per LaMa forward pass; large frames run alone.
+_LAMA_BATCH_PIXELS = 4 * 1024 * 1024
+
+
+class MicroBatcher:
+    """Groups concurrent single-item model calls into batched forward passes.
+
+    Callers block in ``submit`` (they already run off the event loop). A
+    dispatcher thread takes the first queued item, waits up to ``max_wait_ms``
+    for up to ``max_batch`` items, splits them by ``group_key`` (items in a
+    group must share a tensor shape) and runs ``run_batch`` once per group,
+    scattering results or the exception back to each caller. A caller that
+    times out cancels its future, and the dispatcher drops it from the batch.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[[List[Any]], List[Any]],
+        max_batch: int,
+        max_wait_ms: float,
+        group_key: Optional[Callable[[Any], Hashable]] = None,
+        group_limit: Optional[Callable[[Hashable], int]] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.name = name
+        self._run_batch = run_batch
+        self._max_batch = max(1, max_batch)
+        self._max_wait = max_wait_ms / 1000.0
+        self._group_key = group_key or (lambda item: None)
+        self._group_limit = group_limit
+        self._timeout = timeout
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.stats = {"items": 0, "batches": 0, "max_batch_seen": 0}
+
+    def submit(self, item: Any) -> Any:
+        self._ensure_started()
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self._queue.put((item, future))
+        try:
+            return future.result(timeout=self._timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"{self.name} batch did not finish within {self._timeout}s")
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    if self._thread is not None:
+                        logger.error(f"MicroBatcher {self.name}: dispatcher thread died, restarting")
+                    self._thread = threading.Thread(
+                        target=self._loop, name=f"batcher-{self.name}", daemon=True
+                    )
+                    self._thread.start()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._max_wait
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            try:
+                groups: Dict[Hashable, list] = {}
+                for item, future in batch:
+                    groups.setdefault(self._group_key(item), []).append((item, future))
+                for key, entries in groups.items():
+                    limit = self._group_limit(key) if self._group_limit else len(entries)
+                    for i in range(0, len(entries), max(1, limit)):
+                        self._dispatch(entries[i:i + max(1, limit)])
+            except Exception as e:
+                # Grouping failed: fail every caller still waiting rather
+                # than let the dispatcher die with their futures pending.
+                logger.exception(f"MicroBatcher {self.name}: batch failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _dispatch(self, entries: list):
+        # Skip callers that already timed out; the rest can no longer cancel.
+        entries = [(item, future) for item, future in entries if future.set_running_or_notify_cancel()]
+        if not entries:
+            return
+        try:
+            results = list(self._run_batch([item for item, _ in entries]))
+            if len(results) != len(entries):
+                raise RuntimeError(
+                    f"{self.name} batch returned {len(results)} results for {len(entries)} items"
+                )
+        except Exception as e:
+            for _, future in entries:
+                future.set_exception(e)
+            return
+        self.stats["items"] += len(entries)
+        self.stats["batches"] += 1
+        self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(entries))
+        for (_, future), result in zip(entries, results):
+            future.set_result(result)
+
+
+# ── Batch functions (one forward pass per call) ──────────────────────────────
+
+def _remover_batch(images: List[np.ndarray]) -> List[np.ndarray]:
+    """RGB uint8 images -> saliency alpha (uint8) at each image's own size.
+
+    Mirrors ``Remover.process(img, type="map")``; the static resize in the
+    remover's transform gives every item the same input shape.
+    """
+    import torch
+    import torch.nn.functional as F
+
+    remover = get_remover()
+    x = torch.stack([remover.transform(Image.fromarray(img)) for img in images])
+    with torch.no_grad():
+        pred = remover.model(x.to(remover.device))
+    alphas = []
+    for i, img in enumerate(images):
+        p = F.interpolate(pred[i:i + 1], img.shape[:2], mode="bilinear", align_corners=True)
+        alphas.append((p.squeeze().cpu().numpy() * 255).astype(np.uint8))
+    return alphas
+
+
+def _rembg_batch(images: List[np.ndarray]) -> List[np.ndarray]:
+    """RGB uint8 images -> rembg (isnet-general-use) mask, mirroring DisSession.predict."""
+    session = get_rembg_session()
+    ort = session.inner_session
+    input_name = ort.get_inputs()[0].name
+    tensors = [
+        session.normalize(Image.fromarray(img), (0.5, 0.5, 0.5), (1.0, 1.0, 1.0), (1024, 1024))[input_name]
+        for img in images
+    ]
+    batch_dim = ort.get_inputs()[0].shape[0]
+    if len(tensors) > 1 and not isinstance(batch_dim, int):
+        preds = list(ort.run(None, {input_name: np.concatenate(tensors)})[0][:, 0])
+    else:
+        # Exported with a fixed batch of 1: still one queue, sequential runs.
+        preds = [ort.run(None, {input_name: t})[0][0, 0] for t in tensors]
+
+    masks = []
+    for img, pred in zip(images, preds):
+        ma, mi = np.max(pred), np.min(pred)
+        pred = (pred - mi) / (ma - mi)
+        mask = Image.fromarray((pred * 255).astype("uint8"), mode="L")
+        mask = mask.resize((img.shape[1], img.shape[0]), Image.Resampling.LANCZOS)
+        masks.append(np.array(mask))
+    return masks
+
+
+def _lama_batch(items: List[tuple]) -> List[np.ndarray]:
+    """(RGB uint8 image, uint8 mask) pairs with equal padded shape -> inpainted RGB."""
+    import torch
+    from simple_lama_inpainting.utils.util import prepare_img_and_mask
+
+    lama = get_lama()
+    prepared = [prepare_img_and_mask(img, mask, lama.device) for img, mask in items]
+    images = torch.cat([p[0] for p in prepared])
+    masks = torch.cat([p[1] for p in prepared])
+    with torch.inference_mode():
+        inpainted = lama.model(images, masks)
+    results = []
+    for i, (img, _) in enumerate(items):
+        h, w = img.shape[:2]
+        res = inpainted[i].permute(1, 2, 0).detach().cpu().numpy()[:h, :w]
+        results.append(np.clip(res * 255, 0, 255).astype(np.uint8))
+    return results
+
+
+def _lama_group_key(item: tuple) -> Hashable:
+    h, w = item[0].shape[:2]
+    return (-(-h // 8) * 8, -(-w // 8) * 8)
+
+
+def _lama_group_limit(key: Hashable) -> int:
+    h, w = key
+    return max(1, _LAMA_BATCH_PIXELS // (h * w))
+
+
+# ── Public entry points ──────────────────────────────────────────────────────
+
+_batchers: Dict[str, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+_BATCH_FUNCTIONS = {
+    "remover": (_remover_batch, None, None),
+    "rembg": (_rembg_batch, None, None),
+    "lama": (_lama_batch, _lama_group_key, _lama_group_limit),
+}
+
+
+def _run(model: str, item: Any) -> Any:
+    run_batch, group_key, group_limit = _BATCH_FUNCTIONS[model]
+    if not settings.INFERENCE_BATCHING_ENABLED:
+        return run_batch([item])[0]
+    batcher = _batchers.get(model)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(model)
+            if batcher is None:
+                batcher = MicroBatcher(
+                    model,
+                    run_batch,
+                    max_batch=settings.INFERENCE_MAX_BATCH,
+                    max_wait_ms=settings.INFERENCE_MAX_WAIT_MS,
+                    group_key=group_key,
+                    group_limit=group_limit,
+                    timeout=settings.INFERENCE_TIMEOUT_S,
+                )
+                _batchers[model] = batcher
+    return batcher.submit(item)
+
+
+def remover_alpha(image_rgb: np.ndarray) -> np.ndarray:
+    """Foreground alpha (uint8) from the transparent-background model."""
+    return _run("remover", image_rgb)
+
+
+def rembg_mask(image_rgb: np.ndarray) -> np.ndarray:
+    """Foreground mask (uint8) from the shared rembg session."""
+    return _run("rembg", image_rgb)
+
+
+def lama_inpaint(image_rgb: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """LaMa inpainting of ``mask`` (non-zero = fill) in an RGB image."""
+    return _run("lama", (image_rgb, mask))
+
+
+def batcher_stats() -> dict:
+    return {name: dict(b.stats) for name, b in _batchers.items()}
@@ -1,15 +1,12 @@
-import torch
 import numpy as np
 import cv2
 import logging
-from transformers import SegformerImageProcessor, SegformerForSemanticSegmentation
+from .model_registry import get_segformer
 
 logger = logging.getLogger(__name__)
 
-# B2 is good, but we will add classical CV refinement to make it perfect
-MODEL_ID = "nvidia/segformer-b2-finetuned-ade-512-512"
-processor = SegformerImageProcessor.from_pretrained(MODEL_ID)
-model = SegformerForSemanticSegmentation.from_pretrained(MODEL_ID)
+# B2 is good, but we will add classical CV refinement to make it perfect.
+# Loaded on first use through the model registry (see get_segformer).
 
 
 class MaskGeneratorService:
@@ -17,6 +14,8 @@ class MaskGeneratorService:
     def generate_wall_mask(image_bgr: np.ndarray) -> np.ndarray:
         try:
             # 1. AI Inference (Rough Mask)
+            import torch
+            processor, model = get_segformer()
             image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
             inputs = processor(images=image_rgb, return_tensors="pt")
             with torch.no_grad():
@@ -1,56 +1,196 @@
+import gc
 import logging
+import os
 import threading
-from typing import Optional
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
 
 import cv2
 import numpy as np
-from PIL import Image
-import easyocr
-from ultralytics import YOLO
-from transparent_background import Remover
-from simple_lama_inpainting import SimpleLama
-from huggingface_hub import hf_hub_download
-from rembg import remove, new_session
 
-from iopaint.model_manager import ModelManager
-from iopaint.schema import InpaintRequest, HDStrategy
+# Model libraries (torch, ultralytics, easyocr, iopaint, rembg, ...) are
+# imported inside the loaders so importing the app does not pay for them.
+if TYPE_CHECKING:
+    import easyocr
+    from iopaint.model_manager import ModelManager
+    from simple_lama_inpainting import SimpleLama
+    from transparent_background import Remover
+    from ultralytics import YOLO
+
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-_locks = {
-    "lama": threading.Lock(),
-    "iopaint": threading.Lock(),
-    "remover": threading.Lock(),
-    "ocr": threading.Lock(),
-    "wm_detector": threading.Lock(),
-    "rembg_session": threading.Lock(),
-}
-
-_lama: Optional[SimpleLama] = None
-_iopaint: Optional[ModelManager] = None
-_remover: Optional[Remover] = None
-_ocr_reader: Optional[easyocr.Reader] = None
-_wm_detector: Optional[YOLO] = None
-_rembg_session = None
-
-
-def get_lama() -> SimpleLama:
-    global _lama
-    if _lama is None:
-        with _locks["lama"]:
-            if _lama is None:
-                _lama = SimpleLama()
-    return _lama
-
-
-def get_iopaint() -> ModelManager:
-    global _iopaint
-    if _iopaint is None:
-        with _locks["iopaint"]:
-            if _iopaint is None:
-                # CHANGED FROM "sd2" to "lama"
-                _iopaint = ModelManager(name="lama", device="cpu")
-    return _iopaint
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _torch_bytes(obj: Any, depth: int = 3, seen: Optional[set] = None) -> int:
+    """Parameter + buffer bytes of every torch module reachable from ``obj``."""
+    import torch
+
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, torch.nn.Module):
+        tensors = list(obj.parameters()) + list(obj.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    if depth == 0:
+        return 0
+    if isinstance(obj, dict):
+        children = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        children = obj
+    else:
+        children = getattr(obj, "__dict__", {}).values()
+    return sum(_torch_bytes(child, depth - 1, seen) for child in children)
+
+
+@dataclass
+class _Entry:
+    model: Any
+    size_bytes: int
+    load_ms: int
+    last_used: float
+
+
+class ModelRegistry:
+    """Loads models on first use and keeps them under a resident-memory budget.
+
+    Each model is registered with a loader. ``get`` loads it on first use
+    (one loader at a time per model) and measures its size from its torch
+    parameters/buffers, or from the process RSS delta for non-torch models
+    such as ONNX sessions. When the loaded total exceeds the budget, least
+    recently used models are dropped; callers still holding a reference
+    keep a working model, and the memory is freed once they let go.
+    """
+
+    def __init__(self, budget_bytes: int = 0):
+        self.budget_bytes = budget_bytes
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._listeners: list = []
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def add_listener(self, callback: Callable[[str], None]) -> None:
+        """Call ``callback(name)`` after each model load."""
+        self._listeners.append(callback)
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        self._loaders[name] = loader
+        self._load_locks.setdefault(name, threading.Lock())
+        self.stats.setdefault(name, {"loads": 0, "evictions": 0, "hits": 0})
+
+    def is_registered(self, name: str) -> bool:
+        return name in self._loaders
+
+    def get(self, name: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+                entry.last_used = time.time()
+                self.stats[name]["hits"] += 1
+                return entry.model
+        with self._load_locks[name]:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    self._entries.move_to_end(name)
+                    return entry.model
+            rss_before = _rss_bytes()
+            start = time.perf_counter()
+            model = self._loaders[name]()
+            if model is None:
+                return None
+            load_ms = int((time.perf_counter() - start) * 1000)
+            size = _torch_bytes(model) or max(0, _rss_bytes() - rss_before)
+            logger.info(f"Loaded model {name}: {size / 2**20:.0f} MB in {load_ms} ms")
+            with self._lock:
+                self._entries[name] = _Entry(model, size, load_ms, time.time())
+                self.stats[name]["loads"] += 1
+                evicted = self._evict_over_budget(keep=name)
+        if evicted:
+            gc.collect()
+        for callback in self._listeners:
+            try:
+                callback(name)
+            except Exception as e:
+                logger.warning(f"Model load listener failed for {name}: {e}")
+        return model
+
+    def _evict_over_budget(self, keep: str) -> list:
+        evicted = []
+        if not self.budget_bytes:
+            return evicted
+        while self._total() > self.budget_bytes:
+            victim = next((n for n in self._entries if n != keep), None)
+            if victim is None:
+                break
+            entry = self._entries.pop(victim)
+            self.stats[victim]["evictions"] += 1
+            evicted.append(victim)
+            logger.info(f"Evicted model {victim} ({entry.size_bytes / 2**20:.0f} MB) to stay under budget")
+        return evicted
+
+    def _total(self) -> int:
+        return sum(e.size_bytes for e in self._entries.values())
+
+    def peek(self, name: str) -> Any:
+        """The loaded model, or None; never loads."""
+        with self._lock:
+            entry = self._entries.get(name)
+            return entry.model if entry is not None else None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            loaded = [
+                {
+                    "name": name,
+                    "size_mb": round(e.size_bytes / 2**20, 1),
+                    "load_ms": e.load_ms,
+                    "last_used": e.last_used,
+                }
+                for name, e in self._entries.items()
+            ]
+            return {
+                "budget_mb": round(self.budget_bytes / 2**20) if self.budget_bytes else None,
+                "loaded_mb": round(self._total() / 2**20, 1),
+                "loaded": loaded,
+                "stats": {name: dict(s) for name, s in self.stats.items()},
+            }
+
+
+models = ModelRegistry(settings.MODEL_MEMORY_BUDGET_MB * 2**20)
+
+
+def _load_lama() -> "SimpleLama":
+    from simple_lama_inpainting import SimpleLama
+    return SimpleLama()
+
+
+def _load_iopaint() -> "ModelManager":
+    from iopaint.model_manager import ModelManager
+    # CHANGED FROM "sd2" to "lama"
+    return ModelManager(name="lama", device="cpu")
+
+
+def get_lama() -> "SimpleLama":
+    return models.get("lama")
+
+
+def get_iopaint() -> "ModelManager":
+    return models.get("iopaint")
 # from transformers import AutoProcessor, AutoModelForCausalLM
 # import torch
 
@@ -78,68 +218,103 @@ def get_iopaint() -> ModelManager:
 #                     logger.error(f"Failed to load Florence-2: {e}")
 #                     return None
 #     return _florence_model, _florence_processor
-def get_remover() -> Remover:
-    global _remover
-    if _remover is None:
-        with _locks["remover"]:
-            if _remover is None:
-                logger.info("Initializing background remover...")
-                _remover = Remover(mode="fast")
-                logger.info("Background remover ready!")
-    return _remover
-
-
-def get_ocr_reader() -> easyocr.Reader:
-    global _ocr_reader
-    if _ocr_reader is None:
-        with _locks["ocr"]:
-            if _ocr_reader is None:
-                _ocr_reader = easyocr.Reader(["en"])
-    return _ocr_reader
-
-import segmentation_models_pytorch as smp
-import torch
-import threading
 
-_segmenters_lock = threading.Lock()
-_segmenters = {}
+def _load_remover() -> "Remover":
+    from transparent_background import Remover
+    logger.info("Initializing background remover...")
+    remover = Remover(mode="fast")
+    logger.info("Background remover ready!")
+    return remover
+
+
+def get_remover() -> "Remover":
+    return models.get("remover")
+
+
+def _load_ocr_reader() -> "easyocr.Reader":
+    import easyocr
+    return easyocr.Reader(["en"])
+
+
+def get_ocr_reader() -> "easyocr.Reader":
+    return models.get("ocr")
+
+
+SEGMENTER_SPECIALTIES = [
+    "logo", "centered_text", "overlay_text", "repeated_text",
+    "tiny_corner", "line_pattern", "universal",
+]
+
+
+def load_torch_segmenter(specialty: str):
+    """Build the PyTorch UNet++ for ``specialty`` and load its weights (uncached)."""
+    import segmentation_models_pytorch as smp
+    import torch
+    from huggingface_hub import hf_hub_download
+
+    model_path = hf_hub_download(
+        repo_id="christophernavas/watermark-remover",
+        filename=f"segmenter_{specialty}.pth",
+    )
+    model = smp.UnetPlusPlus(
+        encoder_name="efficientnet-b4",
+        encoder_weights=None,
+        in_channels=3,
+        classes=1,
+    )
+    state_dict = torch.load(model_path, map_location="cpu")
+    model.load_state_dict(state_dict)
+    model.eval()
+    return model
+
+
+# The efficientnet-b4 encoder was trained on ImageNet-normalised RGB.
+SEGMENTER_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+SEGMENTER_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+def segmenter_input(image_bgr: np.ndarray, size: int = 512) -> np.ndarray:
+    """BGR uint8 image -> 1x3xSIZExSIZE float32 segmenter input (SIZE a multiple of 32)."""
+    rgb = cv2.cvtColor(np.ascontiguousarray(image_bgr[:, :, :3]), cv2.COLOR_BGR2RGB)
+    rgb = cv2.resize(rgb, (size, size), interpolation=cv2.INTER_AREA)
+    x = (rgb.astype(np.float32) / 255.0 - SEGMENTER_MEAN) / SEGMENTER_STD
+    return np.ascontiguousarray(x.transpose(2, 0, 1)[None])
+
+
+def _load_segmenter(specialty: str):
+    try:
+        if settings.SEGMENTER_BACKEND == "onnx":
+            from .segmenter_onnx import OnnxSegmenter, onnx_path
+
+            path = onnx_path(specialty, settings.SEGMENTER_ONNX_QUANTIZED)
+            if os.path.exists(path):
+                return OnnxSegmenter(path)
+            logger.warning(
+                f"No ONNX export for segmenter {specialty} at {path}; falling back to torch. "
+                f"Run: python -m app.services.image_processing.segmenter_onnx export"
+            )
+        return load_torch_segmenter(specialty)
+    except Exception as e:
+        logger.error(f"Failed to load segmenter {specialty}: {e}")
+        return None
+
 
 def get_segmenter(specialty: str = "logo"):
     """Load a UNet++ segmenter from christophernavas/watermark-remover.
     specialty options: centered_text, line_pattern, logo, overlay_text,
-                      repeated_text, tiny_corner, universal"""
-    if specialty not in _segmenters:
-        with _segmenters_lock:
-            if specialty not in _segmenters:
-                filename = f"segmenter_{specialty}.pth"
-                try:
-                    model_path = hf_hub_download(
-                        repo_id="christophernavas/watermark-remover",
-                        filename=filename,
-                    )
-                    model = smp.UnetPlusPlus(
-                        encoder_name="efficientnet-b4",
-                        encoder_weights=None,
-                        in_channels=3,
-                        classes=1,
-                    )
-                    state_dict = torch.load(model_path, map_location="cpu")
-                    model.load_state_dict(state_dict)
-                    model.eval()
-                    _segmenters[specialty] = model
-                    logger.info(f"Loaded watermark segmenter: {specialty}")
-                except Exception as e:
-                    logger.error(f"Failed to load segmenter {specialty}: {e}")
-                    return None
-    return _segmenters[specialty]
+                      repeated_text, tiny_corner, universal
+    With SEGMENTER_BACKEND=onnx an exported ONNX Runtime session is returned
+    instead; it is called the same way (NCHW float tensor in, logits out)."""
+    return models.get(f"segmenter:{specialty}")
 
 def get_all_segmenters():
     """Load all 6+1 segmenters for parallel inference."""
-    for specialty in ["logo", "centered_text", "overlay_text",
-                      "repeated_text", "tiny_corner", "line_pattern",
-                      "universal"]:
-        get_segmenter(specialty)
-    return _segmenters
+    segmenters = {}
+    for specialty in SEGMENTER_SPECIALTIES:
+        model = get_segmenter(specialty)
+        if model is not None:
+            segmenters[specialty] = model
+    return segmenters
 
 # def get_wm_detector() -> Optional[YOLO]:
 #     global _wm_detector
@@ -159,26 +334,68 @@ def get_all_segmenters():
 #                     _wm_detector = None
 #     return _wm_detector
 
+
+def _load_wm_detector() -> Optional["YOLO"]:
+    from huggingface_hub import hf_hub_download
+    from ultralytics import YOLO
+
+    try:
+        model_path = hf_hub_download(
+            repo_id="qfisch/yolov8n-watermark-detection",
+            filename="best.pt",
+        )
+        detector = YOLO(model_path)
+        logger.info(f"Watermark detector loaded from: {model_path}")
+        return detector
+    except Exception as e:
+        logger.error(f"Failed to load watermark detector: {e}")
+        return None
+
+
 def get_wm_detector():
-    global _wm_detector
-    if _wm_detector is None:
-        with _locks["wm_detector"]:
-            if _wm_detector is None:
-                try:
-                    model_path = hf_hub_download(
-                        repo_id="qfisch/yolov8n-watermark-detection",
-                        filename="best.pt",
-                    )
-                    _wm_detector = YOLO(model_path)
-                    logger.info(f"Watermark detector loaded from: {model_path}")
-                except Exception as e:
-                    logger.error(f"Failed to load watermark detector: {e}")
-                    _wm_detector = None
-    return _wm_detector
+    return models.get("wm_detector")
+
+
+def _load_rembg_session():
+    from rembg import new_session
+    return new_session("isnet-general-use")
+
+
 def get_rembg_session():
-    global _rembg_session
-    if _rembg_session is None:
-        with _locks["rembg_session"]:
-            if _rembg_session is None:
-                _rembg_session = new_session("isnet-general-use")
-    return _rembg_session
+    return models.get("rembg_session")
+
+
+def _load_segformer():
+    from transformers import SegformerImageProcessor, SegformerForSemanticSegmentation
+
+    model_id = "nvidia/segformer-b2-finetuned-ade-512-512"
+    processor = SegformerImageProcessor.from_pretrained(model_id)
+    model = SegformerForSemanticSegmentation.from_pretrained(model_id)
+    model.eval()
+    return processor, model
+
+
+def get_segformer():
+    """(image processor, model) for SegFormer-B2 ADE20K wall segmentation."""
+    return models.get("segformer")
+
+
+models.register("lama", _load_lama)
+models.register("iopaint", _load_iopaint)
+models.register("remover", _load_remover)
+models.register("ocr", _load_ocr_reader)
+models.register("wm_detector", _load_wm_detector)
+models.register("rembg_session", _load_rembg_session)
+models.register("segformer", _load_segformer)
+for _specialty in SEGMENTER_SPECIALTIES:
+    models.register(f"segmenter:{_specialty}", lambda s=_specialty: _load_segmenter(s))
+
+
+def preload_model(name: str) -> None:
+    """Load a model by registry name; "segmenters" loads all seven segmenters."""
+    if name == "segmenters":
+        get_all_segmenters()
+    elif models.is_registered(name):
+        models.get(name)
+    else:
+        logger.warning(f"Unknown model in preload list: {name}")
@@ -1,12 +1,16 @@
+import hashlib
 import logging
 import time
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 import numpy as np
 from .analyzer import ImageAnalyzer
+from .context import ProcessingContext
+from .debug_sink import create_debug_sink
 from .exceptions import StepSkippedException
 from app.services.image_processing.steps.room_visualizer import RoomVisualizerStep
 
 from .registry import StepRegistry
+from .stage_cache import StageCache, chain_key, get_stage_cache
 from .utils import (
     apply_single_resize,
     crop_to_aspect_ratio,
@@ -17,6 +21,8 @@ from .utils import (
 
 logger = logging.getLogger(__name__)
 CONFIDENCE_THRESHOLD = 0.6
+# Bump whenever a step changes its output; it is part of every result cache key.
+PIPELINE_VERSION = "6"
 
 
 class   ImageProcessor:
@@ -32,6 +38,8 @@ class   ImageProcessor:
         target_dimensions: dict = None,
         background_color: str = "#FFFFFF",
         step_registry: Optional[StepRegistry] = None,
+        stage_cache: Optional[StageCache] = None,
+        debug: bool = False,
     ):
         self.img = decode_image(file_bytes)
         self.original_h, self.original_w = self.img.shape[:2]
@@ -53,8 +61,23 @@ class   ImageProcessor:
             self.target_h = self.original_h
 
         self._analyzer = ImageAnalyzer()
+        self.context = ProcessingContext(debug=create_debug_sink(debug))
+        if self.context.debug.enabled:
+            logger.info(f"ImageProcessor: debug artifacts -> {self.context.debug.run_dir}")
         self._registry = step_registry if step_registry is not None else StepRegistry()
         self._registry.register("room-visualizer", RoomVisualizerStep)
+        self._stage_cache = stage_cache if stage_cache is not None else get_stage_cache()
+        self._stage_root = None
+        if self._stage_cache is not None:
+            self._stage_root = chain_key(
+                hashlib.sha256(file_bytes).hexdigest(),
+                "source",
+                {
+                    "version": PIPELINE_VERSION,
+                    "crop_mode": crop_mode,
+                    "target_aspect_ratio": target_aspect_ratio,
+                },
+            )
 
 
         logger.info(
@@ -81,6 +104,77 @@ class   ImageProcessor:
         else:
             return apply_single_resize(self.img, self.resize_dims)
 
+    def _step_plan(self, confidence: dict) -> List[Tuple[str, str, dict]]:
+        """Ordered (operation, applied label, step kwargs) for this request."""
+        if self.auto_detect:
+            if confidence["bg_clean"] > CONFIDENCE_THRESHOLD:
+                return [("bg-remove", "bg_removal", {})]
+            return []
+
+        plan = []
+        if "text-remove" in self.operations:
+            plan.append(("text-remove", "text_removal", {}))
+        if "image-refill" in self.operations:
+            plan.append(("image-refill", "geometry_reconstruction", {}))
+        if "watermark-remove" in self.operations:
+            plan.append(("watermark-remove", "watermark_removal", {}))
+        if "retouch" in self.operations:
+            plan.append(("retouch", "retouch", {}))
+        if any(op in self.operations for op in ("shadow-remove", "shadow_fix")):
+            plan.append(("shadow-remove", "shadow_fix", {"background_color": self.background_color}))
+        if "bg-remove" in self.operations:
+            plan.append(("bg-remove", "bg_removal", {"background_color": self.background_color}))
+        return plan
+
+    def _run_steps(self, plan: List[Tuple[str, str, dict]]) -> Tuple[list, list]:
+        """Run the plan, resuming from the deepest stage already in the cache.
+
+        Each stage is keyed by the chain of steps (and their kwargs) that
+        produced it, so requests that share a prefix of operations reuse the
+        earlier outputs and only run the differing tail.
+        """
+        applied, messages = [], []
+        cache = self._stage_cache if isinstance(self.img, np.ndarray) else None
+        keys = []
+        start = 0
+        if cache is not None and plan:
+            parent = self._stage_root
+            for operation, _, kwargs in plan:
+                factory = self._registry.get_step(operation)
+                step_id = f"{factory.__module__}.{factory.__qualname__}"
+                parent = chain_key(parent, step_id, kwargs)
+                keys.append(parent)
+            # Debug runs execute every step so each one leaves its artifacts.
+            resume_candidates = [] if self.context.debug.enabled else range(len(keys) - 1, -1, -1)
+            for i in resume_candidates:
+                hit = cache.get(keys[i]) if cache.contains(keys[i]) else None
+                if hit is None:
+                    continue
+                self.img, meta = hit
+                applied = list(meta["steps_applied"])
+                messages = list(meta["messages"])
+                start = i + 1
+                logger.info(f"Stage cache: resuming after '{plan[i][0]}' ({start}/{len(plan)} steps cached)")
+                break
+
+        for i in range(start, len(plan)):
+            operation, label, kwargs = plan[i]
+            step = self._registry.get_step(operation)(**kwargs)
+            try:
+                self.img = step.process(self.img, self.original_img, context=self.context)
+                applied.append(label)
+                if isinstance(self.img, np.ndarray):
+                    self.context.debug.emit(label, self.img)
+            except StepSkippedException as e:
+                messages.append(str(e))
+                logger.info(str(e))
+            except Exception as e:
+                logger.exception(f"{operation} step failed: {e}")
+                raise
+            if keys and isinstance(self.img, np.ndarray):
+                cache.put(keys[i], self.img, {"steps_applied": list(applied), "messages": list(messages)})
+        return applied, messages
+
     def process(self) -> Dict:
         start_time = time.time()
         self.resize_results = None
@@ -88,7 +182,8 @@ class   ImageProcessor:
         messages = []  
 
         confidence = self._analyzer.analyze(
-            self.img, self.original_img, self.resize_dims, self.operations
+            self.img, self.original_img, self.resize_dims, self.operations,
+            context=self.context,
         )
         logger.info(f"PROCESSOR: operations={self.operations}, autoDetect={self.auto_detect}")
 
@@ -97,69 +192,19 @@ class   ImageProcessor:
             steps_applied.append("smart_crop")
 
 
-        if self.auto_detect:
-            if confidence["bg_clean"] > CONFIDENCE_THRESHOLD:
-                step = self._registry.get_step("bg-remove")()
-                self.img = step.process(self.img, self.original_img)
-                steps_applied.append("bg_removal")
-        else:
-            _shadow_done = False
-
-            if "text-remove" in self.operations:
-                step = self._registry.get_step("text-remove")()
-                self.img = step.process(self.img, self.original_img)
-                steps_applied.append("text_removal")
-
-            if "image-refill" in self.operations:
-                step = self._registry.get_step("image-refill")()
-                self.img = step.process(self.img, self.original_img)
-                steps_applied.append("geometry_reconstruction")
-
-            if "watermark-remove" in self.operations:
-                logger.info("Watermark removal branch entered")
-                try:
-                    step = self._registry.get_step("watermark-remove")()
-                    logger.info(f"Watermark step class: {type(step).__name__}")
-                    self.img = step.process(self.img, self.original_img)
-                    steps_applied.append("watermark_removal")
-                    logger.info("Watermark removal branch completed")
-                except Exception as e:
-                    logger.exception(f"WATERMARK STEP FAILED: {e}")
-                    raise
-
-            if "retouch" in self.operations:
-                step = self._registry.get_step("retouch")()
-                self.img = step.process(self.img, self.original_img)
-                steps_applied.append("retouch")
-
-            if any(op in self.operations for op in ("shadow-remove", "shadow_fix")):
-                if not _shadow_done:
-                    try:
-                        step = self._registry.get_step("shadow-remove")(
-                            background_color=self.background_color
-                        )
-                        self.img = step.process(self.img, self.original_img)
-                        steps_applied.append("shadow_fix")
-                        _shadow_done = True
-                    except StepSkippedException as e:
-                        messages.append(str(e))
-                        logger.info(str(e))
-
-            if "bg-remove" in self.operations:
-                step = self._registry.get_step("bg-remove")(
-                    background_color=self.background_color
-                )
-                self.img = step.process(self.img, self.original_img)
-                steps_applied.append("bg_removal")
-
-            if self.resize_dims:
-                result = self.resize_ecom()
-                if isinstance(result, list):
-                    self.resize_results = result
-                    steps_applied.append("resize_multiple")
-                elif result is not None:
-                    self.img = result
-                    steps_applied.append("resize")
+        plan = self._step_plan(confidence)
+        plan_applied, plan_messages = self._run_steps(plan)
+        steps_applied.extend(plan_applied)
+        messages.extend(plan_messages)
+
+        if not self.auto_detect and self.resize_dims:
+            result = self.resize_ecom()
+            if isinstance(result, list):
+                self.resize_results = result
+                steps_applied.append("resize_multiple")
+            elif result is not None:
+                self.img = result
+                steps_applied.append("resize")
 
         if self.resize_results is None and "resize" not in steps_applied:
             if self.crop_mode != "preset":
@@ -173,6 +218,10 @@ class   ImageProcessor:
                         self.img, self.target_w, self.target_h)
 
         image_bytes = encode_image(self.img)
+        product_mask = (
+            self.context.cached_alpha(self.img.shape)
+            if isinstance(self.img, np.ndarray) else None
+        )
 
         return {
             "image_bytes": image_bytes,
@@ -181,4 +230,7 @@ class   ImageProcessor:
             "messages": messages,
             "duration_ms": int((time.time() - start_time) * 1000),
             "resize_results": self.resize_results,
+            # Alpha matching image_bytes, if a step already segmented the
+            # product; lets the infographic skip its own segmentation.
+            "product_mask": product_mask,
         }
@@ -1,8 +1,16 @@
-from typing import Protocol, runtime_checkable
+from typing import TYPE_CHECKING, Optional, Protocol, runtime_checkable
 import numpy as np
 
+if TYPE_CHECKING:
+    from .context import ProcessingContext
+
 
 @runtime_checkable
 class ProcessingStep(Protocol):
-    def process(self, image: np.ndarray, original: np.ndarray) -> np.ndarray:
+    def process(
+        self,
+        image: np.ndarray,
+        original: np.ndarray,
+        context: Optional["ProcessingContext"] = None,
+    ) -> np.ndarray:
         ...
@@ -0,0 +1,225 @@
+"""ONNX Runtime backend for the watermark segmenters.
+
+Export, check and benchmark from the command line:
+
+    python -m app.services.image_processing.segmenter_onnx export [--quantize]
+    python -m app.services.image_processing.segmenter_onnx compare [--quantize] [--fixtures DIR]
+    python -m app.services.image_processing.segmenter_onnx bench [--iters 20]
+
+``compare`` reports numeric parity (max/mean abs diff) on random input and
+mask IoU per image on real images (``fixtures/watermark`` by default),
+preprocessed the way ``model_registry.segmenter_input`` prepares them.
+
+Exports land in ``SEGMENTER_ONNX_DIR``; set ``SEGMENTER_BACKEND=onnx`` to
+serve them from ``model_registry.get_segmenter``.
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+import torch
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# UNet++ needs spatial dims divisible by 32.
+_SIZE_MULTIPLE = 32
+
+
+def onnx_path(specialty: str, quantized: bool = False, out_dir: Optional[str] = None) -> str:
+    suffix = ".int8" if quantized else ""
+    return os.path.join(out_dir or settings.SEGMENTER_ONNX_DIR, f"segmenter_{specialty}{suffix}.onnx")
+
+
+class OnnxSegmenter:
+    """Drop-in for the torch segmenter: ``model(x)`` with an NCHW float tensor
+    (H, W multiples of 32) returns logits as a tensor of the same layout."""
+
+    def __init__(self, path: str, intra_op_threads: Optional[int] = None,
+                 inter_op_threads: Optional[int] = None):
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        intra = settings.ONNX_INTRA_OP_THREADS if intra_op_threads is None else intra_op_threads
+        inter = settings.ONNX_INTER_OP_THREADS if inter_op_threads is None else inter_op_threads
+        if intra:
+            opts.intra_op_num_threads = intra
+        if inter:
+            opts.inter_op_num_threads = inter
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self._input = self.session.get_inputs()[0].name
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input: np.ascontiguousarray(x, dtype=np.float32)})[0]
+
+    def __call__(self, x):
+        if isinstance(x, torch.Tensor):
+            return torch.from_numpy(self.predict(x.detach().cpu().numpy()))
+        return self.predict(x)
+
+    def eval(self):
+        return self
+
+
+def export_segmenter(specialty: str, out_dir: str, size: int = 512,
+                     opset: int = 17, quantize: bool = False) -> List[str]:
+    from .model_registry import load_torch_segmenter
+
+    os.makedirs(out_dir, exist_ok=True)
+    model = load_torch_segmenter(specialty)
+    if hasattr(model.encoder, "set_swish"):
+        # efficientnet_pytorch's memory-efficient swish is a custom autograd op
+        model.encoder.set_swish(memory_efficient=False)
+
+    path = onnx_path(specialty, out_dir=out_dir)
+    dummy = torch.randn(1, 3, size, size)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, dummy, path,
+            input_names=["image"], output_names=["logits"],
+            dynamic_axes={"image": {0: "batch", 2: "height", 3: "width"},
+                          "logits": {0: "batch", 2: "height", 3: "width"}},
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    written = [path]
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        q_path = onnx_path(specialty, quantized=True, out_dir=out_dir)
+        quantize_dynamic(path, q_path, weight_type=QuantType.QInt8)
+        written.append(q_path)
+    return written
+
+
+def _inputs(size: int, batch: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # Standard-normal input, on the scale of ImageNet-normalised images.
+    return rng.normal(0.0, 1.0, (batch, 3, size, size)).astype(np.float32)
+
+
+def _fixture_inputs(fixture_dir: str, size: int) -> Dict[str, np.ndarray]:
+    from .detector_regression import _fixtures
+    from .model_registry import segmenter_input
+
+    return {
+        name: segmenter_input(cv2.imread(os.path.join(fixture_dir, name), cv2.IMREAD_COLOR), size)
+        for name in _fixtures(fixture_dir)
+    }
+
+
+def compare(specialty: str, out_dir: str, size: int, quantized: bool,
+            fixture_dir: str, samples: int = 4) -> dict:
+    from .detector_regression import mask_iou
+    from .model_registry import load_torch_segmenter
+
+    torch_model = load_torch_segmenter(specialty)
+    onnx_model = OnnxSegmenter(onnx_path(specialty, quantized, out_dir))
+
+    def both(x: np.ndarray):
+        with torch.no_grad():
+            ref = torch_model(torch.from_numpy(x)).numpy()
+        return ref, onnx_model.predict(x)
+
+    # Noise only checks the numbers agree; masks on it mean nothing.
+    ref, out = both(_inputs(size, samples))
+    diff = np.abs(ref - out)
+    ious = {}
+    for name, x in _fixture_inputs(fixture_dir, size).items():
+        ref, out = both(x)
+        ious[name] = round(mask_iou(ref > 0, out > 0), 5)
+    return {
+        "specialty": specialty,
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+        "mask_iou": ious,
+        "min_mask_iou": min(ious.values()) if ious else None,
+    }
+
+
+def _time(fn, x, iters: int, warmup: int = 2) -> dict:
+    for _ in range(warmup):
+        fn(x)
+    times = []
+    for _ in range(iters):
+        t0 = time.perf_counter()
+        fn(x)
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return {"p50_ms": round(statistics.median(times), 1),
+            "p90_ms": round(times[int(0.9 * (len(times) - 1))], 1)}
+
+
+def bench(specialty: str, out_dir: str, size: int, batch: int, iters: int) -> dict:
+    from .model_registry import load_torch_segmenter
+
+    x = _inputs(size, batch)
+    torch_model = load_torch_segmenter(specialty)
+    xt = torch.from_numpy(x)
+
+    def run_torch(_):
+        with torch.no_grad():
+            torch_model(xt)
+
+    report = {"specialty": specialty, "torch": _time(run_torch, x, iters)}
+    for quantized, label in ((False, "onnx_fp32"), (True, "onnx_int8")):
+        path = onnx_path(specialty, quantized, out_dir)
+        if os.path.exists(path):
+            report[label] = _time(OnnxSegmenter(path).predict, x, iters)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .model_registry import SEGMENTER_SPECIALTIES
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["export", "compare", "bench"])
+    parser.add_argument("--specialty", action="append", choices=SEGMENTER_SPECIALTIES,
+                        help="repeatable; defaults to all segmenters")
+    parser.add_argument("--out-dir", default=settings.SEGMENTER_ONNX_DIR)
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--quantize", action="store_true",
+                        help="export: also write INT8; compare: check the INT8 model")
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--iters", type=int, default=20)
+    parser.add_argument("--max-diff", type=float, default=None,
+                        help="compare: exit non-zero if any max_abs_diff exceeds this")
+    parser.add_argument("--fixtures", default="fixtures/watermark",
+                        help="compare: directory of real images for the mask IoU check")
+    parser.add_argument("--min-iou", type=float, default=None,
+                        help="compare: exit non-zero if any image's mask IoU is below this")
+    args = parser.parse_args(argv)
+
+    if args.size % _SIZE_MULTIPLE:
+        parser.error(f"--size must be a multiple of {_SIZE_MULTIPLE}")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    failed = False
+    for specialty in args.specialty or SEGMENTER_SPECIALTIES:
+        if args.command == "export":
+            for path in export_segmenter(specialty, args.out_dir, args.size, quantize=args.quantize):
+                logger.info(f"wrote {path}")
+        elif args.command == "compare":
+            result = compare(specialty, args.out_dir, args.size, args.quantize, args.fixtures)
+            logger.info(result)
+            if args.max_diff is not None and result["max_abs_diff"] > args.max_diff:
+                failed = True
+            if (args.min_iou is not None and result["min_mask_iou"] is not None
+                    and result["min_mask_iou"] < args.min_iou):
+                failed = True
+        else:
+            logger.info(bench(specialty, args.out_dir, args.size, args.batch, args.iters))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
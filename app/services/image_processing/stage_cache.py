@@ -0,0 +1,182 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def chain_key(parent: str, step: str, params: dict) -> str:
+    """Key of a stage: its upstream chain plus this step's identity and params."""
+    payload = json.dumps({"parent": parent, "step": step, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class StageCache:
+    """Cache of intermediate pipeline images keyed by chain hash.
+
+    Recently used stages are held in memory up to ``memory_bytes``; the least
+    recently used ones are evicted to ``disk_dir`` as compressed ``.npz``
+    files, which are themselves pruned oldest-first above ``disk_bytes``.
+    Cached arrays are copied on the way in and out, so steps that modify
+    their input in place cannot corrupt an entry.
+    """
+
+    def __init__(self, memory_bytes: int, disk_dir: Optional[str], disk_bytes: int):
+        self._memory_bytes = memory_bytes
+        self._disk_dir = disk_dir
+        self._disk_bytes = disk_bytes
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, dict]]" = OrderedDict()
+        self._used = 0
+        self._disk_used: Optional[int] = None
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "spills": 0}
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self._disk_dir, key[:2], f"{key}.npz")
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0].copy(), dict(entry[1])
+        entry = self._load(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["disk_hits"] += 1
+        self._put_memory(key, entry[0], entry[1])
+        return entry[0].copy(), dict(entry[1])
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            if key in self._entries:
+                return True
+        return bool(self._disk_dir) and os.path.exists(self._disk_path(key))
+
+    def put(self, key: str, image: np.ndarray, meta: dict):
+        self._put_memory(key, image.copy(), dict(meta))
+
+    def _put_memory(self, key: str, image: np.ndarray, meta: dict):
+        if image.nbytes > self._memory_bytes:
+            self._spill(key, image, meta)
+            return
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._used -= old[0].nbytes
+            self._entries[key] = (image, meta)
+            self._used += image.nbytes
+            while self._used > self._memory_bytes and self._entries:
+                old_key, (old_img, old_meta) = self._entries.popitem(last=False)
+                self._used -= old_img.nbytes
+                evicted.append((old_key, old_img, old_meta))
+        for old_key, old_img, old_meta in evicted:
+            self._spill(old_key, old_img, old_meta)
+
+    def _load(self, key: str) -> Optional[Tuple[np.ndarray, dict]]:
+        if not self._disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with np.load(path) as data:
+                image = data["image"]
+                meta = json.loads(str(data["meta"]))
+            os.utime(path)
+            return image, meta
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Dropping unreadable stage cache file {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _spill(self, key: str, image: np.ndarray, meta: dict):
+        if not self._disk_dir:
+            return
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                np.savez_compressed(f, image=image, meta=np.array(json.dumps(meta)))
+            os.replace(tmp, path)
+            self.stats["spills"] += 1
+            self._account_disk(os.path.getsize(path))
+        except OSError as e:
+            logger.warning(f"Stage cache spill failed for {key}: {e}")
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self._disk_dir):
+            for name in files:
+                if name.endswith(".npz"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _account_disk(self, added: int):
+        with self._lock:
+            if self._disk_used is None:
+                self._disk_used = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_used += added
+            if self._disk_used <= self._disk_bytes:
+                return
+            files = sorted(self._disk_files(), key=lambda f: f[2])
+            target = int(self._disk_bytes * 0.9)
+            total = sum(size for _, size, _ in files)
+            for path, size, _ in files:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self._disk_used = total
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "memory_entries": len(self._entries),
+                "memory_bytes": self._used,
+                "disk_bytes": self._disk_used,
+            }
+
+
+_stage_cache: Optional[StageCache] = None
+_stage_cache_lock = threading.Lock()
+
+
+def get_stage_cache() -> Optional[StageCache]:
+    global _stage_cache
+    if not settings.STAGE_CACHE_ENABLED:
+        return None
+    if _stage_cache is None:
+        with _stage_cache_lock:
+            if _stage_cache is None:
+                _stage_cache = StageCache(
+                    memory_bytes=settings.STAGE_CACHE_MEMORY_MB * 1024 * 1024,
+                    disk_dir=settings.STAGE_CACHE_DIR or None,
+                    disk_bytes=settings.STAGE_CACHE_DISK_MB * 1024 * 1024,
+                )
+    return _stage_cache
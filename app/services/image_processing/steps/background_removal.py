@@ -1,9 +1,9 @@
 import logging
-import cv2
+from typing import Optional
+
 import numpy as np
-from PIL import Image
 
-from ..model_registry import get_remover
+from ..context import ProcessingContext
 
 logger = logging.getLogger(__name__)
 
@@ -13,27 +13,28 @@ class BackgroundRemovalStep:
         
         self.background_color = background_color
 
-    def process(self, image: np.ndarray, original: np.ndarray) -> np.ndarray:
+    def process(
+        self,
+        image: np.ndarray,
+        original: np.ndarray,
+        context: Optional[ProcessingContext] = None,
+    ) -> np.ndarray:
         try:
-            img_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            pil_img = Image.fromarray(img_rgb)
-            remover = get_remover()
-            out = remover.process(pil_img)
+            context = context or ProcessingContext()
+            alpha = context.product_alpha(image)
+            bgr = context.product_foreground(image)
 
             if self.background_color == "transparent":
-                return cv2.cvtColor(np.array(out), cv2.COLOR_RGBA2BGRA)
-            else:
-                rgb = tuple(int(self.background_color.lstrip('#')[i:i+2], 16)
-                            for i in (0, 2, 4))
-                bg = Image.new("RGB", out.size, rgb)
-
-                if out.mode == "RGBA":
-                    bg.paste(out, mask=out.split()[3])
-                else:
-                    bg.paste(out)
+                return np.dstack([bgr, alpha])
 
-                return cv2.cvtColor(np.array(bg), cv2.COLOR_RGB2BGR)
+            r, g, b = (int(self.background_color.lstrip('#')[i:i+2], 16)
+                       for i in (0, 2, 4))
+            a = alpha[:, :, np.newaxis].astype(np.float32) / 255.0
+            bg = np.array([b, g, r], dtype=np.float32)
+            out = bgr.astype(np.float32) * a + bg * (1.0 - a)
+            return np.clip(out + 0.5, 0, 255).astype(np.uint8)
 
         except Exception as e:
             logger.error(f"BG removal failed: {e}")
             return image
+
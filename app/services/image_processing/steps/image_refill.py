@@ -2,13 +2,14 @@ import logging
 import cv2
 import numpy as np
 from ..model_registry import get_iopaint
-from iopaint.schema import InpaintRequest, HDStrategy
 
 logger = logging.getLogger(__name__)
 
 
 class ImageRefillStep:
-    def process(self, image: np.ndarray, original: np.ndarray) -> np.ndarray:
+    def process(self, image: np.ndarray, original: np.ndarray, context=None) -> np.ndarray:
+        from iopaint.schema import InpaintRequest, HDStrategy
+
         try:
             logger.info("Auto-analyzing geometry for IOPaint refill...")
             h, w = image.shape[:2]
@@ -6,7 +6,7 @@ logger = logging.getLogger(__name__)
 
 
 class RetouchStep:
-    def process(self, image: np.ndarray, original: np.ndarray) -> np.ndarray:
+    def process(self, image: np.ndarray, original: np.ndarray, context=None) -> np.ndarray:
         try:
             mode = "auto"
             if mode == "auto":
@@ -5,8 +5,7 @@ import io
 import os
 import logging
 from typing import Optional, Dict, Any
-from app.services.image_processing.model_registry import get_rembg_session
-from rembg import remove
+from app.services.image_processing.context import ProcessingContext
 
 logger = logging.getLogger(__name__)
 
@@ -70,25 +69,26 @@ class RoomVisualizerStep:
         # Use provided y or fall back to registry default floor level
         self.y_percent = y_percent or ROOM_REGISTRY.get(
             room_id, {}).get("floor_y", 80)
-        self.session = get_rembg_session()
         self.static_base = os.path.join("app", "static", "rooms")
 
     # app/services/image_processing/steps/room_visualizer.py
 
-    def process(self, image: np.ndarray) -> np.ndarray:
+    def process(
+        self,
+        image: np.ndarray,
+        original: Optional[np.ndarray] = None,
+        context: Optional[ProcessingContext] = None,
+    ) -> np.ndarray:
         """
         Input: BGR Image (OpenCV)
         Output: BGR Image (OpenCV) composited into a room
         """
         try:
-            # 1. Background Removal (Convert BGR to PIL for rembg compatibility)
-            # Convert OpenCV (BGR) to PIL (RGB)
+            # 1. Background Removal via the shared product alpha
+            context = context or ProcessingContext()
+            alpha = context.product_alpha(image)
             img_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            pil_input = Image.fromarray(img_rgb)
-
-            # Remove BG (When passed a PIL Image, rembg returns a PIL Image)
-            logger.info("Running background removal...")
-            pil_prod = remove(pil_input, session=self.session).convert("RGBA")
+            pil_prod = Image.fromarray(np.dstack([img_rgb, alpha]), "RGBA")
 
             # 2. Load Room Background
             room_info = ROOM_REGISTRY.get(self.room_id)
@@ -102,10 +102,7 @@ from typing import Optional, Tuple
 from dataclasses import dataclass, asdict, field
 from pathlib import Path
 
-# External Dependencies
-from skimage.segmentation import slic as sk_slic
-from app.services.image_processing.model_registry import get_rembg_session
-from rembg import remove
+from ..context import ProcessingContext
 
 logger = logging.getLogger(__name__)
 
@@ -164,10 +161,12 @@ class _Thresholds:
 # ─── CORE MATHEMATICAL FUNCTIONS ───
 
 
-def _calibrate(img_bgr: np.ndarray, cfg: ShadowConfig) -> _Thresholds:
+def _calibrate(img_bgr: np.ndarray, cfg: ShadowConfig, scale: float = 1.0) -> _Thresholds:
+    """Background statistics from the border strips. ``img_bgr`` may be a
+    proxy of the frame downscaled by ``scale``; pixel settings follow it."""
     h, w = img_bgr.shape[:2]
-    bp = max(1, min(cfg.border_px, h // 8, w // 8))
-    ec = cfg.border_exclude_corners
+    bp = max(1, min(round(cfg.border_px * scale), h // 8, w // 8))
+    ec = round(cfg.border_exclude_corners * scale)
 
     top = img_bgr[:bp, ec:w-ec].reshape(-1, 3)
     bottom = img_bgr[-bp:, ec:w-ec].reshape(-1, 3)
@@ -254,25 +253,30 @@ class ShadowRemovalStep:
 
         # Initialize the professional config
         self.cfg = ShadowConfig(backend=backend, max_side=max_side)
-        self.session = get_rembg_session()
-    def process(self, image: np.ndarray, original: np.ndarray = None) -> np.ndarray:
+
+    def process(
+        self,
+        image: np.ndarray,
+        original: np.ndarray = None,
+        context: Optional[ProcessingContext] = None,
+    ) -> np.ndarray:
         """
         Main pipeline: Detect Product -> Calibrate -> Detect Shadow -> Correct Surface.
         """
         try:
             h_orig, w_orig = image.shape[:2]
 
-            # 1. Product Mask (Protection)
-            logger.info("Detecting product mask (rembg)...")
-            img_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            p_mask = remove(img_rgb, session=self.session, only_mask=True)
-            p_mask = (np.array(p_mask) > 128).astype(np.uint8) * 255
+            context = context or ProcessingContext()
+
+            # 1. Product Mask (Protection), shared with later steps
+            p_mask = context.product_mask(image)
 
-            # 2. Calibration
-            t = _calibrate(image, self.cfg)
+            # 2. Calibration (border statistics, taken from the proxy)
+            small = context.proxy(image)
+            t = _calibrate(small, self.cfg, small.shape[0] / h_orig)
 
             # 3. Shadow Confidence Map
-            lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB).astype(np.float32)
+            lab = context.lab(image).astype(np.float32)
             dL = t.bg_lab[0] - lab[:, :, 0]
             da, db = lab[:, :, 1] - t.bg_lab[1], lab[:, :, 2] - t.bg_lab[2]
             chroma = np.sqrt(da**2 + db**2)  # Simplified for API
@@ -299,6 +303,7 @@ class ShadowRemovalStep:
             s_mask = cv2.dilate(s_mask, cv2.getStructuringElement(
                 cv2.MORPH_ELLIPSE, (exp, exp)))
             s_mask[p_mask > 0] = 0  # Protect product
+            context.debug.emit("shadow_mask", s_mask)
 
             shadow_px = int((s_mask > 0).sum())
             if shadow_px < 50:
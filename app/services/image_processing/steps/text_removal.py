@@ -3,39 +3,45 @@ Production-ready embedded text removal.
 
 Pipeline
 --------
-1. Multi-pass EasyOCR detection (standard + aggressive low-confidence pass)
+1. Single CRAFT forward pass (EasyOCR's detector, no recognition); the
+   standard and aggressive threshold tiers are both read off its heatmaps,
+   and boxes with a weak mean region score (texture false positives) are
+   dropped in place of the old recognition-confidence cut
 2. Adaptive mask construction
    - Convex-hull polygon fill per detected word box
    - Dilation kernel scaled to image resolution
    - Connected-component merging of nearby blobs (gap ≤ 20 px)
    - Coverage guard: abort if mask > 40 % of image (false-positive protection)
-3. LaMa AI inpainting for seamless background reconstruction
+3. LaMa AI inpainting on padded tiles around each mask region, blended
+   back with feathered seams (cost follows mask area, not image size)
 4. Graceful per-region fallback to border-color fill if LaMa is unavailable
 """
 
 import logging
-from typing import List, Tuple
+from typing import Tuple
 
 import cv2
 import numpy as np
-from PIL import Image
 
-from ..model_registry import get_lama, get_ocr_reader
+from ..model_registry import get_ocr_reader
+from ..tiled_inpaint import inpaint as lama_tiled_inpaint
 
 logger = logging.getLogger(__name__)
 
 # ── Tuning constants ──────────────────────────────────────────────────────────
-_OCR_STD_CONF = 0.50          # Confidence threshold — standard pass
-_OCR_AGG_CONF = 0.30          # Confidence threshold — aggressive pass (small/faint text)
-_OCR_TEXT_THRESH_STD = 0.5    # EasyOCR text_threshold for standard pass
-_OCR_TEXT_THRESH_AGG = 0.25   # EasyOCR text_threshold for aggressive pass
-_OCR_LINK_THRESH = 0.3        # EasyOCR link_threshold (both passes)
-_OCR_LOW_TEXT = 0.3           # EasyOCR low_text (both passes)
+_OCR_TEXT_THRESH_STD = 0.5    # CRAFT text_threshold — standard tier
+_OCR_TEXT_THRESH_AGG = 0.25   # CRAFT text_threshold — aggressive tier (small/faint text)
+_OCR_LINK_THRESH = 0.3        # CRAFT link_threshold (both tiers)
+_OCR_LOW_TEXT = 0.3           # CRAFT low_text (both tiers)
+_OCR_CANVAS_SIZE = 2560       # Detector input limit (EasyOCR default)
+_OCR_MIN_SIZE = 20            # Drop grouped boxes smaller than this (EasyOCR default)
+_DET_STD_SCORE = 0.45         # Min mean region score of a box — standard tier
+_DET_AGG_SCORE = 0.35         # Min mean region score of a box — aggressive tier
+_DUPLICATE_IOU = 0.4          # Aggressive box overlapping a standard one → duplicate
 _MIN_BBOX_PX = 6              # Minimum bbox side-length to consider (px)
 _DILATION_SCALE = 0.006       # Dilation kernel = max(h,w) × this, minimum 8 px
 _MERGE_GAP_PX = 20            # Connected-component merge distance (px)
 _MAX_MASK_COVERAGE = 0.40     # Abort if mask covers > 40 % of image
-_LAMA_MAX_DIM = 2048          # Limit for LaMa inference (memory safety)
 # ─────────────────────────────────────────────────────────────────────────────
 
 
@@ -47,22 +53,86 @@ def _build_dilation_kernel(h: int, w: int) -> np.ndarray:
     return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (side, side))
 
 
+def _box_scores(score_text: np.ndarray, boxes: np.ndarray, ratio: float) -> np.ndarray:
+    """
+    Mean CRAFT region score of the text pixels (above low_text) inside each
+    box, in 0..1. Printed text scores high across its characters; textures
+    that only graze the thresholds score low. Stands in for the recognition
+    confidence ``readtext`` used to filter on.
+    """
+    # The score map is half the resized input; boxes are in image pixels.
+    rects = np.round(_rects(boxes) / (ratio * 2)).astype(np.int32)
+    hm_h, hm_w = score_text.shape
+    scores = np.zeros(len(boxes), dtype=np.float32)
+    for i, (x1, y1, x2, y2) in enumerate(rects):
+        region = score_text[max(0, y1):min(hm_h, y2 + 1), max(0, x1):min(hm_w, x2 + 1)]
+        text_px = region[region > _OCR_LOW_TEXT]
+        scores[i] = text_px.mean() if text_px.size else 0.0
+    return scores
+
+
+def _detect_text_boxes(reader, image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run EasyOCR's CRAFT detector once and return (standard, aggressive)
+    word boxes, each an (N, 4, 2) array of corner points.
+
+    ``readtext`` would run the detector and the recogniser once per
+    threshold; only the boxes are needed for masking, and CRAFT's
+    thresholds are applied after the forward pass, so both tiers come from
+    the same score maps. Boxes are grouped into lines exactly as
+    ``Reader.detect`` does, then filtered on their region score
+    (``_DET_STD_SCORE`` / ``_DET_AGG_SCORE``).
+    """
+    import torch
+    from easyocr.craft_utils import adjustResultCoordinates, getDetBoxes
+    from easyocr.imgproc import normalizeMeanVariance, resize_aspect_ratio
+    from easyocr.utils import group_text_box
+
+    resized, target_ratio, _ = resize_aspect_ratio(
+        image[:, :, :3], _OCR_CANVAS_SIZE, interpolation=cv2.INTER_LINEAR, mag_ratio=1.0
+    )
+    x = torch.from_numpy(np.transpose(normalizeMeanVariance(resized), (2, 0, 1))[None])
+    with torch.no_grad():
+        y, _ = reader.detector(x.to(reader.device))
+    score_text = y[0, :, :, 0].cpu().numpy()
+    score_link = y[0, :, :, 1].cpu().numpy()
+    ratio = 1 / target_ratio
+
+    tiers = []
+    for text_threshold, min_score in (
+        (_OCR_TEXT_THRESH_STD, _DET_STD_SCORE),
+        (_OCR_TEXT_THRESH_AGG, _DET_AGG_SCORE),
+    ):
+        boxes, _, _ = getDetBoxes(
+            score_text, score_link, text_threshold, _OCR_LINK_THRESH, _OCR_LOW_TEXT, poly=False
+        )
+        boxes = adjustResultCoordinates(boxes, ratio, ratio)
+        polys = [np.array(b).astype(np.int32).reshape(-1) for b in boxes]
+        horizontal, free = group_text_box(polys, 0.1, 0.5, 0.5, 0.5, 0.1, True)
+        quads = [[(x1, y1), (x2, y1), (x2, y2), (x1, y2)] for x1, x2, y1, y2 in horizontal]
+        quads += [[tuple(p) for p in f] for f in free]
+        quads = np.array(quads, dtype=np.float32).reshape(-1, 4, 2)
+        extent = quads.max(axis=1) - quads.min(axis=1)
+        quads = quads[extent.max(axis=1) > _OCR_MIN_SIZE]
+        tiers.append(quads[_box_scores(score_text, quads, ratio) >= min_score])
+    return tiers[0], tiers[1]
+
+
 def _detections_to_mask(
-    detections: List[Tuple],
+    detections: np.ndarray,
     h: int,
     w: int,
     kernel: np.ndarray,
 ) -> np.ndarray:
     """
-    Convert EasyOCR detections to a binary inpaint mask.
+    Convert detected word boxes to a binary inpaint mask.
 
-    Each detection is (bbox, text, prob) where bbox is a list of four
-    (x, y) corner points.  We fill the convex hull of those points so the
-    mask is tighter than a plain bounding rectangle.
+    Each box is four (x, y) corner points.  We fill the convex hull of
+    those points so the mask is tighter than a plain bounding rectangle.
     """
     mask = np.zeros((h, w), dtype=np.uint8)
 
-    for bbox, _text, _prob in detections:
+    for bbox in detections:
         points = np.array(bbox, dtype=np.float32)
         hull = cv2.convexHull(points.reshape(-1, 1, 2))
         hull_int = hull.astype(np.int32)
@@ -89,38 +159,6 @@ def _merge_nearby_components(mask: np.ndarray) -> np.ndarray:
     return eroded
 
 
-def _lama_inpaint(image_bgr: np.ndarray, mask: np.ndarray) -> np.ndarray:
-    """
-    Run LaMa inpainting on the full image with the given binary mask.
-
-    Downscales if either dimension exceeds _LAMA_MAX_DIM to stay within
-    memory limits, then upscales the result back to original size.
-    """
-    lama = get_lama()
-    h, w = image_bgr.shape[:2]
-
-    # --- Optional downscale for large images ---
-    scale = 1.0
-    if max(h, w) > _LAMA_MAX_DIM:
-        scale = _LAMA_MAX_DIM / max(h, w)
-        new_w, new_h = int(w * scale), int(h * scale)
-        image_bgr = cv2.resize(image_bgr, (new_w, new_h), interpolation=cv2.INTER_AREA)
-        mask = cv2.resize(mask, (new_w, new_h), interpolation=cv2.INTER_NEAREST)
-        logger.debug(f"LaMa downscale: {w}×{h} → {new_w}×{new_h}")
-
-    pil_img = Image.fromarray(cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB))
-    pil_mask = Image.fromarray(mask)
-
-    result_pil = lama(pil_img, pil_mask)
-    result_bgr = cv2.cvtColor(np.array(result_pil), cv2.COLOR_RGB2BGR)
-
-    # --- Upscale back if we downscaled ---
-    if scale < 1.0:
-        result_bgr = cv2.resize(result_bgr, (w, h), interpolation=cv2.INTER_LANCZOS4)
-
-    return result_bgr
-
-
 def _color_fill_fallback(image_bgr: np.ndarray, mask: np.ndarray) -> np.ndarray:
     """
     Simple fallback: fill masked regions with the median border colour.
@@ -170,54 +208,32 @@ class TextRemovalStep:
     """
     Production-grade embedded text removal step.
 
-    Detection  : EasyOCR (two passes — standard and aggressive)
+    Detection  : EasyOCR's CRAFT detector, one pass, standard + aggressive tiers,
+                 filtered on mean region score
     Mask       : Convex-hull polygon fill, adaptive dilation, component merging
-    Inpainting : LaMa (SimpleLama) with full-resolution output
+    Inpainting : LaMa (SimpleLama) on feathered tiles, full-resolution output
     Fallback   : Border-colour fill when LaMa is unavailable
     """
 
-    def process(self, image: np.ndarray, original: np.ndarray) -> np.ndarray:
+    def process(self, image: np.ndarray, original: np.ndarray, context=None) -> np.ndarray:
         try:
             logger.info("TextRemovalStep: starting production text removal …")
             h, w = image.shape[:2]
             reader = get_ocr_reader()
 
-            # ── Stage 1: Multi-pass OCR detection ────────────────────────────
-            # Standard pass — high-confidence text (headlines, labels, prices)
-            std_results = reader.readtext(
-                image,
-                text_threshold=_OCR_TEXT_THRESH_STD,
-                link_threshold=_OCR_LINK_THRESH,
-                low_text=_OCR_LOW_TEXT,
-                paragraph=False,
-                batch_size=4,
-            )
-            std_detections = [
-                (bbox, txt, prob)
-                for (bbox, txt, prob) in std_results
-                if prob >= _OCR_STD_CONF and _bbox_is_valid(bbox, _MIN_BBOX_PX)
-            ]
-
-            # Aggressive pass — catches small/faint embedded text
-            agg_results = reader.readtext(
-                image,
-                text_threshold=_OCR_TEXT_THRESH_AGG,
-                link_threshold=_OCR_LINK_THRESH,
-                low_text=_OCR_LOW_TEXT,
-                paragraph=False,
-                batch_size=4,
-            )
-            agg_detections = [
-                (bbox, txt, prob)
-                for (bbox, txt, prob) in agg_results
-                if _OCR_AGG_CONF <= prob < _OCR_STD_CONF
-                and _bbox_is_valid(bbox, _MIN_BBOX_PX)
-                and not _is_duplicate(bbox, std_detections)
-            ]
+            # ── Stage 1: OCR detection (one detector pass, two tiers) ────────
+            # Standard tier — high-confidence text (headlines, labels, prices)
+            # Aggressive tier — small/faint embedded text not already covered
+            std_boxes, agg_boxes = _detect_text_boxes(reader, image)
+            std_detections = std_boxes[_boxes_are_valid(std_boxes, _MIN_BBOX_PX)]
+            agg_detections = agg_boxes[_boxes_are_valid(agg_boxes, _MIN_BBOX_PX)]
+            if len(std_detections) and len(agg_detections):
+                overlap = _iou_matrix(agg_detections, std_detections).max(axis=1)
+                agg_detections = agg_detections[overlap < _DUPLICATE_IOU]
 
-            all_detections = std_detections + agg_detections
+            all_detections = np.concatenate([std_detections, agg_detections])
 
-            if not all_detections:
+            if not len(all_detections):
                 logger.info("TextRemovalStep: no text detected — image unchanged.")
                 return image
 
@@ -232,6 +248,9 @@ class TextRemovalStep:
             raw_mask = _detections_to_mask(all_detections, h, w, kernel)
             merged_mask = _merge_nearby_components(raw_mask)
 
+            if context is not None:
+                context.debug.emit("text_mask", merged_mask)
+
             # Coverage guard — bail out if mask looks like a false positive
             coverage = float(np.count_nonzero(merged_mask)) / (h * w)
             logger.info(f"TextRemovalStep: mask coverage = {coverage * 100:.1f} %")
@@ -249,7 +268,7 @@ class TextRemovalStep:
 
             # ── Stage 3: LaMa AI inpainting ───────────────────────────────────
             try:
-                result = _lama_inpaint(image, merged_mask)
+                result = lama_tiled_inpaint(image, merged_mask)
                 logger.info(
                     f"TextRemovalStep: LaMa inpainting complete "
                     f"({len(all_detections)} regions, {coverage*100:.1f}% coverage)."
@@ -273,39 +292,24 @@ class TextRemovalStep:
 
 # ── Helper functions ──────────────────────────────────────────────────────────
 
-def _bbox_is_valid(bbox, min_px: int) -> bool:
-    """Return True only if the bounding box has sufficient size to process."""
-    try:
-        pts = np.array(bbox, dtype=np.float32)
-        x, y, bw, bh = cv2.boundingRect(pts.reshape(-1, 1, 2).astype(np.int32))
-        return bw >= min_px and bh >= min_px
-    except Exception:
-        return False
-
-
-def _iou(bbox_a, bbox_b) -> float:
-    """Compute approximate IoU between two EasyOCR bboxes."""
-    try:
-        pts_a = np.array(bbox_a, dtype=np.int32)
-        pts_b = np.array(bbox_b, dtype=np.int32)
-        xa, ya, wa, ha = cv2.boundingRect(pts_a.reshape(-1, 1, 2))
-        xb, yb, wb, hb = cv2.boundingRect(pts_b.reshape(-1, 1, 2))
-
-        ix1, iy1 = max(xa, xb), max(ya, yb)
-        ix2, iy2 = min(xa + wa, xb + wb), min(ya + ha, yb + hb)
-        if ix2 <= ix1 or iy2 <= iy1:
-            return 0.0
-
-        inter = (ix2 - ix1) * (iy2 - iy1)
-        union = wa * ha + wb * hb - inter
-        return inter / max(union, 1)
-    except Exception:
-        return 0.0
-
-
-def _is_duplicate(bbox, existing: list, iou_thresh: float = 0.4) -> bool:
-    """Return True if bbox significantly overlaps any bbox in existing."""
-    for (ex_bbox, _, _) in existing:
-        if _iou(bbox, ex_bbox) >= iou_thresh:
-            return True
-    return False
+def _rects(boxes: np.ndarray) -> np.ndarray:
+    """(N, 4, 2) corner points → (N, 4) axis-aligned x1, y1, x2, y2."""
+    return np.concatenate([boxes.min(axis=1), boxes.max(axis=1)], axis=1)
+
+
+def _boxes_are_valid(boxes: np.ndarray, min_px: int) -> np.ndarray:
+    """Mask of boxes whose bounding rectangle is at least min_px on both sides."""
+    rects = _rects(boxes)
+    return ((rects[:, 2] - rects[:, 0]) >= min_px) & ((rects[:, 3] - rects[:, 1]) >= min_px)
+
+
+def _iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of the bounding rectangles of two box sets, shape (len(a), len(b))."""
+    a = _rects(boxes_a)[:, None, :]
+    b = _rects(boxes_b)[None, :, :]
+    iw = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    ih = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = iw * ih
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1)
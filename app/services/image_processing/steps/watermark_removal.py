@@ -1,19 +1,17 @@
 import cv2
 import numpy as np
-import torch
 import logging
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from typing import Protocol, runtime_checkable, Tuple, Optional, Dict, Any
 from enum import Enum, auto
 from dataclasses import dataclass
 
-logger = logging.getLogger(__name__)
+from ..context import ProcessingContext
+from ..utils import upsample_mask
 
-try:
-    import easyocr
-    EASYOCR_AVAILABLE = True
-except ImportError:
-    EASYOCR_AVAILABLE = False
+logger = logging.getLogger(__name__)
 
 try:
     from scipy.signal import find_peaks
@@ -43,12 +41,10 @@ class ContentTypeClassifier:
     def __init__(self):
         self.mser = cv2.MSER_create() if hasattr(cv2, 'MSER_create') else None
     
-    def predict(self, image: np.ndarray) -> Tuple[ContentType, float]:
+    def predict(self, image: np.ndarray, gray: Optional[np.ndarray] = None) -> Tuple[ContentType, float]:
         try:
-            if len(image.shape) == 3:
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = image
+            if gray is None:
+                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
             
             # Calculate features
             h, w = gray.shape
@@ -206,48 +202,67 @@ class ContentTypeClassifier:
 
 
 class UniversalWatermarkDetector:
-    """Multi-modal detector with coverage filtering."""
-    
+    """Multi-modal detector with coverage filtering.
+
+    The frequency, diagonal-edge and opacity detectors share one grayscale
+    conversion and run concurrently (FFT and OpenCV release the GIL).
+    """
+
+    # Combination threshold per content type (fraction of 255).
+    THRESHOLDS = {
+        ContentType.UNIFORM: 0.15,
+        ContentType.TEXT: 0.40,
+        ContentType.TEXTURE: 0.25,
+        ContentType.MIXED: 0.30,
+        ContentType.PRODUCT_ON_WHITE: 0.20
+    }
+
+    _pool: Optional[ThreadPoolExecutor] = None
+    _pool_lock = threading.Lock()
+
     def __init__(self):
         pass
-    
-    def detect(self, image: np.ndarray, content_type: ContentType) -> DetectionResult:
+
+    @classmethod
+    def _executor(cls) -> ThreadPoolExecutor:
+        if cls._pool is None:
+            with cls._pool_lock:
+                if cls._pool is None:
+                    cls._pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="wm-detect")
+        return cls._pool
+
+    def detect(self, image: np.ndarray, content_type: ContentType,
+               gray: Optional[np.ndarray] = None) -> DetectionResult:
         try:
             h, w = image.shape[:2]
+            if gray is None:
+                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+
+            pool = self._executor()
+            futures = [
+                (pool.submit(self._frequency_detect, gray), "frequency"),
+                (pool.submit(self._diagonal_detect, gray), "edge"),
+                (pool.submit(self._opacity_detect, gray, content_type), "opacity"),
+            ]
             results = []
-            
-            # Run detection methods
-            try:
-                freq_mask, freq_conf = self._frequency_detect(image)
-                if freq_mask is not None:
-                    results.append((freq_mask, freq_conf, "frequency"))
-            except Exception as e:
-                logger.debug(f"Freq detect failed: {e}")
-            
-            try:
-                edge_mask, edge_conf = self._diagonal_detect(image)
-                if edge_mask is not None:
-                    results.append((edge_mask, edge_conf, "edge"))
-            except Exception as e:
-                logger.debug(f"Edge detect failed: {e}")
-            
-            try:
-                opacity_mask, opacity_conf = self._opacity_detect(image, content_type)
-                if opacity_mask is not None:
-                    results.append((opacity_mask, opacity_conf, "opacity"))
-            except Exception as e:
-                logger.debug(f"Opacity detect failed: {e}")
-            
+            for future, name in futures:
+                try:
+                    mask, conf = future.result()
+                    if mask is not None:
+                        results.append((mask, conf, name))
+                except Exception as e:
+                    logger.debug(f"{name} detect failed: {e}")
+
             # Filter out full-image masks
             valid_results = []
             for mask, conf, name in results:
-                coverage = np.sum(mask > 0) / mask.size
+                coverage = cv2.countNonZero(mask) / mask.size
                 if coverage > 0.75:
                     if content_type == ContentType.PRODUCT_ON_WHITE and name == "frequency":
                         # Erode the mask to remove full-image coverage
                         kernel = np.ones((21, 21), np.uint8)
                         mask = cv2.erode(mask, kernel, iterations=2)
-                        new_coverage = np.sum(mask > 0) / mask.size
+                        new_coverage = cv2.countNonZero(mask) / mask.size
                         logger.info(f"Eroded frequency mask: {coverage:.1%} -> {new_coverage:.1%}")
                         if new_coverage < 0.75 and new_coverage > 0.05:
                             valid_results.append((mask, conf, name))
@@ -255,131 +270,122 @@ class UniversalWatermarkDetector:
                         logger.warning(f"Rejecting {name}: covers {coverage:.1%}")
                 else:
                     valid_results.append((mask, conf, name))
-            
+
             if not valid_results:
                 return DetectionResult(np.zeros((h, w), dtype=np.uint8), 0.0, "none")
-            
-            # Combine masks
-            combined = np.zeros((h, w), dtype=float)
-            total_conf = sum([r[1] for r in valid_results])
-            
-            for mask, conf, name in valid_results:
-                combined += mask.astype(float) * (conf / total_conf if total_conf > 0 else 1)
-            
-            # Threshold
-            thresholds = {
-                ContentType.UNIFORM: 0.15,
-                ContentType.TEXT: 0.40,
-                ContentType.TEXTURE: 0.25,
-                ContentType.MIXED: 0.30,
-                ContentType.PRODUCT_ON_WHITE: 0.20
-            }
-            
-            thresh = thresholds.get(content_type, 0.25) * 255
+
+            # Confidence-weighted vote, thresholded per content type
+            total_conf = sum(r[1] for r in valid_results)
+            combined = np.zeros((h, w), dtype=np.float32)
+            for mask, conf, _ in valid_results:
+                weight = conf / total_conf if total_conf > 0 else 1.0
+                cv2.scaleAdd(mask.astype(np.float32), float(weight), combined, dst=combined)
+
+            thresh = self.THRESHOLDS.get(content_type, 0.25) * 255
             binary_mask = (combined > thresh).astype(np.uint8) * 255
-            
+
             # Cleanup
             kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
             binary_mask = cv2.morphologyEx(binary_mask, cv2.MORPH_CLOSE, kernel)
-            
-            final_conf = max([r[1] for r in valid_results])
-            method_str = "+".join([r[2] for r in valid_results])
-            
+
+            final_conf = max(r[1] for r in valid_results)
+            method_str = "+".join(r[2] for r in valid_results)
+
             return DetectionResult(binary_mask, final_conf, method_str)
-            
+
         except Exception as e:
             logger.error(f"Detection error: {e}")
             h, w = image.shape[:2]
             return DetectionResult(np.zeros((h, w), dtype=np.uint8), 0.0, "error")
-    
-    def _frequency_detect(self, image: np.ndarray):
+
+    def _frequency_detect(self, gray: np.ndarray):
         try:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
-            h, w = gray.shape
-            
-            f = np.fft.fft2(gray)
-            fshift = np.fft.fftshift(f)
-            mag_log = np.log(np.abs(fshift) + 1)
-            
+            # cv2.dft keeps CV_32F end to end (np.fft always computes in
+            # complex128). The spectrum is unshifted: DC sits in the corners.
+            g = gray.astype(np.float32)
+            f = cv2.dft(g, flags=cv2.DFT_COMPLEX_OUTPUT)
+            mag_log = np.log1p(cv2.magnitude(f[:, :, 0], f[:, :, 1]))
+
             # Exclude DC
-            cy, cx = h // 2, w // 2
-            mag_log[cy-5:cy+5, cx-5:cx+5] = 0
-            
+            for rows in (slice(None, 5), slice(-5, None)):
+                for cols in (slice(None, 5), slice(-5, None)):
+                    mag_log[rows, cols] = 0
+
             peak_thresh = np.percentile(mag_log, 99.0)
-            peaks = (mag_log > peak_thresh).astype(np.uint8) * 255
-            
-            if np.sum(peaks) < 50:
+            n_peaks = int(np.count_nonzero(mag_log > peak_thresh))
+
+            if n_peaks * 255 < 50:
                 return None, 0.0
-            
+
             # Create mask from frequency peaks
-            f_filtered = np.fft.fftshift(f).copy()
-            f_filtered[mag_log < peak_thresh * 0.8] *= 0.3
-            img_back = np.abs(np.fft.ifft2(np.fft.ifftshift(f_filtered)))
-            
-            diff = np.abs(gray.astype(float) - img_back)
-            diff_norm = (diff - diff.min()) / (diff.max() - diff.min() + 1e-8)
-            
+            f[mag_log < peak_thresh * 0.8] *= 0.3
+            img_back = np.abs(cv2.idft(f, flags=cv2.DFT_SCALE | cv2.DFT_REAL_OUTPUT))
+
+            diff = np.abs(g - img_back)
+            lo, hi = float(diff.min()), float(diff.max())
+            diff_norm = (diff - lo) / (hi - lo + 1e-8)
+
             mask = (diff_norm > 0.3).astype(np.uint8) * 255
             kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7))
             mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-            
-            return mask, min(np.sum(peaks) / 1000, 1.0)
+
+            return mask, min(n_peaks * 255 / 1000, 1.0)
         except:
             return None, 0.0
-    
-    def _diagonal_detect(self, image: np.ndarray):
+
+    def _diagonal_detect(self, gray: np.ndarray):
         try:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
             edges = cv2.Canny(gray, 50, 150)
-            lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=80, 
+            lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=80,
                                    minLineLength=40, maxLineGap=10)
-            
+
             if lines is None:
                 return None, 0.0
-            
-            mask = np.zeros_like(gray)
-            count = 0
-            
-            for line in lines:
-                x1, y1, x2, y2 = line[0]
-                angle = np.abs(np.arctan2(y2 - y1, x2 - x1) * 180.0 / np.pi)
-                
-                if (30 < angle < 60) or (120 < angle < 150):
-                    cv2.line(mask, (x1, y1), (x2, y2), 255, thickness=10)
-                    count += 1
-            
-            if count == 0:
+
+            segments = lines[:, 0, :]
+            angle = np.abs(np.degrees(np.arctan2(segments[:, 3] - segments[:, 1],
+                                                 segments[:, 2] - segments[:, 0])))
+            diagonal = segments[((angle > 30) & (angle < 60)) | ((angle > 120) & (angle < 150))]
+
+            if len(diagonal) == 0:
                 return None, 0.0
-            
+
+            mask = np.zeros_like(gray)
+            cv2.polylines(mask, list(diagonal.reshape(-1, 2, 2).astype(np.int32)),
+                          isClosed=False, color=255, thickness=10)
+
             kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7))
             mask = cv2.dilate(mask, kernel, iterations=1)
-            return mask, min(count / 10, 1.0)
+            return mask, min(len(diagonal) / 10, 1.0)
         except:
             return None, 0.0
-    
-    def _opacity_detect(self, image: np.ndarray, content_type: ContentType):
+
+    def _opacity_detect(self, gray: np.ndarray, content_type: ContentType):
         try:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
-            
-            # Local variance
-            local_var = np.zeros_like(gray, dtype=float)
+            # Local variance over a grid of window×window blocks (edge blocks
+            # are partial), from per-block sums of x and x².
             window = 15
-            
-            for y in range(0, gray.shape[0], window):
-                for x in range(0, gray.shape[1], window):
-                    patch = gray[y:y+window, x:x+window]
-                    if patch.size > 0:
-                        local_var[y:y+window, x:x+window] = np.var(patch)
-            
-            local_var = (local_var - local_var.min()) / (local_var.max() - local_var.min() + 1e-8)
-            
+            h, w = gray.shape
+            g = gray.astype(np.float32)
+            rows = np.arange(0, h, window)
+            cols = np.arange(0, w, window)
+            s1 = np.add.reduceat(np.add.reduceat(g, rows, axis=0), cols, axis=1)
+            s2 = np.add.reduceat(np.add.reduceat(g * g, rows, axis=0), cols, axis=1)
+            counts = np.outer(np.diff(np.append(rows, h)), np.diff(np.append(cols, w))).astype(np.float32)
+            mean = s1 / counts
+            block_var = np.maximum(s2 / counts - mean * mean, 0)
+
+            lo, hi = float(block_var.min()), float(block_var.max())
+            block_var = (block_var - lo) / (hi - lo + 1e-8)
+            local_var = np.repeat(np.repeat(block_var, window, axis=0), window, axis=1)[:h, :w]
+
             # Different thresholds for different content
             if content_type == ContentType.UNIFORM:
                 mask = ((local_var > 0.1) & (local_var < 0.6)).astype(np.uint8) * 255
             else:
                 mask = ((local_var > 0.15) & (local_var < 0.7)).astype(np.uint8) * 255
-            
-            conf = min(np.sum(mask) / (mask.size * 255) * 8, 1.0)
+
+            conf = min(cv2.countNonZero(mask) / mask.size * 8, 1.0)
             return mask, conf
         except:
             return None, 0.0
@@ -549,27 +555,30 @@ class TexturePreservingStrategy(RemovalStrategy):
 
 
 class TextAwareStrategy(RemovalStrategy):
-    def __init__(self):
-        self.ocr = None
-        if EASYOCR_AVAILABLE:
-            try:
-                self.ocr = easyocr.Reader(['en'], gpu=False)
-                logger.info("OCR initialized")
-            except Exception as e:
-                logger.warning(f"OCR init failed: {e}")
-    
+    @property
+    def ocr(self):
+        # Shared reader from the model registry, loaded on first use rather
+        # than a new easyocr.Reader per step instance.
+        try:
+            from ..model_registry import get_ocr_reader
+            return get_ocr_reader()
+        except Exception as e:
+            logger.warning(f"OCR init failed: {e}")
+            return None
+
     def remove(self, image, original, mask):
         try:
             if np.sum(mask) == 0:
                 return image
             
-            if self.ocr is None:
+            ocr = self.ocr
+            if ocr is None:
                 # Fallback
                 return cv2.inpaint(image, mask, 2, cv2.INPAINT_TELEA)
             
             # Detect text regions
             try:
-                results = self.ocr.readtext(original, paragraph=False, detail=1)
+                results = ocr.readtext(original, paragraph=False, detail=1)
             except Exception as e:
                 logger.warning(f"OCR read failed: {e}")
                 return cv2.inpaint(image, mask, 2, cv2.INPAINT_TELEA)
@@ -708,7 +717,7 @@ class QualityChecker:
 
 @runtime_checkable
 class ProcessingStep(Protocol):
-    def process(self, image: np.ndarray, original: np.ndarray) -> np.ndarray:
+    def process(self, image: np.ndarray, original: np.ndarray, context=None) -> np.ndarray:
         ...
 
 
@@ -732,7 +741,7 @@ class WatermarkRemovalStep(ProcessingStep):
             logger.error(f"Init failed: {e}")
             raise
     
-    def process(self, image: np.ndarray, original: np.ndarray) -> np.ndarray:
+    def process(self, image: np.ndarray, original: np.ndarray, context=None) -> np.ndarray:
         try:
             if image is None or original is None:
                 logger.error("None input")
@@ -743,10 +752,16 @@ class WatermarkRemovalStep(ProcessingStep):
                 return image
             
             logger.info(f"Processing: {image.shape}")
-            
+
+            # Classification and detection run on the analysis proxy; the
+            # mask is upsampled to the frame for the removal strategies.
+            context = context or ProcessingContext()
+            small = context.proxy(original)
+            small_gray = context.gray(small) if small.ndim == 3 else small
+
             # Classify
             try:
-                content_type, conf = self.classifier.predict(original)
+                content_type, conf = self.classifier.predict(small, small_gray)
                 logger.info(f"Content: {content_type.name} (conf: {conf:.2f})")
             except Exception as e:
                 logger.error(f"Classify failed: {e}")
@@ -754,7 +769,12 @@ class WatermarkRemovalStep(ProcessingStep):
             
             # Detect
             try:
-                detection = self.detector.detect(original, content_type)
+                detection = self.detector.detect(small, content_type, small_gray)
+                detection = DetectionResult(
+                    upsample_mask(detection.mask, original.shape),
+                    detection.confidence,
+                    detection.method,
+                )
                 logger.info(f"Detection: {detection.method}, conf: {detection.confidence:.2f}")
                 
                 coverage = np.sum(detection.mask > 0) / detection.mask.size
@@ -763,16 +783,10 @@ class WatermarkRemovalStep(ProcessingStep):
                 if np.sum(detection.mask) == 0:
                     logger.info("No watermarks")
                     return image
-                
-                # Debug save
-                try:
-                    cv2.imwrite("/tmp/debug_mask.png", detection.mask)
-                    overlay = image.copy()
-                    overlay[detection.mask > 0] = [0, 0, 255]
-                    cv2.imwrite("/tmp/debug_overlay.png", overlay)
-                except Exception as e:
-                    logger.debug(f"Debug save failed: {e}")
-                    
+
+                context.debug.emit("watermark_mask", detection.mask)
+                context.debug.emit("watermark_overlay", image, mask=detection.mask)
+
             except Exception as e:
                 logger.error(f"Detection failed: {e}")
                 return image
@@ -12,6 +12,10 @@ if hasattr(pillow_heif, "register_avif_opener"):
 
 logger = logging.getLogger(__name__)
 
+# Longest side of the analysis proxy. Steps whose output is a statistic or a
+# smooth/blobby mask run on this instead of the full frame.
+PROXY_MAX_DIM = 1024
+
 # def decode_image(file_bytes: bytes) -> np.ndarray:
 #     nparr = np.frombuffer(file_bytes, np.uint8)
 #     img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
@@ -76,13 +80,41 @@ def crop_to_aspect_ratio(image: np.ndarray, ratio_str: str) -> np.ndarray:
         return image[offset: offset + new_h, :].copy()
 
 
-def foreground_mask(img: np.ndarray) -> np.ndarray:
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+def foreground_mask(img: np.ndarray, gray: Optional[np.ndarray] = None) -> np.ndarray:
+    if gray is None:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     blur = cv2.GaussianBlur(gray, (7, 7), 0)
     _, mask = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
     return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((9, 9), np.uint8))
 
 
+def proxy_scale(shape, max_dim: int = PROXY_MAX_DIM) -> float:
+    """Factor that brings a frame of ``shape`` down to ``max_dim`` (never > 1)."""
+    return min(1.0, max_dim / max(shape[:2]))
+
+
+def downscale_max_dim(img: np.ndarray, max_dim: int = PROXY_MAX_DIM) -> np.ndarray:
+    """``img`` with its longest side at most ``max_dim`` (the same array if already small)."""
+    scale = proxy_scale(img.shape, max_dim)
+    if scale >= 1.0:
+        return img
+    h, w = img.shape[:2]
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+def upsample_mask(mask: np.ndarray, shape) -> np.ndarray:
+    """Resize a binary 0/255 mask computed on a proxy back to ``shape``.
+
+    Bilinear plus a mid threshold keeps the edges smooth instead of blocky.
+    """
+    h, w = shape[:2]
+    if mask.shape[:2] == (h, w):
+        return mask
+    resized = cv2.resize(mask, (w, h), interpolation=cv2.INTER_LINEAR)
+    return np.where(resized >= 128, 255, 0).astype(np.uint8)
+
+
 def upscale_to_size(img: np.ndarray, target_w: int, target_h: int) -> np.ndarray:
     h, w = img.shape[:2]
     scale = min(target_w / w, target_h / h)
@@ -0,0 +1,181 @@
+"""Name search over images, projects and upload metadata, served by the
+pg_trgm GIN indexes from migration d81b3f6ac2e4.
+
+The old search OR-ed ``LIKE '%q%'`` over three joined tables, which no
+index can serve. Here each source is matched on its own indexed column and
+the image ids are combined with UNION, so every branch is an index scan:
+
+- images whose name contains the term;
+- images of uploads whose project (by id) has a matching name;
+- images of uploads whose ``metadata->>'project_name'`` matches.
+
+Terms shorter than three characters give pg_trgm nothing to look up
+inside a word, so they match as prefixes only (still indexed: the padded
+leading trigrams are). Ranking uses ``word_similarity`` plus a bonus for a
+name that starts with the term.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Float, case, cast, func, literal_column, select, union
+
+from app.models.assets import Image, Upload
+from app.models.project import Project
+
+# Must match the expression of ix_uploads_project_name_trgm exactly, so the
+# key is a literal rather than a bind parameter.
+UPLOAD_PROJECT_NAME = Upload.metadata_obj.op("->>")(literal_column("'project_name'"))
+
+_MIN_INFIX_LEN = 3
+_PREFIX_BONUS = 0.5
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def name_pattern(term: str) -> str:
+    """ILIKE pattern for ``term``: substring, or prefix for short terms."""
+    escaped = _escape_like(term.strip())
+    return f"{escaped}%" if len(term.strip()) < _MIN_INFIX_LEN else f"%{escaped}%"
+
+
+def uploads_matching_project(term: str):
+    """Ids of uploads whose project name or metadata project_name matches."""
+    pattern = name_pattern(term)
+    by_project = select(Upload.id).where(
+        Upload.project_id.in_(select(Project.id).where(Project.name.ilike(pattern)))
+    )
+    by_metadata = select(Upload.id).where(UPLOAD_PROJECT_NAME.ilike(pattern))
+    return union(by_project, by_metadata)
+
+
+def matching_image_ids(term: str, user_id: Optional[str] = None):
+    """Ids of images whose name, project name or upload project_name matches."""
+    by_name = select(Image.id).where(Image.name.ilike(name_pattern(term)))
+    by_project = select(Image.id).where(
+        Image.upload_id.in_(uploads_matching_project(term))
+    )
+    if user_id is not None:
+        by_name = by_name.where(Image.user_id == user_id)
+        by_project = by_project.where(Image.user_id == user_id)
+    return union(by_name, by_project)
+
+
+def relevance(term: str):
+    """Rank for a result row of a query joining Image, Upload and
+    (outer) Project: best word similarity of the term to any of the three
+    names, plus a bonus when the image name starts with it."""
+    term = term.strip()
+    similarity = func.greatest(
+        func.word_similarity(term, Image.name),
+        func.word_similarity(term, Project.name),
+        func.word_similarity(term, UPLOAD_PROJECT_NAME),
+    )
+    prefix = case((Image.name.ilike(f"{_escape_like(term)}%"), _PREFIX_BONUS), else_=0.0)
+    # double precision, so a cursor's float round-trips to the same value
+    return cast(func.coalesce(similarity, 0.0) + prefix, Float)
+
+
+# What a search result row carries.
+_SEARCH_COLUMNS = (
+    Image.id,
+    Image.name,
+    Image.url,
+    Image.thumbnail_url,
+    Image.processed_url,
+    Image.width,
+    Image.height,
+    Image.processing_status,
+    Image.file_type,
+    Image.created_at,
+    Image.processing_time_ms,
+    Image.applied_steps,
+    Image.crop_mode,
+    Image.target_aspect_ratio,
+    Image.exif_data['original_dimensions'].label('original_dimensions'),
+    Upload.metadata_obj.label('upload_metadata'),
+    Project.name.label('project_name'),
+)
+
+
+def search_query(
+    user_id=None,
+    q: Optional[str] = None,
+    project_name: Optional[str] = None,
+    status: Optional[str] = None,
+    file_type: Optional[str] = None,
+    aspect_ratio: Optional[str] = None,
+    crop_mode: Optional[str] = None,
+    operations: Optional[list] = None,
+    has_output: Optional[bool] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    """The filtered search: image rows joined to their upload and (outer)
+    project, unordered and unpaginated. ``user_id`` None searches everyone."""
+    query = (
+        select(*_SEARCH_COLUMNS)
+        .select_from(Image)
+        .join(Upload, Image.upload_id == Upload.id)
+        .outerjoin(Project, Upload.project_id == Project.id)
+    )
+    if user_id is not None:
+        query = query.where(Image.user_id == user_id)
+    if q:
+        query = query.where(Image.id.in_(matching_image_ids(q, user_id)))
+    if project_name:
+        query = query.where(Image.upload_id.in_(uploads_matching_project(project_name)))
+    if status:
+        query = query.where(Image.processing_status == status)
+    if file_type:
+        query = query.where(Image.file_type.ilike(f"%{file_type}%"))
+    if aspect_ratio:
+        query = query.where(Image.target_aspect_ratio == aspect_ratio)
+    if crop_mode:
+        query = query.where(Image.crop_mode == crop_mode)
+    if operations:
+        # One containment test, served by the GIN index
+        query = query.where(Image.applied_steps.contains(operations))
+    if has_output is not None:
+        query = query.where(
+            Image.processed_url.isnot(None) if has_output else Image.processed_url.is_(None)
+        )
+    if date_from:
+        query = query.where(Image.created_at >= date_from)
+    if date_to:
+        query = query.where(Image.created_at <= date_to)
+    return query
+
+
+def sort_spec(sort_by: str, q: Optional[str]):
+    """(sort key expressions, descending, cursor value parsers) for
+    ``sort_by``. Keys never evaluate to NULL, so a row-value keyset over
+    them (plus id) is a total order."""
+    if sort_by == "relevance":
+        return (relevance(q),), True, (float,)
+    if sort_by == "oldest":
+        return (Image.created_at,), False, (datetime.fromisoformat,)
+    if sort_by == "name":
+        # Named images first, then the unnamed ones (in id order), as
+        # ORDER BY name had it.
+        return (Image.name.is_(None), func.coalesce(Image.name, "")), False, (bool, str)
+    if sort_by == "processing_time":
+        # NULLs last, as before: -1 sorts below every real duration.
+        return (func.coalesce(Image.processing_time_ms, -1),), True, (int,)
+    return (Image.created_at,), True, (datetime.fromisoformat,)
+
+
+def search_page_query(filtered, sort_keys: tuple, descending: bool, *conditions):
+    """``filtered`` ordered by ``sort_keys`` then id (a total order, so it
+    can be keyset-paginated), with the keys as ``sort_key_<n>`` columns and
+    any extra ``conditions`` (a keyset bound). Add offset/limit to page it."""
+    query = filtered.add_columns(
+        *(key.label(f"sort_key_{n}") for n, key in enumerate(sort_keys))
+    ).where(*conditions)
+    order = [*sort_keys, Image.id]
+    return query.order_by(*(c.desc() if descending else c.asc() for c in order))
+
+
+def search_count_query(filtered):
+    return filtered.with_only_columns(func.count(Image.id)).order_by(None)
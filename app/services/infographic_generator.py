@@ -1,6 +1,7 @@
 import io
 import base64
 import logging
+from typing import Optional
 from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps, ImageColor
 import numpy as np
 
@@ -25,9 +26,12 @@ class InfographicGenerator:
     # ------------------------------------------------------------------ #
     # Public entry point
     # ------------------------------------------------------------------ #
-    async def generate(self, image_bytes: bytes, product_name: str, options: dict = {}) -> bytes:
+    async def generate(self, image_bytes: bytes, product_name: str, options: dict = {},
+                       product_mask: Optional[np.ndarray] = None) -> bytes:
+        """product_mask: optional alpha (0-255) for image_bytes from the
+        processing pipeline; when given, the product is not segmented again."""
         analysis = await self._analyze_product(image_bytes, product_name)
-        card = self._create_card(image_bytes, analysis, options)
+        card = self._create_card(image_bytes, analysis, options, product_mask)
         output = io.BytesIO()
         card.save(output, format="PNG", quality=95)
         return output.getvalue()
@@ -226,19 +230,25 @@ class InfographicGenerator:
         b = int(b + (255 - b) * factor)
         return (r, g, b)
 
-    def _remove_background(self, img: Image.Image, target_rgb) -> Image.Image:
+    def _remove_background(self, img: Image.Image, target_rgb,
+                           product_mask: Optional[np.ndarray] = None) -> Image.Image:
         """Cut the product out from its background and place it on target_rgb.
-        Tries rembg (real ML segmentation) first since it handles busy/
+        Reuses the pipeline's product mask when it matches the image; else
+        tries rembg (real ML segmentation) since it handles busy/
         lifestyle photos correctly; falls back to corner-sampled flat-color
         keying (for simple studio shots) if rembg isn't installed or fails."""
         target = ImageColor.getrgb(target_rgb) if isinstance(target_rgb, str) else target_rgb
 
+        if product_mask is not None and product_mask.shape[:2] == (img.height, img.width):
+            canvas = Image.new("RGB", img.size, target)
+            canvas.paste(img, (0, 0), Image.fromarray(product_mask.astype(np.uint8), "L"))
+            return canvas
+
         try:
-            from rembg import remove
-            cutout = remove(img)  # RGBA, subject opaque, bg transparent
-            cutout = cutout.convert("RGBA")
-            canvas = Image.new("RGB", cutout.size, target)
-            canvas.paste(cutout, (0, 0), cutout)
+            from app.services.image_processing.inference_batcher import rembg_mask
+            mask = rembg_mask(np.array(img.convert("RGB")))
+            canvas = Image.new("RGB", img.size, target)
+            canvas.paste(img, (0, 0), Image.fromarray(mask, "L"))
             return canvas
         except Exception as e:
             logger.warning(f"rembg unavailable/failed, falling back to flat-bg keying: {e}")
@@ -399,7 +409,8 @@ class InfographicGenerator:
             "dominant_colors": [c for c in lst("dominant_colors") if isinstance(c, str)] or [self.ACCENT],
         }
 
-    def _create_card(self, image_bytes: bytes, analysis: dict, options: dict) -> Image.Image:
+    def _create_card(self, image_bytes: bytes, analysis: dict, options: dict,
+                     product_mask: Optional[np.ndarray] = None) -> Image.Image:
         analysis = self._sanitize_analysis(analysis)
         W, H = self.CARD_WIDTH, self.CARD_HEIGHT
         F = self._load_fonts()
@@ -424,7 +435,7 @@ class InfographicGenerator:
         # bg_color — coordinated with the poster, but not the same dark shade
         # as the text panel, so the photo area still reads distinctly.
         photo_bg_rgb = self._lighten_color(bg_rgb, factor=0.55)
-        product_cutout = self._remove_background(product_img, photo_bg_rgb)
+        product_cutout = self._remove_background(product_img, photo_bg_rgb, product_mask)
         photo = self._contain_fit(product_cutout, photo_w, photo_h, bg_color=photo_bg_rgb)
         card.paste(photo, (panel_w, 0))
 
@@ -0,0 +1,112 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.processing import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_TYPE_PROCESS_IMAGE = "process_image"
+
+
+class JobQueue:
+    """Postgres-backed job queue on top of the ``jobs`` table.
+
+    Workers claim jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` so any
+    number of worker processes can poll the same table without handing the
+    same job out twice. Claimed jobs move to ``running`` and are kept alive
+    with heartbeats; jobs whose heartbeat stops (worker crash, redeploy) are
+    put back to ``pending`` by ``requeue_stale``.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self._db = db
+
+    async def enqueue(self, user_id, job_type: str, input_data: dict) -> Job:
+        job = Job(
+            user_id=user_id,
+            type=job_type,
+            status="pending",
+            input_data=input_data,
+            output_data={"attempts": 0},
+        )
+        self._db.add(job)
+        await self._db.commit()
+        await self._db.refresh(job)
+        return job
+
+    async def get(self, job_id: str) -> Job | None:
+        result = await self._db.execute(select(Job).where(Job.id == job_id))
+        return result.scalars().first()
+
+    async def claim(self, job_types: list[str]) -> Optional[Job]:
+        result = await self._db.execute(
+            select(Job)
+            .where(Job.status == "pending", Job.type.in_(job_types))
+            .order_by(Job.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job = result.scalars().first()
+        if job is None:
+            await self._db.rollback()
+            return None
+        output = dict(job.output_data or {})
+        output["attempts"] = output.get("attempts", 0) + 1
+        job.output_data = output
+        job.status = "running"
+        job.started_at = datetime.now(timezone.utc)
+        job.error_message = None
+        await self._db.commit()
+        return job
+
+    async def heartbeat(self, job_id) -> None:
+        await self._db.execute(
+            update(Job).where(Job.id == job_id).values(updated_at=func.now())
+        )
+        await self._db.commit()
+
+    async def complete(self, job_id, result: dict) -> None:
+        job = await self.get(job_id)
+        if job is None:
+            return
+        output = dict(job.output_data or {})
+        output["result"] = result
+        job.output_data = output
+        job.status = "completed"
+        job.completed_at = datetime.now(timezone.utc)
+        await self._db.commit()
+
+    async def fail(self, job_id, error: str) -> None:
+        job = await self.get(job_id)
+        if job is None:
+            return
+        job.status = "failed"
+        job.error_message = error
+        job.completed_at = datetime.now(timezone.utc)
+        await self._db.commit()
+
+    async def requeue_stale(self, stale_after: timedelta, max_attempts: int) -> int:
+        cutoff = datetime.now(timezone.utc) - stale_after
+        result = await self._db.execute(
+            select(Job)
+            .where(Job.status == "running", Job.updated_at < cutoff)
+            .with_for_update(skip_locked=True)
+        )
+        stale_jobs = result.scalars().all()
+        for job in stale_jobs:
+            attempts = (job.output_data or {}).get("attempts", 0)
+            if attempts >= max_attempts:
+                job.status = "failed"
+                job.error_message = f"Abandoned after {attempts} attempts"
+                job.completed_at = datetime.now(timezone.utc)
+                logger.warning(f"Job {job.id} failed permanently after {attempts} attempts")
+            else:
+                job.status = "pending"
+                job.started_at = None
+                logger.warning(f"Requeued stale job {job.id} (attempt {attempts})")
+        await self._db.commit()
+        return len(stale_jobs)
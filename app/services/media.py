@@ -1,8 +1,5 @@
 import cloudinary
 import cloudinary.uploader
-import os
-import shutil
-from pathlib import Path
 from app.core.config import settings
 if settings.CLOUDINARY_CLOUD_NAME:
     cloudinary.config(
@@ -16,36 +13,3 @@ def sanitize_filename(filename: str) -> str:
     filename = re.sub(r'[&+,?#\[\]{}|\\^~`<>:;@!$\'"()]', '_', filename)
     filename = re.sub(r'[\s_]+', '_', filename)
     return filename.strip('_')
-
-def upload_image_to_cloudinary(file_bytes: bytes, filename: str,resource_type: str = "image") -> dict:
-    safe_name = sanitize_filename(filename)
-    if settings.STORAGE_PROVIDER == "local":
-        if filename.startswith("processed/"):
-            target_dir = "static/processed"
-            safe_name = filename.replace("/", "_")
-        else:
-            target_dir = "static/uploads"
-            safe_name = filename.replace("/", "_")
-        if not os.path.exists(target_dir):
-            os.makedirs(target_dir)
-        file_path = f"{target_dir}/{safe_name}"
-        with open(file_path, "wb") as f:
-            f.write(file_bytes)
-        return {
-            "secure_url": f"http://localhost:8000/{file_path}",
-            "url": f"http://localhost:8000/{file_path}",
-            "width": 0,
-            "height": 0,
-            "public_id": safe_name
-        }
-    try:
-        upload_result = cloudinary.uploader.upload(
-            file_bytes,
-            public_id=safe_name,
-            upload_preset=settings.CLOUDINARY_UPLOAD_PRESET, 
-            resource_type=resource_type  
-        )
-        return upload_result
-    except Exception as e:
-        print(f"Cloudinary Error: {e}")
-        raise e
\ No newline at end of file
@@ -7,9 +7,10 @@ import numpy as np
 
 from app.db.session import AsyncSessionLocal
 from app.services.image_fetcher import ImageFetcher
-from app.services.image_processing import ImageProcessor
-from app.services.media import upload_image_to_cloudinary
+from app.services.image_processing.executor import run_image_pipeline
+from app.services.storage import get_storage
 from app.services.repositories import ImageRepository
+from app.services.result_cache import get_result_cache, result_cache_key
 from app.services.statistics import update_processing_stats
 
 logger = logging.getLogger("assets")
@@ -36,144 +37,9 @@ class ProcessImageUseCase:
         await self._repo.start_processing(img_record, upload)
 
         try:
-            image_content = await self._fetcher.fetch(img_record.url)
-
-            resize_dims = options.get("resize") or None
-            background_color = options.get("background_color", "#FFFFFF")
-            skip_crop = options.get("skip_crop", False)
-
-            target_dimensions = crop_mode = target_aspect_ratio = None
-            if img_record.exif_data:
-                target_dimensions = img_record.exif_data.get(
-                    "original_dimensions")
-                crop_mode = img_record.exif_data.get("crop_mode")
-                target_aspect_ratio = img_record.exif_data.get(
-                    "target_aspect_ratio")
-
-            processor = ImageProcessor(
-                image_content,
-                resize_dims=resize_dims,
-                operations=operations,
-                autoDetect=autoDetect,
-                skip_crop=skip_crop,
-                target_dimensions=target_dimensions,
-                crop_mode=crop_mode,
-                target_aspect_ratio=target_aspect_ratio,
-                background_color=background_color,
+            response, processed_url, proc_result = await self.process_record(
+                img_record, operations, options, autoDetect
             )
-
-            proc_result = await asyncio.to_thread(processor.process)
-
-            
-            resize_results = proc_result.get("resize_results")
-            if resize_results:
-                outputs = self._build_multi_outputs(
-                    resize_results, img_record.user_id, image_id
-                )
-                processed_url = outputs[0]["url"] if outputs else None
-                response = {
-                    "status": "completed",
-                    "outputs": outputs,
-                    "original_image_id": image_id,
-                    "telemetry": {
-                        "confidence": proc_result["confidence"],
-                        "steps": proc_result["steps_applied"],
-                        "time_ms": proc_result["duration_ms"],
-                    },
-                }
-            else:
-                filename = f"processed/{img_record.user_id}/{image_id}.jpg"
-                upload_res = upload_image_to_cloudinary(
-                    proc_result["image_bytes"], filename)
-                processed_url = upload_res.get("secure_url")
-                response = {
-                    "status": "completed",
-                    "url": processed_url,
-                    "name": img_record.name,
-                    "telemetry": {
-                        "confidence": proc_result["confidence"],
-                        "steps": proc_result["steps_applied"],
-                        "time_ms": proc_result["duration_ms"],
-                    },
-                }
-
-           
-            if "infographic" in operations:
-                from app.services.infographic_generator import InfographicGenerator
-                
-                generator = InfographicGenerator()
-                
-                # Get the processed image bytes (after bg-remove, resize, etc.)
-                source_image = proc_result.get("image_bytes")
-                
-                # Generate infographic
-                infographic_bytes = await generator.generate(
-                    image_bytes=source_image,
-                    product_name=img_record.name,
-                    options=options.get("infographic_options", {})
-                )
-                
-                # Upload to Cloudinary
-                infographic_filename = f"infographic/{img_record.user_id}/{image_id}.png"
-                upload_res = upload_image_to_cloudinary(
-                    infographic_bytes, 
-                    infographic_filename,
-                    resource_type="image"
-                )
-                
-                processed_url = upload_res.get("secure_url")
-                
-                response = {
-                    "status": "completed",
-                    "url": processed_url,
-                    "name": f"{img_record.name}_infographic",
-                    "telemetry": {
-                        "confidence": proc_result["confidence"],
-                        "steps": proc_result["steps_applied"] + ["infographic"],
-                        "time_ms": proc_result["duration_ms"],
-                    },
-                }
-            # In execute() method, after the infographic block
-
-            if "smart-frame" in operations:
-                from app.services.smart_frame import SmartFrameFit
-                
-                processor = SmartFrameFit()
-                
-                # Get frame options from the request
-                frame_options = options.get("smart_frame", {})
-                
-                # Use the already-processed image (after bg-remove, etc.)
-                source_bytes = proc_result.get("image_bytes")
-                
-                frame_bytes = processor.process(
-                    image_bytes=source_bytes,
-                    output_width=frame_options.get("width", 1200),
-                    output_height=frame_options.get("height", 1200),
-                    frame_inset=frame_options.get("inset", 40),
-                    background_color=frame_options.get("background", "#FFFFFF"),
-                )
-                
-                # Upload to Cloudinary
-                frame_filename = f"framed/{img_record.user_id}/{image_id}.png"
-                upload_res = upload_image_to_cloudinary(
-                    frame_bytes,
-                    frame_filename,
-                    resource_type="image"
-                )
-                
-                processed_url = upload_res.get("secure_url")
-                
-                response = {
-                    "status": "completed",
-                    "url": processed_url,
-                    "name": img_record.name,
-                    "telemetry": {
-                        "confidence": proc_result["confidence"],
-                        "steps": proc_result["steps_applied"] + ["smart-frame"],
-                        "time_ms": proc_result["duration_ms"],
-                    },
-                }
             unfinished = await self._repo.unfinished_count(img_record.upload_id)
             await self._repo.complete_image(
                             img_record,
@@ -196,7 +62,191 @@ class ProcessImageUseCase:
             await self._repo.fail_image(img_record)
             raise
 
-    def _build_multi_outputs(self, resize_results, user_id, image_id):
+    async def process_record(
+        self,
+        img_record,
+        operations: list,
+        options: dict,
+        autoDetect: bool,
+    ) -> tuple[dict, Optional[str], dict]:
+        """Run the pipeline for one image and store its outputs.
+
+        Touches storage only, never the database, so batch callers can
+        collect results and write the status updates themselves.
+        """
+        image_id = str(img_record.id)
+        image_content = await self._fetcher.fetch(img_record.url)
+
+        debug = bool(options.get("debug"))
+        cache = get_result_cache()
+        cache_key = None
+        if cache is not None:
+            cache_key = result_cache_key(
+                image_content, image_id, operations, options,
+                img_record.exif_data, autoDetect,
+            )
+            # A debug run has to execute the pipeline to produce artifacts.
+            cached = None if debug else await cache.get(cache_key)
+            # Outputs live under stable per-image names, so a later run with
+            # other options overwrites them; an entry is only good while the
+            # image still points at the version it stored.
+            if cached is not None and cached["processed_url"] == img_record.processed_url:
+                cached["response"].setdefault("telemetry", {})["cached"] = True
+                return cached["response"], cached["processed_url"], cached["proc_result"]
+        # The result key versions the URLs, so clients and CDNs never keep
+        # serving an overwritten output.
+        version = f"?v={cache_key[:12]}" if cache_key else ""
+
+        resize_dims = options.get("resize") or None
+        background_color = options.get("background_color", "#FFFFFF")
+        skip_crop = options.get("skip_crop", False)
+
+        target_dimensions = crop_mode = target_aspect_ratio = None
+        if img_record.exif_data:
+            target_dimensions = img_record.exif_data.get(
+                "original_dimensions")
+            crop_mode = img_record.exif_data.get("crop_mode")
+            target_aspect_ratio = img_record.exif_data.get(
+                "target_aspect_ratio")
+
+        proc_result = await run_image_pipeline(
+            image_content,
+            resize_dims=resize_dims,
+            operations=operations,
+            autoDetect=autoDetect,
+            skip_crop=skip_crop,
+            target_dimensions=target_dimensions,
+            crop_mode=crop_mode,
+            target_aspect_ratio=target_aspect_ratio,
+            background_color=background_color,
+            debug=debug,
+        )
+
+        
+        resize_results = proc_result.get("resize_results")
+        if resize_results:
+            outputs = await self._build_multi_outputs(
+                resize_results, img_record.user_id, image_id, version
+            )
+            processed_url = outputs[0]["url"] if outputs else None
+            response = {
+                "status": "completed",
+                "outputs": outputs,
+                "original_image_id": image_id,
+                "telemetry": {
+                    "confidence": proc_result["confidence"],
+                    "steps": proc_result["steps_applied"],
+                    "time_ms": proc_result["duration_ms"],
+                },
+            }
+        else:
+            filename = f"processed/{img_record.user_id}/{image_id}.jpg"
+            upload_res = await get_storage().put_bytes(
+                proc_result["image_bytes"], filename, content_type="image/jpeg")
+            processed_url = upload_res.get("secure_url") + version
+            response = {
+                "status": "completed",
+                "url": processed_url,
+                "name": img_record.name,
+                "telemetry": {
+                    "confidence": proc_result["confidence"],
+                    "steps": proc_result["steps_applied"],
+                    "time_ms": proc_result["duration_ms"],
+                },
+            }
+
+       
+        if "infographic" in operations:
+            from app.services.infographic_generator import InfographicGenerator
+            
+            generator = InfographicGenerator()
+            
+            # Get the processed image bytes (after bg-remove, resize, etc.)
+            source_image = proc_result.get("image_bytes")
+            
+            # Generate infographic
+            infographic_bytes = await generator.generate(
+                image_bytes=source_image,
+                product_name=img_record.name,
+                options=options.get("infographic_options", {}),
+                product_mask=proc_result.get("product_mask"),
+            )
+            
+            # Store the result
+            infographic_filename = f"infographic/{img_record.user_id}/{image_id}.png"
+            upload_res = await get_storage().put_bytes(
+                infographic_bytes,
+                infographic_filename,
+                content_type="image/png",
+            )
+            
+            processed_url = upload_res.get("secure_url") + version
+            
+            response = {
+                "status": "completed",
+                "url": processed_url,
+                "name": f"{img_record.name}_infographic",
+                "telemetry": {
+                    "confidence": proc_result["confidence"],
+                    "steps": proc_result["steps_applied"] + ["infographic"],
+                    "time_ms": proc_result["duration_ms"],
+                },
+            }
+        # In execute() method, after the infographic block
+
+        if "smart-frame" in operations:
+            from app.services.smart_frame import SmartFrameFit
+            
+            processor = SmartFrameFit()
+            
+            # Get frame options from the request
+            frame_options = options.get("smart_frame", {})
+            
+            # Use the already-processed image (after bg-remove, etc.)
+            source_bytes = proc_result.get("image_bytes")
+            
+            frame_bytes = processor.process(
+                image_bytes=source_bytes,
+                output_width=frame_options.get("width", 1200),
+                output_height=frame_options.get("height", 1200),
+                frame_inset=frame_options.get("inset", 40),
+                background_color=frame_options.get("background", "#FFFFFF"),
+            )
+            
+            # Store the result
+            frame_filename = f"framed/{img_record.user_id}/{image_id}.png"
+            upload_res = await get_storage().put_bytes(
+                frame_bytes,
+                frame_filename,
+                content_type="image/png",
+            )
+            
+            processed_url = upload_res.get("secure_url") + version
+            
+            response = {
+                "status": "completed",
+                "url": processed_url,
+                "name": img_record.name,
+                "telemetry": {
+                    "confidence": proc_result["confidence"],
+                    "steps": proc_result["steps_applied"] + ["smart-frame"],
+                    "time_ms": proc_result["duration_ms"],
+                },
+            }
+
+        if cache_key is not None:
+            await cache.set(cache_key, {
+                "response": response,
+                "processed_url": processed_url,
+                "proc_result": {
+                    "confidence": proc_result["confidence"],
+                    "steps_applied": proc_result["steps_applied"],
+                    "duration_ms": proc_result["duration_ms"],
+                },
+            })
+        return response, processed_url, proc_result
+
+    async def _build_multi_outputs(self, resize_results, user_id, image_id, version=""):
         outputs = []
         for res in resize_results:
             img_data = res.get("image_bytes")
@@ -204,10 +254,11 @@ class ProcessImageUseCase:
                 success, encoded = cv2.imencode(".jpg", img_data)
                 img_data = encoded.tobytes()
             filename = f"processed/{user_id}/{image_id}_{res['id']}.jpg"
-            upload_res = upload_image_to_cloudinary(img_data, filename)
+            upload_res = await get_storage().put_bytes(
+                img_data, filename, content_type="image/jpeg")
             outputs.append({
                 "marketplace": res["id"],
-                "url": upload_res.get("secure_url"),
+                "url": upload_res.get("secure_url") + version,
                 "width": res["width"],
                 "height": res["height"],
             })
@@ -222,3 +273,133 @@ class ProcessImageUseCase:
                 await stats_db.commit()
         except Exception as e:
             logger.error(f"Stats update failed: {e}")
+
+
+BATCH_FLUSH_SIZE = 25
+_background_batches: set = set()
+
+
+class ProcessUploadUseCase:
+    """Runs one operations/options spec over every image of an Upload.
+
+    The batch runs in a background task and reports progress through an
+    event queue, so a client disconnecting from the progress stream does not
+    abandon half-processed images. Status updates are written in bulk every
+    ``BATCH_FLUSH_SIZE`` images instead of several commits per image.
+    """
+
+    def __init__(self, fetcher: ImageFetcher, limiter: asyncio.Semaphore):
+        self._fetcher = fetcher
+        self._limiter = limiter
+
+    async def stream(
+        self,
+        upload_id: str,
+        target_user_id: str,
+        operations: list,
+        options: dict,
+        autoDetect: bool,
+    ):
+        events: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(
+            self._run(upload_id, target_user_id, operations, options, autoDetect, events)
+        )
+        _background_batches.add(task)
+        task.add_done_callback(_background_batches.discard)
+        while True:
+            event = await events.get()
+            yield event
+            if event["event"] in ("finished", "error"):
+                return
+
+    async def _run(self, upload_id, target_user_id, operations, options, autoDetect, events):
+        try:
+            async with AsyncSessionLocal() as db:
+                repo = ImageRepository(db)
+                await self._run_batch(
+                    repo, upload_id, target_user_id, operations, options, autoDetect, events
+                )
+        except Exception as e:
+            logger.exception(f"Batch processing failed for upload {upload_id}")
+            await events.put({"event": "error", "upload_id": upload_id, "error": str(e)})
+
+    async def _run_batch(self, repo, upload_id, target_user_id, operations, options, autoDetect, events):
+        upload = await repo.get_upload(upload_id)
+        images = await repo.get_upload_images(upload_id)
+        total = len(images)
+        await events.put({"event": "started", "upload_id": upload_id, "total": total})
+        if not images:
+            await events.put({"event": "finished", "upload_id": upload_id,
+                              "completed": 0, "failed": 0, "total": 0})
+            return
+
+        await repo.start_processing_many([img.id for img in images], upload)
+        single = ProcessImageUseCase(repo, self._fetcher)
+
+        async def run_one(img):
+            async with self._limiter:
+                try:
+                    return img, await single.process_record(img, operations, options, autoDetect), None
+                except Exception as e:
+                    logger.exception(f"Batch item {img.id} failed")
+                    return img, None, e
+
+        tasks = [asyncio.create_task(run_one(img)) for img in images]
+        completed_rows, failed_ids, stats_rows = [], [], []
+        done = completed = failed = 0
+
+        async def flush():
+            await repo.complete_images(completed_rows)
+            await repo.fail_images(failed_ids)
+            completed_rows.clear()
+            failed_ids.clear()
+
+        for next_done in asyncio.as_completed(tasks):
+            img, result, error = await next_done
+            done += 1
+            event = {"event": "image", "image_id": str(img.id), "name": img.name,
+                     "done": done, "total": total}
+            if error is not None:
+                failed += 1
+                failed_ids.append(img.id)
+                event.update(status="failed", error=str(error))
+            else:
+                completed += 1
+                response, processed_url, proc_result = result
+                completed_rows.append({
+                    "id": img.id,
+                    "processed_url": processed_url,
+                    "confidence_scores": proc_result["confidence"],
+                    "applied_steps": proc_result["steps_applied"],
+                    "processing_time_ms": proc_result["duration_ms"],
+                })
+                stats_rows.append((proc_result["steps_applied"], proc_result["duration_ms"]))
+                event.update(response)
+            await events.put(event)
+            if len(completed_rows) + len(failed_ids) >= BATCH_FLUSH_SIZE:
+                await flush()
+        await flush()
+
+        if upload and await repo.unfinished_count(upload_id) == 0:
+            await repo.complete_upload(upload)
+        await _record_batch_stats(target_user_id, stats_rows)
+        await events.put({"event": "finished", "upload_id": upload_id,
+                          "completed": completed, "failed": failed, "total": total})
+
+
+async def _record_batch_stats(user_id: str, rows: list[tuple[list, int]]):
+    per_step: dict[str, list[int]] = {}
+    for steps, duration in rows:
+        for step in steps or []:
+            count_time = per_step.setdefault(step, [0, 0])
+            count_time[0] += 1
+            count_time[1] += duration or 0
+    if not per_step:
+        return
+    try:
+        async with AsyncSessionLocal() as stats_db:
+            for step, (count, duration) in per_step.items():
+                await update_processing_stats(stats_db, user_id, step, duration, count=count)
+            await stats_db.commit()
+    except Exception as e:
+        logger.error(f"Stats update failed: {e}")
@@ -1,6 +1,189 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import delete, insert, select, func, text, true, update
 from app.models.assets import Image, Upload
+from app.models.project import Project
+
+_FILE_COLUMNS = (
+    Image.id, Image.name, Image.user_id,
+    Image.url, Image.processed_url, Image.thumbnail_url,
+)
+
+# What the gallery renders per image.
+_GALLERY_IMAGE_COLUMNS = (
+    Image.id, Image.upload_id, Image.url, Image.name, Image.processed_url,
+    Image.processing_status, Image.thumbnail_url, Image.width, Image.height,
+    Image.created_at,
+)
+
+
+# confidence_scores keys with a typed column of their own.
+_SCORE_COLUMNS = {"bg_clean": "bg_clean_score", "shadow": "shadow_score", "crop": "crop_score"}
+
+
+def score_columns(confidence: dict | None) -> dict:
+    """Typed column values for the confidence_scores fields the dashboard
+    averages; non-numeric or missing scores become NULL."""
+    confidence = confidence or {}
+    values = {}
+    for key, column in _SCORE_COLUMNS.items():
+        try:
+            values[column] = float(confidence[key])
+        except (KeyError, TypeError, ValueError):
+            values[column] = None
+    return values
+
+
+def gallery_page_query(filters: list, limit: int, images_per_upload: int):
+    """One query for a gallery page: up to ``limit`` uploads matching
+    ``filters``, newest first, each LATERAL-joined to its first
+    ``images_per_upload`` images. Rows are flat (one per image, or one with
+    null image columns for an empty upload). Ask for one more than you show
+    of each to know if there is more."""
+    page = (
+        select(
+            Upload.id.label("page_upload_id"),
+            Upload.status.label("upload_status"),
+            Upload.created_at.label("upload_created_at"),
+            Upload.metadata_obj.label("upload_metadata"),
+        )
+        .where(*filters)
+        .order_by(Upload.created_at.desc(), Upload.id.desc())
+        .limit(limit)
+        .subquery("page")
+    )
+    images = (
+        select(*_GALLERY_IMAGE_COLUMNS)
+        .where(Image.upload_id == page.c.page_upload_id)
+        .order_by(Image.created_at, Image.id)
+        .limit(images_per_upload)
+        .lateral("page_images")
+    )
+    return (
+        select(page, images)
+        .select_from(page)
+        .outerjoin(images, true())
+        .order_by(
+            page.c.upload_created_at.desc(), page.c.page_upload_id.desc(),
+            images.c.created_at, images.c.id,
+        )
+    )
+
+
+def unfinished_count_query(upload_id):
+    # Matches the ix_images_unfinished partial index predicate.
+    return (
+        select(func.count(Image.id))
+        .where(Image.upload_id == upload_id)
+        .where(Image.processing_status.in_(["pending", "processing"]))
+    )
+
+
+def upload_images_query(upload_id):
+    return select(Image).where(Image.upload_id == upload_id).order_by(Image.created_at, Image.id)
+
+
+# Builders for the dashboard and project endpoints, shared with
+# app.db.explain_check so the plan check EXPLAINs what they actually run.
+
+def upload_summary_query(upload_id):
+    return select(
+        func.count(Image.id).label("total"),
+        func.count(Image.id).filter(Image.processing_status == "completed").label("processed"),
+        func.count(Image.id).filter(Image.processing_status == "failed").label("failed"),
+        func.avg(Image.processing_time_ms).label("avg_time"),
+    ).where(Image.upload_id == upload_id)
+
+
+def upload_step_counts_query(upload_id):
+    return text("""
+        SELECT step, COUNT(*) as count
+        FROM images, jsonb_array_elements_text(applied_steps) as step
+        WHERE upload_id = :uid
+        GROUP BY step
+    """).bindparams(uid=upload_id)
+
+
+def upload_confidence_query(upload_id):
+    return select(
+        func.avg(Image.bg_clean_score).label("bg_clean"),
+        func.avg(Image.shadow_score).label("shadow"),
+        func.avg(Image.crop_score).label("crop"),
+    ).where(Image.upload_id == upload_id, Image.processing_status == "completed")
+
+
+def overview_summary_query(user_id=None):
+    """Image totals for one user, or everyone when ``user_id`` is None."""
+    query = select(
+        func.count(Image.id).label("total"),
+        func.count(Image.id).filter(Image.processing_status == "completed").label("processed"),
+        func.count(Image.id).filter(Image.processing_status == "failed").label("failed"),
+        func.count(Image.id).filter(Image.processing_status == "processing").label("pending"),
+        func.avg(Image.processing_time_ms).filter(
+            Image.processing_status == "completed").label("avg_time"),
+    )
+    if user_id is not None:
+        query = query.where(Image.user_id == user_id)
+    return query
+
+
+def overview_step_counts_query(user_id=None):
+    where_clause = "WHERE i.user_id = :uid AND jsonb_array_length(i.applied_steps) > 0" \
+        if user_id is not None else "WHERE jsonb_array_length(i.applied_steps) > 0"
+    query = text(f"""
+        SELECT
+            step,
+            COUNT(*) as total,
+            COUNT(*) FILTER (WHERE i.processing_status = 'completed') as completed,
+            COUNT(*) FILTER (WHERE i.processing_status = 'failed') as failed,
+            COUNT(*) FILTER (WHERE i.processing_status = 'processing') as pending,
+            COALESCE(AVG(i.processing_time_ms) FILTER (WHERE i.processing_status = 'completed'), 0) as avg_time_ms
+        FROM images i, jsonb_array_elements_text(i.applied_steps) as step
+        {where_clause}
+        GROUP BY step
+        ORDER BY total DESC
+    """)
+    return query.bindparams(uid=user_id) if user_id is not None else query
+
+
+def recent_images_query(user_id=None, limit: int = 10):
+    query = select(Image).order_by(Image.created_at.desc()).limit(limit)
+    if user_id is not None:
+        query = query.where(Image.user_id == user_id)
+    return query
+
+
+def projects_query(user_id, status: str | None = None):
+    """A user's projects, unordered (to count)."""
+    query = select(Project).where(Project.user_id == user_id)
+    if status:
+        query = query.where(Project.status == status)
+    return query
+
+
+def projects_page_query(user_id, status: str | None, offset: int, limit: int):
+    return (
+        projects_query(user_id, status)
+        .order_by(Project.created_at.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+
+
+def project_image_count_query(project_id):
+    return (
+        select(func.count(Image.id))
+        .join(Upload, Image.upload_id == Upload.id)
+        .where(Upload.project_id == project_id)
+    )
+
+
+def project_image_counts_query(project_ids: list):
+    return (
+        select(Upload.project_id, func.count(Image.id))
+        .join(Upload, Image.upload_id == Upload.id)
+        .where(Upload.project_id.in_(project_ids))
+        .group_by(Upload.project_id)
+    )
 
 
 class ImageRepository:
@@ -15,6 +198,60 @@ class ImageRepository:
         result = await self._db.execute(select(Upload).where(Upload.id == upload_id))
         return result.scalars().first()
 
+    async def get_upload_images(self, upload_id: str) -> list[Image]:
+        result = await self._db.execute(upload_images_query(upload_id))
+        return list(result.scalars().all())
+
+    async def get_image_files(self, image_ids: list) -> list:
+        """(id, name, user_id, url, processed_url, thumbnail_url) rows: what a
+        delete needs to authorize and to remove the stored files."""
+        if not image_ids:
+            return []
+        result = await self._db.execute(
+            select(*_FILE_COLUMNS).where(Image.id.in_(image_ids))
+        )
+        return list(result.all())
+
+    async def get_upload_image_files(self, upload_id) -> list:
+        result = await self._db.execute(
+            select(*_FILE_COLUMNS).where(Image.upload_id == upload_id)
+        )
+        return list(result.all())
+
+    async def delete_images(self, image_ids: list):
+        """One DELETE for all ids. Does not commit."""
+        if image_ids:
+            await self._db.execute(delete(Image).where(Image.id.in_(image_ids)))
+
+    async def gallery_page(self, filters: list, limit: int, images_per_upload: int) -> list:
+        """Rows of gallery_page_query, in upload then image order."""
+        result = await self._db.execute(gallery_page_query(filters, limit, images_per_upload))
+        return list(result.all())
+
+    async def gallery_upload_images(self, upload_id, filters: list, limit: int) -> list:
+        """The next ``limit`` gallery images of one upload, in upload order."""
+        result = await self._db.execute(
+            select(*_GALLERY_IMAGE_COLUMNS)
+            .where(Image.upload_id == upload_id, *filters)
+            .order_by(Image.created_at, Image.id)
+            .limit(limit)
+        )
+        return list(result.all())
+
+    async def add_images(self, rows: list[dict]) -> list:
+        """Insert images in one statement; returns (id, name, url, width, height)
+        rows in the order given. Does not commit."""
+        if not rows:
+            return []
+        result = await self._db.execute(
+            insert(Image).returning(
+                Image.id, Image.name, Image.url, Image.width, Image.height,
+                sort_by_parameter_order=True,
+            ),
+            rows,
+        )
+        return list(result.all())
+
     async def start_processing(self, image: Image, upload: Upload | None):
         image.processing_status = "processing"
         if upload and upload.status != "processing":
@@ -32,20 +269,51 @@ class ImageRepository:
         image.processed_url = processed_url
         image.processing_status = "completed"
         image.confidence_scores = confidence
+        for column, value in score_columns(confidence).items():
+            setattr(image, column, value)
         image.applied_steps = steps
         image.processing_time_ms = duration
         await self._db.commit()
 
+    async def start_processing_many(self, image_ids: list, upload: Upload | None):
+        await self._db.execute(
+            update(Image)
+            .where(Image.id.in_(image_ids))
+            .values(processing_status="processing")
+        )
+        if upload and upload.status != "processing":
+            upload.status = "processing"
+        await self._db.commit()
+
+    async def complete_images(self, rows: list[dict]):
+        """Bulk-complete images; each row holds ``id`` plus the columns to set."""
+        if not rows:
+            return
+        await self._db.execute(
+            update(Image),
+            [
+                {**row, **score_columns(row.get("confidence_scores")), "processing_status": "completed"}
+                for row in rows
+            ],
+        )
+        await self._db.commit()
+
+    async def fail_images(self, image_ids: list):
+        if not image_ids:
+            return
+        await self._db.execute(
+            update(Image)
+            .where(Image.id.in_(image_ids))
+            .values(processing_status="failed")
+        )
+        await self._db.commit()
+
     async def fail_image(self, image: Image):
         image.processing_status = "failed"
         await self._db.commit()
 
     async def unfinished_count(self, upload_id: str) -> int:
-        result = await self._db.execute(
-            select(func.count(Image.id))
-            .where(Image.upload_id == upload_id)
-            .where(Image.processing_status.in_(["pending", "processing"]))
-        )
+        result = await self._db.execute(unfinished_count_query(upload_id))
         return result.scalar()
 
     async def complete_upload(self, upload: Upload):
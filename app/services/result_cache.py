@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.services.image_processing import PIPELINE_VERSION
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis tier is optional
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Options that change pipeline output. Anything else in the request options
+# (e.g. UI hints) must not split the cache.
+_KEYED_OPTIONS = ("background_color", "resize", "skip_crop", "infographic_options", "smart_frame")
+_KEYED_EXIF = ("crop_mode", "target_aspect_ratio", "original_dimensions")
+
+
+def result_cache_key(
+    source_bytes: bytes,
+    image_id,
+    operations: list,
+    options: dict,
+    exif_data: Optional[dict],
+    autoDetect: bool,
+) -> str:
+    """Content address for one processing request.
+
+    Scoped to the image record: cached URLs point at that image's outputs,
+    which are removed together with the record.
+    """
+    exif_data = exif_data or {}
+    spec = {
+        "v": PIPELINE_VERSION,
+        "image": str(image_id),
+        "ops": list(operations),
+        "auto": bool(autoDetect),
+        "options": {k: options.get(k) for k in _KEYED_OPTIONS},
+        "exif": {k: exif_data.get(k) for k in _KEYED_EXIF},
+    }
+    digest = hashlib.sha256(source_bytes)
+    digest.update(json.dumps(spec, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Two-tier cache of finished processing results.
+
+    Entries are small JSON documents (the API response, the output URL and
+    the telemetry needed to mark the image completed); the image bytes stay
+    in storage. The disk tier is always on; the Redis tier is used when
+    ``RESULT_CACHE_REDIS`` is set and the ``redis`` package is installed, so
+    several API/worker containers can share hits. Disk entries past their
+    TTL, then the oldest, are pruned whenever the tier grows past
+    ``disk_bytes``.
+    """
+
+    def __init__(self, cache_dir: str, ttl_sec: int, disk_bytes: int,
+                 redis_url: Optional[str] = None):
+        self._dir = cache_dir
+        self._ttl = ttl_sec
+        self._disk_bytes = disk_bytes
+        self._disk_used: Optional[int] = None
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            if aioredis is None:
+                logger.warning("RESULT_CACHE_REDIS is set but the redis package is not installed")
+            else:
+                self._redis = aioredis.from_url(redis_url)
+        self.stats = {"disk_hits": 0, "redis_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            if self._ttl and time.time() - os.path.getmtime(path) > self._ttl:
+                os.remove(path)
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: str, payload: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+        self._account_disk(len(payload))
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self._dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _account_disk(self, added: int):
+        with self._lock:
+            if self._disk_used is None:
+                self._disk_used = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_used += added
+            if self._disk_used <= self._disk_bytes:
+                return
+            files = sorted(self._disk_files(), key=lambda f: f[2])
+            expired_before = time.time() - self._ttl if self._ttl else 0
+            target = int(self._disk_bytes * 0.9)
+            total = sum(size for _, size, _ in files)
+            for path, size, mtime in files:
+                if total <= target and mtime >= expired_before:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self._disk_used = total
+
+    async def get(self, key: str) -> Optional[dict]:
+        try:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                self.stats["disk_hits"] += 1
+                return entry
+            if self._redis is not None:
+                raw = await self._redis.get(f"result:{key}")
+                if raw is not None:
+                    self.stats["redis_hits"] += 1
+                    await asyncio.to_thread(self._write_disk, key, raw.decode())
+                    return json.loads(raw)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Result cache read failed for {key}: {e}")
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, entry: dict):
+        try:
+            payload = json.dumps(entry, default=str)
+            await asyncio.to_thread(self._write_disk, key, payload)
+            if self._redis is not None:
+                await self._redis.set(f"result:{key}", payload, ex=self._ttl or None)
+            self.stats["stores"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Result cache write failed for {key}: {e}")
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["disk_hits"] + self.stats["redis_hits"] + self.stats["misses"]
+        hits = lookups - self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "redis_enabled": self._redis is not None,
+            "pipeline_version": PIPELINE_VERSION,
+        }
+
+
+_result_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    global _result_cache
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    if _result_cache is None:
+        redis_url = (
+            f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/0"
+            if settings.RESULT_CACHE_REDIS else None
+        )
+        _result_cache = ResultCache(
+            settings.RESULT_CACHE_DIR,
+            settings.RESULT_CACHE_TTL_SEC,
+            settings.RESULT_CACHE_DISK_MB * 1024 * 1024,
+            redis_url,
+        )
+    return _result_cache
@@ -11,7 +11,8 @@ async def update_processing_stats(
     db: AsyncSession,
     user_id: str,
     operation: str,
-    processing_time_ms: int
+    processing_time_ms: int,
+    count: int = 1
 ):
     try:
         today = date.today()
@@ -35,19 +36,19 @@ async def update_processing_stats(
             )
             db.add(stats)
         if operation == 'upload':
-            stats.total_images_uploaded = (stats.total_images_uploaded or 0) + 1
+            stats.total_images_uploaded = (stats.total_images_uploaded or 0) + count
         else:
-            stats.total_images_processed = (stats.total_images_processed or 0) + 1
+            stats.total_images_processed = (stats.total_images_processed or 0) + count
             stats.total_processing_time_ms += (processing_time_ms or 0)
         ops = dict(stats.operation_counts or {})
-        ops[operation] = ops.get(operation, 0) + 1
+        ops[operation] = ops.get(operation, 0) + count
         stats.operation_counts = ops
         daily = dict(stats.daily_breakdown or {})
         today_str = str(today)
         if today_str not in daily:
             daily[today_str] = {"total": 0}
-        daily[today_str]["total"] = daily[today_str].get("total", 0) + 1
-        daily[today_str][operation] = daily[today_str].get(operation, 0) + 1
+        daily[today_str]["total"] = daily[today_str].get("total", 0) + count
+        daily[today_str][operation] = daily[today_str].get(operation, 0) + count
         if operation != 'upload':
             daily[today_str]["time_ms"] = daily[today_str].get("time_ms", 0) + (processing_time_ms or 0)
         stats.daily_breakdown = daily
@@ -0,0 +1,321 @@
+"""Async object storage behind one interface.
+
+``get_storage()`` returns the backend selected by ``STORAGE_PROVIDER``:
+
+- ``local``: files under ``static/``; disk I/O runs in the thread pool.
+- ``s3``: any S3-compatible store (AWS, MinIO, R2) through boto3; large
+  objects go up as concurrent multipart uploads.
+- anything else: Cloudinary (the original non-local behaviour).
+
+Every ``put_*`` returns the dict shape callers already read from
+Cloudinary (``secure_url``, ``url``, ``width``, ``height``, ``public_id``).
+The SDKs are blocking, so each call is offloaded with ``run_in_threadpool``
+and never stalls the event loop.
+
+S3 objects are uploaded without an ACL. Server-side reads (processing,
+ZIP downloads) go through ``fetch_url``, which presigns, so the bucket can
+stay private; the URLs stored on images and returned to clients are only
+readable if the bucket, or the CDN at ``S3_PUBLIC_BASE_URL``, serves them.
+"""
+import asyncio
+import io
+import os
+import shutil
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Iterable, List, Optional
+
+import cloudinary
+import cloudinary.api
+import cloudinary.uploader
+import cloudinary.utils
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.cloudinary_service import extract_cloudinary_public_id
+from app.services.media import sanitize_filename
+
+_CLOUDINARY_DELETE_BATCH = 100   # delete_resources limit
+_S3_DELETE_BATCH = 1000          # delete_objects limit
+
+_MB = 2**20
+
+
+async def _run_batches(fn, keys: List[str], size: int, *args) -> List[str]:
+    """Run ``fn(batch, *args)`` over ``keys`` in batches of ``size``, up to
+    STORAGE_DELETE_CONCURRENCY batches at a time in the thread pool."""
+    slots = asyncio.Semaphore(settings.STORAGE_DELETE_CONCURRENCY)
+
+    async def run(batch: List[str]) -> List[str]:
+        async with slots:
+            return await run_in_threadpool(fn, batch, *args)
+
+    results = await asyncio.gather(*(run(keys[i:i + size]) for i in range(0, len(keys), size)))
+    return [error for errors in results for error in errors]
+
+
+class StorageBackend(ABC):
+    """Interface for object storage. ``key`` is the caller's logical name,
+    e.g. ``processed/<user>/<image>.jpg``; backends may normalise it."""
+
+    @abstractmethod
+    async def put_bytes(self, data: bytes, key: str, resource_type: str = "image",
+                        content_type: Optional[str] = None) -> dict:
+        ...
+
+    @abstractmethod
+    async def put_file(self, path: str, key: str, resource_type: str = "image",
+                       content_type: Optional[str] = None) -> dict:
+        """Store a file already on disk without reading it into memory."""
+
+    @abstractmethod
+    def key_from_url(self, url: str) -> Optional[str]:
+        """The stored key behind a URL this backend returned, or None."""
+
+    @abstractmethod
+    async def delete_many(self, keys: Iterable[str], resource_type: str = "image") -> List[str]:
+        """Delete objects in as few calls as the backend allows. Returns
+        error messages; missing objects are not errors."""
+
+    @abstractmethod
+    async def presign(self, key: str, expires_in: Optional[int] = None) -> str:
+        """A time-limited download URL for a stored key (``public_id`` of a
+        put result, or ``key_from_url`` of its URL)."""
+
+    async def fetch_url(self, url: str) -> str:
+        """A URL the server can download a stored ``url`` from. Local and
+        Cloudinary URLs are public as stored."""
+        return url
+
+
+class LocalStorage(StorageBackend):
+
+    def __init__(self, base_url: Optional[str] = None):
+        self._base_url = (base_url or settings.LOCAL_STORAGE_BASE_URL).rstrip("/")
+
+    @staticmethod
+    def _target(key: str) -> str:
+        target_dir = "static/processed" if key.startswith("processed/") else "static/uploads"
+        os.makedirs(target_dir, exist_ok=True)
+        return f"{target_dir}/{key.replace('/', '_')}"
+
+    def _result(self, file_path: str) -> dict:
+        url = f"{self._base_url}/{file_path}"
+        return {"secure_url": url, "url": url, "width": 0, "height": 0, "public_id": file_path}
+
+    def _write_bytes(self, data: bytes, key: str) -> dict:
+        file_path = self._target(key)
+        with open(file_path, "wb") as f:
+            f.write(data)
+        return self._result(file_path)
+
+    def _copy_file(self, path: str, key: str) -> dict:
+        file_path = self._target(key)
+        shutil.copyfile(path, file_path)
+        return self._result(file_path)
+
+    async def put_bytes(self, data, key, resource_type="image", content_type=None):
+        return await run_in_threadpool(self._write_bytes, data, key)
+
+    async def put_file(self, path, key, resource_type="image", content_type=None):
+        return await run_in_threadpool(self._copy_file, path, key)
+
+    def key_from_url(self, url):
+        prefix = f"{self._base_url}/"
+        if not url or not url.startswith(prefix):
+            return None
+        return url[len(prefix):]
+
+    @staticmethod
+    def _remove(keys: List[str]) -> List[str]:
+        errors = []
+        for key in keys:
+            path = os.path.normpath(key)
+            if not path.startswith("static" + os.sep):
+                errors.append(f"Refusing to delete outside static/: {key}")
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                errors.append(f"{key}: {e}")
+        return errors
+
+    async def delete_many(self, keys, resource_type="image"):
+        keys = [k for k in dict.fromkeys(keys) if k]
+        return await run_in_threadpool(self._remove, keys) if keys else []
+
+    async def presign(self, key, expires_in=None):
+        # Served by the public /static mount; there is nothing to sign.
+        return f"{self._base_url}/{key}"
+
+
+class CloudinaryStorage(StorageBackend):
+
+    async def put_bytes(self, data, key, resource_type="image", content_type=None):
+        return await run_in_threadpool(
+            cloudinary.uploader.upload,
+            data,
+            public_id=sanitize_filename(key),
+            upload_preset=settings.CLOUDINARY_UPLOAD_PRESET,
+            resource_type=resource_type,
+        )
+
+    async def put_file(self, path, key, resource_type="image", content_type=None):
+        # upload_large sends the file in chunks instead of one request body.
+        return await run_in_threadpool(
+            cloudinary.uploader.upload_large,
+            path,
+            public_id=sanitize_filename(key),
+            upload_preset=settings.CLOUDINARY_UPLOAD_PRESET,
+            resource_type=resource_type,
+            chunk_size=settings.STORAGE_MULTIPART_CHUNK_MB * _MB,
+        )
+
+    def key_from_url(self, url):
+        return extract_cloudinary_public_id(url)
+
+    @staticmethod
+    def _delete_batch(public_ids: List[str], resource_type: str) -> List[str]:
+        try:
+            result = cloudinary.api.delete_resources(public_ids, resource_type=resource_type)
+        except Exception as e:
+            return [f"{public_ids[0]}..: {e}"]
+        return [
+            f"{public_id}: {status}"
+            for public_id, status in (result.get("deleted") or {}).items()
+            if status not in ("deleted", "not_found")
+        ]
+
+    async def delete_many(self, keys, resource_type="image"):
+        keys = [k for k in dict.fromkeys(keys) if k]
+        return await _run_batches(self._delete_batch, keys, _CLOUDINARY_DELETE_BATCH, resource_type)
+
+    async def presign(self, key, expires_in=None):
+        expires_at = int(time.time()) + (expires_in or settings.STORAGE_PRESIGN_EXPIRES_SEC)
+        public_id, _, fmt = key.rpartition(".") if "." in key else (key, "", "")
+        return cloudinary.utils.private_download_url(public_id, fmt, expires_at=expires_at)
+
+
+class S3Storage(StorageBackend):
+    """S3-compatible storage. Point ``S3_ENDPOINT_URL`` at MinIO (or moto's
+    server mode) to run against a local stand-in."""
+
+    def __init__(self):
+        self._bucket = settings.S3_BUCKET
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    self._client = boto3.client(
+                        "s3",
+                        endpoint_url=settings.S3_ENDPOINT_URL,
+                        region_name=settings.S3_REGION,
+                        aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+                        aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+                        config=Config(max_pool_connections=max(10, settings.STORAGE_MULTIPART_CONCURRENCY * 2)),
+                    )
+        return self._client
+
+    @staticmethod
+    def _transfer_config():
+        from boto3.s3.transfer import TransferConfig
+
+        return TransferConfig(
+            multipart_threshold=settings.STORAGE_MULTIPART_THRESHOLD_MB * _MB,
+            multipart_chunksize=settings.STORAGE_MULTIPART_CHUNK_MB * _MB,
+            max_concurrency=settings.STORAGE_MULTIPART_CONCURRENCY,
+        )
+
+    def _url(self, key: str) -> str:
+        if settings.S3_PUBLIC_BASE_URL:
+            return f"{settings.S3_PUBLIC_BASE_URL.rstrip('/')}/{key}"
+        if settings.S3_ENDPOINT_URL:
+            return f"{settings.S3_ENDPOINT_URL.rstrip('/')}/{self._bucket}/{key}"
+        return f"https://{self._bucket}.s3.{settings.S3_REGION}.amazonaws.com/{key}"
+
+    def _result(self, key: str) -> dict:
+        url = self._url(key)
+        return {"secure_url": url, "url": url, "width": 0, "height": 0, "public_id": key}
+
+    @staticmethod
+    def _extra_args(content_type: Optional[str]) -> dict:
+        return {"ContentType": content_type} if content_type else {}
+
+    def _upload_bytes(self, data: bytes, key: str, content_type: Optional[str]) -> dict:
+        # upload_fileobj switches to parallel multipart above the threshold.
+        self.client.upload_fileobj(
+            io.BytesIO(data), self._bucket, key,
+            ExtraArgs=self._extra_args(content_type), Config=self._transfer_config(),
+        )
+        return self._result(key)
+
+    def _upload_file(self, path: str, key: str, content_type: Optional[str]) -> dict:
+        self.client.upload_file(
+            path, self._bucket, key,
+            ExtraArgs=self._extra_args(content_type), Config=self._transfer_config(),
+        )
+        return self._result(key)
+
+    async def put_bytes(self, data, key, resource_type="image", content_type=None):
+        return await run_in_threadpool(self._upload_bytes, data, sanitize_filename(key), content_type)
+
+    async def put_file(self, path, key, resource_type="image", content_type=None):
+        return await run_in_threadpool(self._upload_file, path, sanitize_filename(key), content_type)
+
+    def key_from_url(self, url):
+        prefix = self._url("")
+        if not url or not url.startswith(prefix):
+            return None
+        return url[len(prefix):]
+
+    def _delete_batch(self, keys: List[str]) -> List[str]:
+        try:
+            result = self.client.delete_objects(
+                Bucket=self._bucket,
+                Delete={"Objects": [{"Key": k} for k in keys], "Quiet": True},
+            )
+        except Exception as e:
+            return [f"{keys[0]}..: {e}"]
+        return [f"{err['Key']}: {err.get('Message')}" for err in result.get("Errors", [])]
+
+    async def delete_many(self, keys, resource_type="image"):
+        keys = [k for k in dict.fromkeys(keys) if k]
+        return await _run_batches(self._delete_batch, keys, _S3_DELETE_BATCH)
+
+    async def presign(self, key, expires_in=None):
+        return await run_in_threadpool(
+            self.client.generate_presigned_url,
+            "get_object",
+            Params={"Bucket": self._bucket, "Key": key},
+            ExpiresIn=expires_in or settings.STORAGE_PRESIGN_EXPIRES_SEC,
+        )
+
+    async def fetch_url(self, url):
+        # Objects carry no public ACL; presigning works for private buckets.
+        key = self.key_from_url(url.split("?", 1)[0])
+        return await self.presign(key) if key else url
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_PROVIDER == "local":
+            _storage = LocalStorage()
+        elif settings.STORAGE_PROVIDER == "s3":
+            _storage = S3Storage()
+        else:
+            _storage = CloudinaryStorage()
+    return _storage
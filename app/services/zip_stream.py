@@ -0,0 +1,67 @@
+import time
+import zipfile
+from typing import AsyncIterator, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+# Already-compressed formats are stored as-is; deflating them only costs CPU.
+_STORED_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".avif", ".heic", ".heif", ".gif", ".zip"}
+
+
+class _ChunkSink:
+    """Write-only, non-seekable file object; zipfile falls back to data
+    descriptors, so entries can be written without seeking back."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStreamWriter:
+    """Builds a ZIP archive incrementally; each call returns the bytes ready to send."""
+
+    def __init__(self):
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, mode="w", allowZip64=True)
+
+    def add(self, arcname: str, data: bytes) -> bytes:
+        info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+        info.external_attr = 0o644 << 16
+        ext = arcname[arcname.rfind("."):].lower() if "." in arcname else ""
+        info.compress_type = zipfile.ZIP_STORED if ext in _STORED_EXTS else zipfile.ZIP_DEFLATED
+        self._zip.writestr(info, data)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._zip.close()
+        return self._sink.drain()
+
+
+async def stream_zip(entries: AsyncIterator[Tuple[str, bytes]]) -> AsyncIterator[bytes]:
+    """Yield a ZIP archive of ``(arcname, data)`` entries as they arrive.
+
+    Only the entry being written is held in memory; the CRC pass runs in
+    the thread pool so large files don't stall the event loop.
+    """
+    writer = ZipStreamWriter()
+    async for arcname, data in entries:
+        chunk = await run_in_threadpool(writer.add, arcname, data)
+        if chunk:
+            yield chunk
+    yield writer.close()
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import signal
+import sys
+from datetime import timedelta
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.processing import Job
+from app.services.image_processing.executor import shutdown_engine
+from app.services.image_fetcher import ImageFetcher
+from app.services.job_queue import JobQueue, JOB_TYPE_PROCESS_IMAGE
+from app.services.process_use_case import ProcessImageUseCase
+from app.services.repositories import ImageRepository
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[logging.StreamHandler(sys.stdout)],
+    force=True
+)
+logger = logging.getLogger("worker")
+
+
+async def _handle_process_image(job: Job) -> dict:
+    data = job.input_data
+    async with AsyncSessionLocal() as db:
+        use_case = ProcessImageUseCase(ImageRepository(db), ImageFetcher())
+        return await use_case.execute(
+            image_id=data["image_id"],
+            target_user_id=data["target_user_id"],
+            operations=data.get("operations", []),
+            options=data.get("options", {}),
+            autoDetect=data.get("autoDetect", False),
+        )
+
+
+JOB_HANDLERS = {
+    JOB_TYPE_PROCESS_IMAGE: _handle_process_image,
+}
+
+
+async def _heartbeat(job_id, stop: asyncio.Event):
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.JOB_HEARTBEAT_SEC)
+        except asyncio.TimeoutError:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await JobQueue(db).heartbeat(job_id)
+            except Exception as e:
+                logger.warning(f"Heartbeat failed for job {job_id}: {e}")
+
+
+async def _run_job(job: Job):
+    handler = JOB_HANDLERS[job.type]
+    done = asyncio.Event()
+    beat = asyncio.create_task(_heartbeat(job.id, done))
+    try:
+        result = await handler(job)
+    except Exception as e:
+        logger.exception(f"Job {job.id} failed")
+        async with AsyncSessionLocal() as db:
+            await JobQueue(db).fail(job.id, str(e) or type(e).__name__)
+        return
+    finally:
+        done.set()
+        await beat
+    async with AsyncSessionLocal() as db:
+        await JobQueue(db).complete(job.id, result)
+    logger.info(f"Job {job.id} completed")
+
+
+async def _worker_loop(index: int, stop: asyncio.Event):
+    logger.info(f"Worker slot {index} started")
+    while not stop.is_set():
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await JobQueue(db).claim(list(JOB_HANDLERS))
+        except Exception as e:
+            logger.error(f"Job claim failed: {e}")
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.JOB_POLL_INTERVAL_SEC)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        logger.info(f"Worker slot {index} claimed job {job.id} ({job.type})")
+        await _run_job(job)
+
+
+async def _reaper_loop(stop: asyncio.Event):
+    stale_after = timedelta(seconds=settings.JOB_STALE_AFTER_SEC)
+    while not stop.is_set():
+        try:
+            async with AsyncSessionLocal() as db:
+                await JobQueue(db).requeue_stale(stale_after, settings.JOB_MAX_ATTEMPTS)
+        except Exception as e:
+            logger.error(f"Stale job sweep failed: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.JOB_STALE_AFTER_SEC / 2)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_worker(concurrency: int):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    # In-flight jobs finish before exit; anything killed mid-run is picked up
+    # again by the reaper once its heartbeat goes stale.
+    await asyncio.gather(
+        _reaper_loop(stop),
+        *(_worker_loop(i, stop) for i in range(concurrency)),
+    )
+    await asyncio.to_thread(shutdown_engine)
+    logger.info("Worker stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker(settings.WORKER_CONCURRENCY))